@@ -0,0 +1,201 @@
+'''
+Concurrent weather alert aggregation over several regions and sources.
+
+Weatherbit has taken well over 24 hours to update its alert data after an alert has been
+posted to the government of Canada website, while scraping weather.gc.ca breaks whenever
+the page structure changes. Querying both and merging the results gets punctual alerts
+from whichever source is healthy. Sources covering the same area are redundant and race
+each other, while every area is waited for since each one has alerts of its own.
+'''
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from alert_parser import parse_gc_report
+from alerts import SOURCE_GC, SOURCE_WEATHERBIT, Alert
+from conditional_fetcher import ConditionalFetcher, make_session
+
+logger = logging.getLogger(__name__)
+
+GC_REPORT_URL = "https://weather.gc.ca/warnings/report_e.html?{region}"
+WEATHERBIT_URL = "https://api.weatherbit.io/v2.0/alerts?city={city}&state={state}&country={country}&key={key}"
+
+DEFAULT_GC_REGIONS = os.environ.get("WEATHER_GC_REGIONS", "bc43").split(",")
+DEFAULT_SOURCE_TIMEOUT_S = 20.0
+
+
+class AlertSource(NamedTuple):
+    """
+    A named function fetching alerts from one region of one source. Sources with the same area
+    report the same alerts, a source without an area is the only one covering its region.
+    """
+    name: str
+    fetch: Callable[[], List[Alert]]
+    timeout_s: float = DEFAULT_SOURCE_TIMEOUT_S
+    area: Optional[str] = None
+
+    @property
+    def coverage(self) -> str:
+        """Key shared by the sources reporting the same alerts"""
+        return self.area or self.name
+
+
+def gc_source(region: str, timeout_s: float = DEFAULT_SOURCE_TIMEOUT_S) -> AlertSource:
+    """
+    Create a source scraping the weather.gc.ca report page of a region.
+
+    :param region: Region code, e.g. bc43 for Victoria.
+    :param timeout_s: Request timeout in seconds.
+    """
+    fetcher = ConditionalFetcher(GC_REPORT_URL.format(region=region), lambda html: parse_gc_report(html, region),
+                                 timeout_s)
+    return AlertSource(f"{SOURCE_GC}:{region}", fetcher.fetch, timeout_s, area=region)
+
+
+def weatherbit_source(token: str, city: str = "Victoria", state: str = "BC", country: str = "CA",
+                      area: str = "bc43", timeout_s: float = DEFAULT_SOURCE_TIMEOUT_S) -> AlertSource:
+    """
+    Create a source querying the Weatherbit alerts API for a city. Note that only 50 requests
+    per day are included in the free subscription plan.
+
+    :param token: Weatherbit API key.
+    :param city: City name.
+    :param state: State or province code.
+    :param country: Country code.
+    :param area: weather.gc.ca region code of the city. Alerts are reported under this region
+        and the source races the weather.gc.ca source of the region.
+    :param timeout_s: Request timeout in seconds.
+    """
+    url = WEATHERBIT_URL.format(city=city, state=state, country=country, key=token)
+    session = make_session()
+    city_name = f"{city}, {state}"
+
+    def fetch() -> List[Alert]:
+        response = session.get(url, timeout=timeout_s)
+        response.raise_for_status()
+        alerts = []
+        for alert in response.json().get("alerts", []):
+            issued = alert.get("effective_utc")
+            alerts.append(Alert(
+                source=SOURCE_WEATHERBIT,
+                region=area,
+                kind=alert.get("title", ""),
+                area=", ".join(alert.get("regions", [])),
+                issued=datetime.fromisoformat(issued) if issued else None,
+                text=alert.get("description", ""),
+            ))
+        return alerts
+
+    return AlertSource(f"{SOURCE_WEATHERBIT}:{city_name}", fetch, timeout_s, area=area)
+
+
+def default_sources() -> List[AlertSource]:
+    """Sources for DEFAULT_GC_REGIONS, plus Weatherbit when WEATHERBIT_TOKEN is set."""
+    sources = [gc_source(region) for region in DEFAULT_GC_REGIONS]
+    token = os.environ.get("WEATHERBIT_TOKEN")
+    if token:
+        sources.append(weatherbit_source(token))
+    return sources
+
+
+def merge_alerts(alerts: Sequence[Alert]) -> List[Alert]:
+    """
+    Drop alerts describing the same event as an earlier alert in the sequence.
+
+    :param alerts: Alerts ordered by source preference.
+    """
+    merged: Dict[str, Alert] = {}
+    for alert in alerts:
+        merged.setdefault(alert.dedup_key, alert)
+    return list(merged.values())
+
+
+class AlertAggregator:
+    """
+    Queries every source concurrently and groups them by the area they cover. The sources of an
+    area are redundant, so an area is done as soon as quorum of its sources have answered
+    successfully, and the merged alerts are returned once every area is done. The latency of a
+    poll is therefore set by the fastest healthy source of the slowest area rather than the sum
+    of all of them, and no area is dropped because another one answered first. A fetch which is
+    still running when its area is done cannot be interrupted and finishes in the background.
+    Each source has at most one fetch in flight and the pool has a worker per source, so a later
+    poll joins a straggling fetch instead of queueing behind it.
+    """
+    def __init__(self, sources: Sequence[AlertSource], quorum: int = 1):
+        """
+        Create an AlertAggregator instance.
+
+        :param sources: Sources to query, in order of preference when merging duplicates.
+        :param quorum: Number of successful sources to wait for per area, capped at the number of
+            sources covering the area.
+        """
+        self._sources = list(sources)
+        self._quorum = max(1, quorum)
+        self._executor = ThreadPoolExecutor(max_workers=max(len(self._sources), 1), thread_name_prefix="alerts")
+        self._inflight: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sources(self) -> List[AlertSource]:
+        """Sources being queried"""
+        return list(self._sources)
+
+    def collect(self) -> List[Alert]:
+        """
+        Query the sources and return the merged alerts of every source which answered before
+        its area reached the quorum or before its timeout. Areas none of whose sources answered
+        are logged and left out. Raises RuntimeError if no source answered.
+        """
+        if not self._sources:
+            return []
+
+        areas: Dict[str, List[int]] = {}
+        for i, source in enumerate(self._sources):
+            areas.setdefault(source.coverage, []).append(i)
+
+        futures: Dict[Future, int] = {}
+        with self._lock:
+            for i, source in enumerate(self._sources):
+                future = self._inflight.get(i)
+                if future is None or future.done():
+                    future = self._executor.submit(source.fetch)
+                    self._inflight[i] = future
+                futures[future] = i
+        deadline = time.monotonic() + max(source.timeout_s for source in self._sources)
+
+        results: Dict[int, List[Alert]] = {}
+        errors = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    errors.append(f"{self._sources[i].name}: {e}")
+
+            # Redundant sources of an area which reached its quorum are not waited for
+            for indices in areas.values():
+                if sum(i in results for i in indices) >= min(self._quorum, len(indices)):
+                    pending = {future for future in pending if futures[future] not in indices}
+
+        for error in errors:
+            logger.warning(f"Weather alert source failed. Error: {error}")
+
+        if not results:
+            raise RuntimeError(f"No weather alert source answered. Errors: {errors}")
+
+        for area, indices in areas.items():
+            if not any(i in results for i in indices):
+                logger.warning(f"No weather alert source answered for {area}, its alerts are missing from this poll")
+
+        # Merge in source order so the preferred source wins duplicates
+        return merge_alerts([alert for i in sorted(results) for alert in results[i]])
@@ -0,0 +1,107 @@
+'''
+Targeted parser for weather.gc.ca alert report pages.
+'''
+
+import re
+from datetime import timedelta, timezone
+from typing import List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import Tag
+from dateutil import parser as date_parser
+
+from alerts import SOURCE_GC, Alert
+
+try:
+    import lxml  # noqa: F401
+    PARSER_BACKEND = "lxml"
+except ImportError:
+    PARSER_BACKEND = "html.parser"
+
+# Only the main content of the page holds alerts, the header, menus and footer are skipped
+MAIN_CONTENT = SoupStrainer("main")
+
+NO_ALERTS = re.compile(r"\bno alerts\b", re.IGNORECASE)
+ALERT_HEADING = re.compile(r"\b(warning|watch|advisory|statement)s?\b", re.IGNORECASE)
+ISSUED = re.compile(r"\bissued\s*(?:at)?\s*:?\s*(.+?\d{4})", re.IGNORECASE)
+HEADINGS = ["h2", "h3", "h4"]
+
+# Canadian time zone abbreviations used in issue times
+TZ_INFOS = {
+    "NST": timezone(timedelta(hours=-3.5)), "NDT": timezone(timedelta(hours=-2.5)),
+    "AST": timezone(timedelta(hours=-4)), "ADT": timezone(timedelta(hours=-3)),
+    "EST": timezone(timedelta(hours=-5)), "EDT": timezone(timedelta(hours=-4)),
+    "CST": timezone(timedelta(hours=-6)), "CDT": timezone(timedelta(hours=-5)),
+    "MST": timezone(timedelta(hours=-7)), "MDT": timezone(timedelta(hours=-6)),
+    "PST": timezone(timedelta(hours=-8)), "PDT": timezone(timedelta(hours=-7)),
+    "UTC": timezone.utc,
+}
+
+
+def _text(element) -> str:
+    return " ".join(element.get_text(" ", strip=True).split())
+
+
+def _parse_issued(text: str) -> Optional[str]:
+    match = ISSUED.search(text)
+    return match.group(1) if match else None
+
+
+def _to_datetime(issued: Optional[str]):
+    if issued is None:
+        return None
+    try:
+        return date_parser.parse(issued, tzinfos=TZ_INFOS, fuzzy=True)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _is_alert_heading(tag: Tag) -> bool:
+    return tag.name in HEADINGS and ALERT_HEADING.search(_text(tag)) is not None
+
+
+def _section_text(heading: Tag) -> str:
+    """Text of the siblings following a heading up to the next heading."""
+    parts = []
+    for sibling in heading.find_next_siblings():
+        if sibling.name in HEADINGS:
+            break
+        parts.append(_text(sibling))
+    return " ".join(part for part in parts if part)
+
+
+def parse_gc_report(html: str, region: str) -> List[Alert]:
+    """
+    Parses the alerts in effect from a weather.gc.ca report page. Only the <main> element of
+    the page is parsed. Every heading naming a warning, watch, advisory or statement becomes one
+    Alert with the heading as its type and the following paragraphs as its text. A page stating
+    "No alerts" has no alerts. When the page has no alert headings either, its main text is
+    returned as a single unstructured alert so that alerts are not missed if the page structure
+    changes.
+
+    :param html: weather.gc.ca report page.
+    :param region: Region code of the page, e.g. bc43.
+    """
+    soup = BeautifulSoup(html, PARSER_BACKEND, parse_only=MAIN_CONTENT)
+    if soup.find("main") is None:
+        soup = BeautifulSoup(html, PARSER_BACKEND)
+
+    title = soup.find("h1")
+    area = _text(title) if title is not None else region
+
+    page_text = _text(soup)
+    if NO_ALERTS.search(page_text):
+        return []
+
+    alerts = []
+    for heading in soup.find_all(_is_alert_heading):
+        kind = _text(heading)
+        text = _section_text(heading)
+        issued = _parse_issued(text)
+        alerts.append(Alert(source=SOURCE_GC, region=region, kind=kind, area=area, issued=_to_datetime(issued),
+                            text=text))
+
+    if alerts:
+        return alerts
+
+    return [Alert(source=SOURCE_GC, region=region, kind="", area=area, issued=None, text=page_text)]
@@ -0,0 +1,128 @@
+'''
+Normalized weather alert records and the set of alerts which have already been announced.
+'''
+
+import hashlib
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+SOURCE_GC = "weather.gc.ca"
+SOURCE_WEATHERBIT = "weatherbit"
+
+DEFAULT_SEEN_TTL_S = 24 * 60 * 60
+
+# Status words weather.gc.ca appends to alert headings, e.g. "Wind warning in effect"
+KIND_STATUS = re.compile(r"\s+(in effect|issued|continued|updated)$")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _normalize_kind(kind: str) -> str:
+    """Alert type without its status, so "Wind Warning" and "Wind warning in effect" match."""
+    return KIND_STATUS.sub("", _normalize(kind))
+
+
+class Alert(NamedTuple):
+    """A weather alert normalized from any source."""
+    source: str
+    region: str
+    kind: str
+    area: str
+    issued: Optional[datetime]
+    text: str
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Stable identity of the alert, shared by every source reporting it. Structured alerts are
+        identified by their region code and normalized type. The source, the free text area and
+        the issue time are left out since weather.gc.ca and Weatherbit word and time the same
+        alert differently, and whichever of them answers first is used in a poll. Unstructured
+        alerts are identified by their region code and text.
+        """
+        if self.kind:
+            identity = f"{self.region}|{_normalize_kind(self.kind)}"
+        else:
+            identity = f"{self.region}|{_normalize(self.text)}"
+        return hashlib.sha1(identity.encode()).hexdigest()
+
+    @property
+    def dedup_key(self) -> str:
+        """Alerts from different sources with the same key describe the same event, see fingerprint"""
+        return self.fingerprint
+
+
+class SeenAlerts:
+    """
+    Set of alert fingerprints which have already been announced. Each fingerprint expires once
+    the alert has not been seen for the TTL, so the set stays as small as the number of active
+    alerts and lookups cost the same however long the bot has been running. When a StateStore
+    is given, the fingerprints are persisted under scope and reloaded on creation, so alerts are
+    not announced again after a restart.
+    """
+    def __init__(self, ttl_s: float = DEFAULT_SEEN_TTL_S, store=None, scope: str = ""):
+        """
+        Create a SeenAlerts instance.
+
+        :param ttl_s: Time in seconds after its last sighting that an alert is forgotten.
+        :param store: state_store.StateStore to persist fingerprints in, or None to keep them in memory only.
+        :param scope: Key the fingerprints are persisted under, e.g. a channel ID.
+        """
+        self._ttl_s = ttl_s
+        self._store = store
+        self._scope = scope
+        self._expiry: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        if store is not None:
+            self._expiry = store.load_fingerprints(scope, time.time())
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire(time.time())
+            return len(self._expiry)
+
+    def __contains__(self, alert: Alert) -> bool:
+        with self._lock:
+            expires_at = self._expiry.get(alert.fingerprint)
+            return expires_at is not None and expires_at > time.time()
+
+    def add_new(self, alerts: Iterable[Alert], now: Optional[float] = None) -> List[Alert]:
+        """
+        Record a sighting of every alert and return the ones which were not already in the set.
+
+        :param alerts: Alerts currently in effect.
+        :param now: Current Unix time, defaults to the system clock.
+        """
+        now = time.time() if now is None else now
+        new_alerts = []
+        seen: Dict[str, float] = {}
+        with self._lock:
+            self._expire(now)
+            for alert in alerts:
+                fingerprint = alert.fingerprint
+                if fingerprint not in self._expiry:
+                    new_alerts.append(alert)
+                self._expiry[fingerprint] = now + self._ttl_s
+                seen[fingerprint] = now + self._ttl_s
+
+        if self._store is not None:
+            self._store.delete_fingerprints(self._scope, before=now)
+            self._store.save_fingerprints(self._scope, seen)
+        return new_alerts
+
+    def clear(self):
+        """Forget every alert."""
+        with self._lock:
+            self._expiry.clear()
+        if self._store is not None:
+            self._store.delete_fingerprints(self._scope)
+
+    def _expire(self, now: float):
+        expired = [fingerprint for fingerprint, expires_at in self._expiry.items() if expires_at <= now]
+        for fingerprint in expired:
+            del self._expiry[fingerprint]
@@ -0,0 +1,226 @@
+import os, asyncio, inspect
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from metrics import start_http_server, timed
+import slackbot
+from slackbot import HTTP_TIMEOUT, fmt_log_msg, request_pass_info, request_weather_alerts
+
+# asyncio runtime of the bot, selected with 'python slackbot.py --async' or SLACK_ASYNC=1.
+# Slash commands are acked on the event loop. The pass table and weather alert requests
+# are awaited on REQUEST_COALESCER's thread pool, so a command waiting on Celestrak,
+# weather.gc.ca or the orbit propagation does not hold a thread. The other commands run
+# the handlers of slackbot.py in the loop's default executor, and the jobs they register
+# with SCHEDULER post back through the event loop, so both runtimes share the same
+# handlers, jobs and state.
+#
+# Requires aiohttp, which slack_bolt uses for its async Socket Mode client.
+
+
+async_app = AsyncApp(token=os.environ.get("SLACK_BOT_TOKEN"))
+
+
+@async_app.event("app_mention")
+async def handle_app_mention_events(logger):
+    """
+    Receives any mentions to app '@<app_name>' in channels where app is authorized.
+
+        Parameters:
+
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    logger.warning(fmt_log_msg('app_mention'))
+
+@async_app.event("message")
+async def handle_message_events(logger):
+    """
+    Receives any messages posted to Slack channel where bot is added.
+
+        Parameters:
+
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    logger.warning(fmt_log_msg('message'))
+
+@async_app.command("/pass_info")
+@timed("/pass_info")
+async def handle_pass_info_command(ack, command, logger, say):
+    """
+    Async version of slackbot.handle_pass_info_command(...). The pass table is computed
+    on REQUEST_COALESCER's thread pool and awaited, so the event loop keeps serving other
+    commands while the passes are propagated.
+
+        Parameters:
+
+            ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    await ack()
+    await say(await asyncio.wrap_future(request_pass_info(command, logger)))
+
+@async_app.command("/weather_alerts")
+@timed("/weather_alerts")
+async def handle_weather_alerts_command(ack, logger, say):
+    """
+    Async version of slackbot.handle_weather_alerts_command(...). The alert sources are
+    queried on REQUEST_COALESCER's thread pool and awaited.
+
+        Parameters:
+
+            ack: Slack API object to send ack back to callee process
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    await ack()
+    reply = await asyncio.wrap_future(request_weather_alerts(logger))
+
+    if reply is not None:
+        await say(reply)
+
+@async_app.command("/daily_update")
+async def handle_daily_update_command(ack, command, say, logger):
+    """
+    Runs slackbot.handle_daily_update_command(...), see run_sync_handler(...).
+
+        Parameters:
+
+            ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    await run_sync_handler(slackbot.handle_daily_update_command, ack, command, say, logger)
+
+@async_app.command("/persistent_weather_alerts")
+async def handle_persistent_weather_alerts_command(ack, command, say, logger):
+    """
+    Runs slackbot.handle_persistent_weather_alerts_command(...), see run_sync_handler(...).
+
+        Parameters:
+
+            ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    await run_sync_handler(slackbot.handle_persistent_weather_alerts_command, ack, command, say, logger)
+
+@async_app.command("/pass_notifications")
+async def handle_pass_notifications_command(ack, command, say, logger):
+    """
+    Runs slackbot.handle_pass_notifications_command(...), see run_sync_handler(...).
+
+        Parameters:
+
+            ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    await run_sync_handler(slackbot.handle_pass_notifications_command, ack, command, say, logger)
+
+@async_app.command("/scheduled_jobs")
+async def handle_scheduled_jobs_command(ack, command, say, logger):
+    """
+    Runs slackbot.handle_scheduled_jobs_command(...), see run_sync_handler(...).
+
+        Parameters:
+
+            ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    await run_sync_handler(slackbot.handle_scheduled_jobs_command, ack, command, say, logger)
+
+async def run_sync_handler(handler, ack, command, say, logger):
+    """
+    Acks a slash command on the event loop, then runs a synchronous handler of slackbot.py
+    in the loop's default executor. The handler gets a no-op ack and a say function which
+    posts through the async say object on the event loop. Jobs the handler registers with
+    SCHEDULER keep that say function, so they post through the event loop as well.
+
+        Parameters:
+
+            handler: slash command handler of slackbot.py
+            ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    await ack()
+
+    loop = asyncio.get_running_loop()
+    kwargs = {"ack": lambda *args, **kwargs: None, "command": command, "say": threadsafe_say(say, loop),
+              "logger": logger}
+    kwargs = {name: kwargs[name] for name in inspect.signature(handler).parameters}
+
+    await loop.run_in_executor(None, lambda: handler(**kwargs))
+
+def threadsafe_say(say, loop):
+    """
+    Creates a function which can be called from any thread except the event loop's to post
+    text with an async say object, waiting until Slack answered.
+
+        Parameters:
+
+            say: async Slack API object which allows app to send text back to Slack
+            loop (AbstractEventLoop): event loop the say object belongs to
+
+        Returns:
+
+            say (function): function which takes the text to post.
+    """
+
+    return lambda text: asyncio.run_coroutine_threadsafe(say(text), loop).result(timeout=HTTP_TIMEOUT)
+
+async def main():
+    """
+    Connects to Slack in Socket Mode on the event loop, restores the persisted jobs and
+    warms up the pass planner in the background, like the synchronous runtime does.
+
+        Parameters:
+
+        Returns:
+    """
+
+    loop = asyncio.get_running_loop()
+    handler = AsyncSocketModeHandler(async_app, os.environ["SLACK_APP_TOKEN"])
+    start_http_server()
+    await handler.connect_async()
+    await loop.run_in_executor(None, slackbot.restore_state)
+    slackbot.register_catalog_refresh()
+    loop.run_in_executor(None, slackbot.warm_up)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
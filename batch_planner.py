@@ -0,0 +1,219 @@
+'''
+Pass computation for many (satellite, ground station) pairs spread across a process pool.
+'''
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from skyfield.api import EarthSatellite
+from skyfield.toposlib import GeographicPosition, wgs84
+
+from pass_planner_helper import PASS_MIN_ALT_DEG, PassInfo, find_passes, get_context, get_tle
+from visibility_filter import can_be_visible
+
+
+class GroundStation(NamedTuple):
+    """A ground station location. Unlike skyfield topos objects these are cheap to send to worker processes."""
+    name: str
+    latitude_deg: float
+    longitude_deg: float
+    elevation_m: float = 0.0
+
+    def topos(self) -> GeographicPosition:
+        """The station as a skyfield position"""
+        return wgs84.latlon(self.latitude_deg, self.longitude_deg, elevation_m=self.elevation_m)
+
+
+UVIC = GroundStation("UVic", +48.46, -123.31)
+
+SatStationPair = Tuple[int, GroundStation]
+
+# Passes found by two overlapping chunks which start closer together than this are the same pass
+DEDUP_TOLERANCE = timedelta(minutes=1)
+
+# Size of the shared worker pool, bounded so concurrent requests queue instead of adding processes
+DEFAULT_MAX_WORKERS = int(os.environ.get("BATCH_PLANNER_WORKERS", min(os.cpu_count() or 1, 4)))
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+class _PassRecord(NamedTuple):
+    """Plain data describing a pass which is returned from the worker processes."""
+    start: datetime
+    end: datetime
+    culminations: List[datetime]
+    track: Optional[Tuple]
+
+
+def _init_worker():
+    """Load the planning context once per worker process so all of its tasks share it."""
+    get_context()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Returns the worker pool shared by all batch computations, creating it on first use. Workers
+    are started by a forkserver, or spawned where there is none, instead of being forked from a
+    process whose threads may hold locks, and each one loads the planning context once.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _POOL = ProcessPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, initializer=_init_worker,
+                                        mp_context=multiprocessing.get_context(method))
+    return _POOL
+
+
+def warm_up_process_pool():
+    """Start the workers of the shared pool and wait until each has loaded the planning context."""
+    pool = get_process_pool()
+    # Each task submitted while no worker is idle starts another worker, up to the pool size
+    for future in [pool.submit(_init_worker) for _ in range(DEFAULT_MAX_WORKERS)]:
+        future.result()
+
+
+def _find_pass_records(tle: Tuple[str, str], name: str, station: GroundStation, start: datetime, end: datetime,
+                       altitude_degrees: float, with_track: bool) -> List[_PassRecord]:
+    """
+    Worker task computing the passes of one satellite over one ground station.
+
+    :param tle: (TLE line 1, TLE line 2)
+    :param name: Satellite name.
+    :param station: The ground station the satellite is viewed from.
+    :param start: Start of the search window.
+    :param end: End of the search window.
+    :param altitude_degrees: Elevation mask the satellite has to rise above.
+    :param with_track: Also compute the ground track of every pass.
+    """
+    context = get_context()
+    ts = context.timescale
+    sat = EarthSatellite(*tle, name, ts)
+    passes, _ = find_passes(sat, ts.from_datetime(start), ts.from_datetime(end), station=station.topos(),
+                            altitude_degrees=altitude_degrees, context=context)
+
+    records = []
+    for pi in passes:
+        track = pi._track_arrays() if with_track else None
+        records.append(_PassRecord(pi.start_dt_utc, pi.end_dt_utc, [pi.culmination_dt_utc], track))
+    return records
+
+
+def compute_passes_batch(pairs: Sequence[SatStationPair], num_days: float = 1, start: Optional[datetime] = None,
+                         altitude_degrees: float = PASS_MIN_ALT_DEG, with_track: bool = False,
+                         executor: Optional[Executor] = None) -> Dict[SatStationPair, List[PassInfo]]:
+    """
+    Computes the passes of several satellites over several ground stations in parallel.
+
+    :param pairs: (NORAD catalog number, ground station) pairs to compute passes for.
+    :param num_days: How many days after start to compute passes for.
+    :param start: Start of the planning horizon in UTC, defaults to now.
+    :param altitude_degrees: Elevation mask the satellites have to rise above.
+    :param with_track: Compute the ground tracks in the workers as well instead of on first access.
+    :param executor: Executor running the searches, defaults to the shared pool of get_process_pool().
+
+    Returns: The passes of every pair, keyed by pair
+    """
+    start = start or datetime.now(timezone.utc)
+    end = start + timedelta(days=num_days)
+
+    # TLEs are fetched (or read from the TLE cache) once per satellite in this process
+    tles = {norad_catalog_num: get_tle(norad_catalog_num) for norad_catalog_num, _ in pairs}
+
+    context = get_context()
+    sats = {norad_catalog_num: EarthSatellite(*tle, name, context.timescale) for norad_catalog_num, (tle, name) in tles.items()}
+    stations = {station: station.topos() for _, station in pairs}
+
+    # Pairs whose orbit never gets high enough above the station's horizon are not sent to the workers
+    records = {pair: [] for pair in pairs
+               if not can_be_visible(sats[pair[0]], stations[pair[1]], altitude_degrees)}
+
+    executor = executor or get_process_pool()
+    futures = {
+        pair: executor.submit(_find_pass_records, *tles[pair[0]], pair[1], start, end, altitude_degrees, with_track)
+        for pair in pairs if pair not in records
+    }
+    try:
+        records.update({pair: future.result() for pair, future in futures.items()})
+    finally:
+        for future in futures.values():
+            future.cancel()
+
+    results = {}
+    for norad_catalog_num, station in pairs:
+        passes = []
+        for record in records[(norad_catalog_num, station)]:
+            pi = PassInfo(sats[norad_catalog_num], record.start, record.end, station=stations[station],
+                          culminations=record.culminations, context=context)
+            if record.track is not None:
+                pi._set_track(*record.track)
+            passes.append(pi)
+        results[(norad_catalog_num, station)] = passes
+
+    return results
+
+
+def _time_chunks(start: datetime, end: datetime, chunk: timedelta, overlap: timedelta) -> List[Tuple[datetime, datetime]]:
+    """Split [start, end] into consecutive chunks which are widened by overlap at inner edges."""
+    chunks = []
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + chunk, end)
+        chunks.append((max(chunk_start - overlap, start), min(chunk_end + overlap, end)))
+        chunk_start = chunk_end
+    return chunks
+
+
+def iter_passes_long_horizon(norad_catalog_num: int, num_days: float, start: Optional[datetime] = None,
+                             station: GroundStation = UVIC, altitude_degrees: float = PASS_MIN_ALT_DEG,
+                             chunk: timedelta = timedelta(days=1), overlap: timedelta = timedelta(minutes=30),
+                             executor: Optional[Executor] = None) -> Iterator[PassInfo]:
+    """
+    Computes passes over a long horizon by searching day sized chunks of the horizon in parallel.
+    Chunks overlap at their edges so passes crossing a chunk boundary are found in full by at least
+    one chunk, and passes found twice are dropped. Passes are yielded in chronological order as soon
+    as the chunks they belong to are done.
+
+    :param norad_catalog_num: The norad catalog number of the satellite to compute passes for.
+    :param num_days: How many days after start to compute passes for.
+    :param start: Start of the planning horizon in UTC, defaults to now.
+    :param station: The ground station the satellite is viewed from.
+    :param altitude_degrees: Elevation mask the satellite has to rise above.
+    :param chunk: Length of the time chunks searched by each task.
+    :param overlap: How far chunks extend into their neighbours, must be longer than any pass.
+    :param executor: Executor running the searches, defaults to the shared pool of get_process_pool().
+    """
+    start = start or datetime.now(timezone.utc)
+    end = start + timedelta(days=num_days)
+
+    tle, name = get_tle(norad_catalog_num)
+    context = get_context()
+    sat = EarthSatellite(*tle, name, context.timescale)
+    topos = station.topos()
+
+    chunks = _time_chunks(start, end, chunk, overlap)
+
+    executor = executor or get_process_pool()
+    futures = [
+        executor.submit(_find_pass_records, tle, name, station, chunk_start, chunk_end, altitude_degrees, False)
+        for chunk_start, chunk_end in chunks
+    ]
+    try:
+        last_start = None
+        for future in futures:
+            for record in future.result():
+                # Passes in the overlap of two chunks are found by both
+                if last_start is not None and record.start - last_start < DEDUP_TOLERANCE:
+                    continue
+                last_start = record.start
+                yield PassInfo(sat, record.start, record.end, station=topos, culminations=record.culminations,
+                               context=context)
+    finally:
+        # Chunks not searched yet when the caller stops iterating are dropped from the shared pool
+        for future in futures:
+            future.cancel()
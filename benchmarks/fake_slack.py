@@ -0,0 +1,103 @@
+'''
+Local stand-in for the Slack Web API answering the calls the bot makes while handling
+commands (auth.test and chat.postMessage) and recording the posted messages.
+'''
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, NamedTuple
+from urllib.parse import parse_qs
+
+
+class PostedMessage(NamedTuple):
+    """A chat.postMessage call received by the fake."""
+    channel: str
+    text: str
+    received_at: float  # time.perf_counter()
+
+
+class FakeSlack:
+    """
+    HTTP server on 127.0.0.1 implementing enough of the Slack Web API for bolt: auth.test
+    returns a fixed bot identity, chat.postMessage records the message and every other method
+    answers ok. Point a WebClient at it by setting its base_url to api_url.
+    """
+    def __init__(self, latency_s: float = 0.0):
+        """
+        Create a FakeSlack instance listening on a free port.
+
+        :param latency_s: Delay added to every response, to mimic the round trip to Slack.
+        """
+        self._latency_s = latency_s
+        self._messages: List[PostedMessage] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def api_url(self) -> str:
+        """Base URL of the fake Web API, with a trailing slash like WebClient.BASE_URL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    @property
+    def messages(self) -> List[PostedMessage]:
+        """Messages posted so far"""
+        with self._lock:
+            return list(self._messages)
+
+    def start(self) -> "FakeSlack":
+        """Start serving in a daemon thread."""
+        threading.Thread(target=self._server.serve_forever, name="fake-slack", daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeSlack":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length).decode() if length else ""
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    args = json.loads(raw or "{}")
+                else:
+                    args = {key: values[0] for key, values in parse_qs(raw).items()}
+
+                method = self.path.rsplit("/", 1)[-1]
+                body = {"ok": True}
+                if method == "auth.test":
+                    body.update(url="https://fake.slack.com/", team="Fake", user="bot", team_id="T0FAKE",
+                                user_id="U0FAKE", bot_id="B0FAKE")
+                elif method == "chat.postMessage":
+                    with fake._lock:
+                        fake._messages.append(PostedMessage(args.get("channel", ""), args.get("text", ""),
+                                                            time.perf_counter()))
+                    body.update(channel=args.get("channel", ""), ts=f"{time.time():.6f}")
+
+                if fake._latency_s > 0:
+                    time.sleep(fake._latency_s)
+
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
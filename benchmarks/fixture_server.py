@@ -0,0 +1,108 @@
+'''
+Local stand-in for Celestrak and weather.gc.ca serving the synthetic responses in benchmarks/fixtures.
+They mimic the format of the real services but are hand written, e.g. the TLE epoch is made up.
+'''
+
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Request path (with or without its query string) -> fixture file
+DEFAULT_ROUTES = {
+    "/NORAD/elements/gp.php": "celestrak_tle.txt",
+    "/warnings/report_e.html?no_alerts": "gc_no_alerts.html",
+    "/warnings/report_e.html?active_alerts": "gc_active_alerts.html",
+}
+
+CONTENT_TYPES = {".txt": "text/plain; charset=utf-8", ".html": "text/html; charset=utf-8"}
+
+
+class FixtureServer:
+    """
+    HTTP server on 127.0.0.1 answering from fixture files in a background thread. Responses
+    carry an ETag and requests with a matching If-None-Match get a 304, like the real servers.
+    Paths are matched with their query string first and then without it.
+    """
+    def __init__(self, routes: Optional[Dict[str, str]] = None, fixture_dir: str = FIXTURE_DIR):
+        """
+        Create a FixtureServer instance listening on a free port.
+
+        :param routes: Fixture file name by request path, defaults to DEFAULT_ROUTES.
+        :param fixture_dir: Directory holding the fixture files.
+        """
+        self._bodies = {}
+        for path, file_name in (routes or DEFAULT_ROUTES).items():
+            with open(os.path.join(fixture_dir, file_name), "rb") as f:
+                body = f.read()
+            content_type = CONTENT_TYPES.get(os.path.splitext(file_name)[1], "application/octet-stream")
+            self._bodies[path] = (body, content_type, f'"{hashlib.sha1(body).hexdigest()}"')
+
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """URL of the server root, without a trailing slash"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        """
+        Returns the URL of a path on this server.
+
+        :param path: Absolute path, may contain a query string or format fields.
+        """
+        return self.base_url + path
+
+    def start(self) -> "FixtureServer":
+        """Start serving in a daemon thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                route = server._bodies.get(self.path) or server._bodies.get(self.path.split("?", 1)[0])
+                if route is None:
+                    self.send_error(404)
+                    return
+
+                body, content_type, etag = route
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,311 @@
+'''
+Offline load test of the slash command handlers.
+
+Slash command payloads are dispatched through the bolt app of slackbot.py exactly as the
+Socket Mode handler does, from a pool of client threads the size of the Socket Mode client's
+(10 by default). ack() is answered by bolt, say() posts to a local fake of the Slack Web API,
+and Celestrak and weather.gc.ca are replaced by the synthetic fixtures. The bolt listener
+thread pool (5 workers by default) is instrumented to measure how long commands wait for a
+worker and how long all workers are busy.
+
+    python benchmarks/load_test.py --requests 500 --mix /pass_info=6,/pass_info:7=1,/weather_alerts=3
+    python benchmarks/load_test.py --rate 50 --workers 10 --output load.json
+
+For every command the report lists the ack latency (time until dispatch returned, which is
+what Slack waits for and must stay under 3 s), the completion latency (time until the
+handler returned) and the time spent queued for a listener thread, as p50/p99, plus the
+overall throughput and the saturation of the listener pool.
+'''
+
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import offline_env
+from fake_slack import FakeSlack
+from fixture_server import FixtureServer
+
+# Must run before the bot modules are imported, they read the environment at import time
+offline_env.configure(prefix="slackbots-load-")
+
+DEFAULT_MIX = "/pass_info=6,/weather_alerts=3,/daily_update=1,/persistent_weather_alerts=1"
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = 10  # slack_sdk SocketModeClient default
+DEFAULT_WORKERS = 5  # slack_bolt App default listener executor
+DRAIN_TIMEOUT_S = 300
+PERCENTILES = (50, 99)
+
+
+class Request:
+    """One slash command sent by the load test and its timings (time.perf_counter())."""
+    __slots__ = ("id", "command", "text", "channel_id", "sent_at", "acked_at", "acked", "queued_at", "started_at",
+                 "finished_at")
+
+    def __init__(self, id: int, command: str, text: str):
+        self.id = id
+        self.command = command
+        self.text = text
+        self.channel_id = f"CLOAD{id:06d}"
+        self.sent_at: Optional[float] = None
+        self.acked_at: Optional[float] = None
+        self.acked = False
+        self.queued_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.command} {self.text}".strip()
+
+    def body(self) -> Dict[str, str]:
+        """Slash command payload as delivered over Socket Mode."""
+        return {
+            "token": "fake-verification-token",
+            "team_id": "T0FAKE",
+            "team_domain": "fake",
+            "channel_id": self.channel_id,
+            "channel_name": "load-test",
+            "user_id": "U0LOAD",
+            "user_name": "load-test",
+            "command": self.command,
+            "text": self.text,
+            "api_app_id": "A0FAKE",
+            "response_url": "https://hooks.slack.com/commands/T0FAKE/0/fake",
+            "trigger_id": f"0.0.{self.id}",
+        }
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """
+    Listener thread pool which records when each task of a Request was queued, started and
+    finished, the peak number of busy workers and queued tasks, and the time during which
+    every worker was busy.
+    """
+    def __init__(self, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix="listener")
+        self.workers = max_workers
+        self.current = threading.local()
+        self.max_busy = 0
+        self.max_queued = 0
+        self.saturated_s = 0.0
+        self._busy = 0
+        self._queued = 0
+        self._saturated_since: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        request: Optional[Request] = getattr(self.current, "request", None)
+        with self._lock:
+            self._queued += 1
+            self.max_queued = max(self.max_queued, self._queued)
+        if request is not None:
+            request.queued_at = time.perf_counter()
+        return super().submit(self._run, request, fn, args, kwargs)
+
+    def _run(self, request: Optional["Request"], fn, args, kwargs):
+        now = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._busy += 1
+            self.max_busy = max(self.max_busy, self._busy)
+            if self._busy == self.workers:
+                self._saturated_since = now
+        if request is not None:
+            request.started_at = now
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            now = time.perf_counter()
+            if request is not None:
+                request.finished_at = now
+            with self._lock:
+                if self._busy == self.workers and self._saturated_since is not None:
+                    self.saturated_s += now - self._saturated_since
+                    self._saturated_since = None
+                self._busy -= 1
+
+
+def parse_mix(mix: str) -> List[Tuple[str, str, float]]:
+    """
+    Parse a command mix like "/pass_info=6,/pass_info:7=1,/weather_alerts=3", where the
+    optional text after ":" is the command argument and the number is the relative weight.
+
+    Returns: list of (command, text, weight)
+    """
+    entries = []
+    for part in mix.split(","):
+        spec, _, weight = part.strip().partition("=")
+        command, _, text = spec.partition(":")
+        if not command.startswith("/"):
+            raise ValueError(f"Invalid command in mix: {part}")
+        entries.append((command, text, float(weight or 1)))
+    return entries
+
+
+def make_requests(mix: Sequence[Tuple[str, str, float]], num_requests: int, seed: int) -> List[Request]:
+    """Draw num_requests commands from the mix, reproducibly for a seed."""
+    rng = random.Random(seed)
+    choices = rng.choices(mix, weights=[weight for _, _, weight in mix], k=num_requests)
+    return [Request(i, command, text) for i, (command, text, _) in enumerate(choices)]
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest rank percentile, None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(requests: Sequence[Request]) -> Dict[str, object]:
+    """Latency percentiles in milliseconds of a group of requests."""
+    ack = [r.acked_at - r.sent_at for r in requests if r.acked_at is not None]
+    completion = [r.finished_at - r.sent_at for r in requests if r.finished_at is not None]
+    queued = [r.started_at - r.queued_at for r in requests if r.started_at is not None and r.queued_at is not None]
+    summary = {
+        "requests": len(requests),
+        "acked": sum(r.acked for r in requests),
+        "completed": len(completion),
+    }
+    for name, values in (("ack", ack), ("completion", completion), ("queue_wait", queued)):
+        for q in PERCENTILES:
+            value = percentile(values, q)
+            summary[f"{name}_p{q}_ms"] = None if value is None else value * 1e3
+    return summary
+
+
+def run(requests: Sequence[Request], concurrency: int, workers: int, rate: Optional[float], slack_latency_s: float,
+        alerts_page: str, verbose: bool = False) -> Dict[str, object]:
+    """Dispatch every request through the bolt app and collect the timings."""
+    from slack_bolt.request import BoltRequest
+
+    import alert_aggregator
+    import slackbot
+
+    if not verbose:
+        logging.disable(logging.WARNING)
+
+    executor = InstrumentedExecutor(workers)
+    app = slackbot.get_app(listener_executor=executor)
+
+    with FakeSlack(latency_s=slack_latency_s) as fake, FixtureServer() as fixtures:
+        offline_env.use_fixture_server(fixtures)
+        alert_aggregator.DEFAULT_GC_REGIONS = [alerts_page]
+        slackbot.get_web_client().base_url = fake.api_url
+
+        def dispatch(request: Request):
+            if rate:
+                # Open loop: send at the request's arrival time whatever the backlog is
+                delay = start + request.id / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            bolt_request = BoltRequest(body=request.body(), mode="socket_mode")
+            executor.current.request = request
+            request.sent_at = time.perf_counter()
+            try:
+                app.dispatch(bolt_request)
+            finally:
+                executor.current.request = None
+            # Includes the up to 10 ms bolt sleeps between checks for the ack
+            request.acked_at = time.perf_counter()
+            request.acked = bolt_request.context.ack.response is not None
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="socket-mode") as clients:
+            list(clients.map(dispatch, requests))
+
+        deadline = time.monotonic() + DRAIN_TIMEOUT_S
+        while any(r.finished_at is None and r.queued_at is not None for r in requests) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        elapsed_s = time.perf_counter() - start
+        num_messages = len(fake.messages)
+
+    for job in slackbot.SCHEDULER.list_jobs():
+        if job.name.endswith(tuple(r.channel_id for r in requests)):
+            slackbot.SCHEDULER.cancel(job.name)
+    executor.shutdown(wait=False)
+
+    completed = sum(r.finished_at is not None for r in requests)
+    by_command: Dict[str, List[Request]] = {}
+    for request in requests:
+        by_command.setdefault(request.label, []).append(request)
+
+    return {
+        "overall": {
+            **summarize(requests),
+            "elapsed_s": elapsed_s,
+            "throughput_per_s": completed / elapsed_s if elapsed_s > 0 else None,
+            "messages_posted": num_messages,
+        },
+        "pool": {
+            "workers": workers,
+            "max_busy": executor.max_busy,
+            "max_queued": executor.max_queued,
+            "saturated_fraction": executor.saturated_s / elapsed_s if elapsed_s > 0 else None,
+        },
+        "commands": {label: summarize(group) for label, group in sorted(by_command.items())},
+    }
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_report(report: Dict[str, object]):
+    print(f"{'command':<32}{'n':>6}{'acked':>7}{'ack p50':>10}{'ack p99':>10}{'done p50':>10}{'done p99':>10}"
+          f"{'wait p99':>10}")
+    rows = list(report["commands"].items()) + [("all", report["overall"])]
+    for label, s in rows:
+        print(f"{label:<32}{s['requests']:>6}{s['acked']:>7}{_ms(s['ack_p50_ms']):>10}{_ms(s['ack_p99_ms']):>10}"
+              f"{_ms(s['completion_p50_ms']):>10}{_ms(s['completion_p99_ms']):>10}{_ms(s['queue_wait_p99_ms']):>10}")
+    overall, pool = report["overall"], report["pool"]
+    print(f"\nthroughput {overall['throughput_per_s']:.1f} commands/s over {overall['elapsed_s']:.2f} s, "
+          f"{overall['messages_posted']} messages posted")
+    print(f"listener pool: {pool['max_busy']}/{pool['workers']} workers busy at peak, {pool['max_queued']} tasks "
+          f"queued at peak, all workers busy {pool['saturated_fraction'] * 100:.1f}% of the time")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted commands, e.g. /pass_info:7=1,/weather_alerts=3")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="number of commands to send")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="client threads sending commands")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="bolt listener threads")
+    parser.add_argument("--rate", type=float, help="send at this many commands per second instead of as fast as "
+                                                   "the client threads allow")
+    parser.add_argument("--slack-latency-ms", type=float, default=0.0, help="delay added to fake Slack API calls")
+    parser.add_argument("--alerts", choices=["active_alerts", "no_alerts"], default="active_alerts",
+                        help="weather.gc.ca fixture page to serve")
+    parser.add_argument("--verbose", action="store_true", help="show the log messages of the handlers")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the command sequence")
+    parser.add_argument("--output", help="JSON file to write the report to")
+    args = parser.parse_args(argv)
+
+    requests = make_requests(parse_mix(args.mix), args.requests, args.seed)
+    report = run(requests, args.concurrency, args.workers, args.rate, args.slack_latency_ms / 1e3, args.alerts,
+                 args.verbose)
+    print_report(report)
+
+    if args.output:
+        report["meta"] = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": offline_env.git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+'''
+Offline environment shared by the benchmarks and the load test: caches and stores in a
+temporary directory, no Slack token check, and Celestrak and weather.gc.ca replaced by a
+FixtureServer.
+'''
+
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+
+
+def configure(prefix: str = "slackbots-bench-") -> str:
+    """
+    Point the caches and stores of the bot at a new temporary directory and make the bot
+    modules importable. Must be called before the bot modules are imported, they read the
+    environment at import time.
+
+    :param prefix: Prefix of the temporary directory name.
+
+    Returns: path of the temporary directory
+    """
+    state_dir = tempfile.mkdtemp(prefix=prefix)
+    os.environ["TLE_CACHE_DIR"] = os.path.join(state_dir, "tle")
+    os.environ["TLE_CATALOG_PATH"] = os.path.join(state_dir, "tle_catalog.db")
+    os.environ["STATE_DB_PATH"] = os.path.join(state_dir, "state.db")
+    os.environ["CELESTRAK_GROUPS"] = ""
+    os.environ["METRICS_PORT"] = "0"
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-benchmark")
+    os.environ["SLACK_TOKEN_VERIFICATION"] = "0"
+    os.environ.pop("WEATHERBIT_TOKEN", None)
+
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    return state_dir
+
+
+def use_fixture_server(server):
+    """
+    Send the Celestrak and weather.gc.ca requests of the bot to a FixtureServer.
+
+    :param server: Running fixture_server.FixtureServer.
+    """
+    import alert_aggregator
+    import pass_planner_helper
+
+    pass_planner_helper.CELESTRAK_URL = server.url("/NORAD/elements/gp.php?CATNR={norad_catalog_num}&FORMAT=tle")
+    alert_aggregator.GC_REPORT_URL = server.url("/warnings/report_e.html?{region}")
+
+
+def git_commit() -> Optional[str]:
+    """Returns the short hash of the checked out commit, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,237 @@
+'''
+Offline benchmarks of the pass planner and the weather alert pipeline.
+
+Celestrak and weather.gc.ca are replaced by a local server answering with the synthetic
+responses in benchmarks/fixtures, and every cache and store is created in a temporary
+directory, so runs are repeatable and need neither network access nor Slack credentials.
+Passes are computed from the epoch of the fixture TLE rather than the current time, so the
+same passes are propagated on every run and saved results stay comparable.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json --only pass_info
+
+Each benchmark reports the min/median/mean wall time of a call, throughput in calls and
+items (e.g. passes) per second, and the peak memory traced by tracemalloc during one extra
+call. Allocations made in worker processes are not traced.
+'''
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import offline_env
+from fixture_server import FIXTURE_DIR, FixtureServer
+
+# Must run before the bot modules are imported, they read the environment at import time
+offline_env.configure()
+
+DEFAULT_REPEAT = 5
+NO_ALERTS_REGION = "no_alerts"
+ACTIVE_ALERTS_REGION = "active_alerts"
+
+
+class Benchmark(NamedTuple):
+    """A named function to time. items returns the number of units a call processed."""
+    name: str
+    func: Callable[[], object]
+    items: Callable[[object], int] = lambda result: 1
+    unit: str = "calls"
+    repeat: Optional[int] = None
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Dict[str, float]:
+    """
+    Time a benchmark and trace its peak memory.
+
+    :param benchmark: Benchmark to run.
+    :param repeat: Number of timed calls, overridden by benchmark.repeat.
+    """
+    repeat = benchmark.repeat or repeat
+
+    # Untimed call so imports and first use caches do not count
+    result = benchmark.func()
+    items = benchmark.items(result)
+
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        benchmark.func()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    benchmark.func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median_s = statistics.median(times)
+    return {
+        "repeat": repeat,
+        "items": items,
+        "unit": benchmark.unit,
+        "min_s": min(times),
+        "median_s": median_s,
+        "mean_s": statistics.fmean(times),
+        "calls_per_s": 1.0 / median_s if median_s > 0 else float("inf"),
+        "items_per_s": items / median_s if median_s > 0 else float("inf"),
+        "peak_mem_kib": peak / 1024.0,
+    }
+
+
+def fixture_epoch() -> datetime:
+    """Epoch of the first TLE in the Celestrak fixture, the start time of every pass search."""
+    from tle_cache import tle_epoch
+
+    with open(os.path.join(FIXTURE_DIR, "celestrak_tle.txt")) as f:
+        line_1 = next(line for line in f if line.startswith("1 "))
+    return tle_epoch(line_1)
+
+
+def planner_benchmarks() -> List[Benchmark]:
+    """Benchmarks of pass computation and pass table rendering."""
+    import slackbot
+    import numpy as np
+    from pass_planner_helper import (ADAPTIVE_MIN_STEP_S, SAMPLING_ADAPTIVE, PassInfo, compute_passes, find_passes,
+                                     get_context, get_sat)
+
+    context = get_context()
+    sat = get_sat(context=context)
+    t0 = fixture_epoch()
+    start = context.timescale.from_datetime(t0)
+    windows = [(pi.start_dt_utc, pi.end_dt_utc, [pi.culmination_dt_utc])
+               for pi in find_passes(sat, start, start + 1, context=context)[0]]
+
+    def pass_infos(**kwargs):
+        return lambda: [PassInfo(sat, pass_start, pass_end, context=context, **kwargs)
+                        for pass_start, pass_end, _ in windows]
+
+    def pass_infos_with_culminations():
+        return [PassInfo(sat, pass_start, pass_end, culminations=culminations, context=context)
+                for pass_start, pass_end, culminations in windows]
+
+    def pass_infos_fixed_1s():
+        # Fixed sampling as fine as the finest adaptive step, the baseline adaptive sampling is compared to
+        passes = []
+        for pass_start, pass_end, culminations in windows:
+            pi = PassInfo(sat, pass_start, pass_end, culminations=culminations, context=context)
+            pi._propagate(sat, np.arange(0.0, (pass_end - pass_start).total_seconds(), ADAPTIVE_MIN_STEP_S))
+            passes.append(pi)
+        return passes
+
+    def pass_infos_stepwise():
+        return [PassInfo(sat, pass_start, pass_end, vectorized=False, context=context)
+                for pass_start, pass_end, _ in windows]
+
+    return [
+        Benchmark("compute_passes_1d", lambda: compute_passes(num_days=1, context=context, start=start), len, "passes"),
+        Benchmark("compute_passes_7d", lambda: compute_passes(num_days=7, context=context, start=start), len, "passes"),
+        Benchmark("compute_passes_30d", lambda: compute_passes(num_days=30, context=context, start=start), len, "passes",
+                  repeat=3),
+        Benchmark("pass_info_fixed", pass_infos(), len, "passes"),
+        Benchmark("pass_info_stepwise", pass_infos_stepwise, len, "passes"),
+        Benchmark("pass_info_culminations", pass_infos_with_culminations, len, "passes"),
+        Benchmark("pass_info_fixed_1s", pass_infos_fixed_1s, len, "passes"),
+        Benchmark("pass_info_adaptive", pass_infos(sampling=SAMPLING_ADAPTIVE), len, "passes"),
+        Benchmark("get_pass_table_1d", lambda: slackbot.get_pass_table(num_days=1, start=t0), lambda table: table.count("\n"),
+                  "rows"),
+        Benchmark("get_pass_table_7d", lambda: slackbot.get_pass_table(num_days=7, start=t0), lambda table: table.count("\n"),
+                  "rows", repeat=3),
+    ]
+
+
+def alert_benchmarks() -> List[Benchmark]:
+    """Benchmarks of weather.gc.ca parsing and alert collection."""
+    import slackbot
+    from alert_aggregator import AlertAggregator, gc_source
+    from alert_parser import parse_gc_report
+
+    benchmarks = []
+    for region in (NO_ALERTS_REGION, ACTIVE_ALERTS_REGION):
+        with open(os.path.join(FIXTURE_DIR, f"gc_{region}.html")) as f:
+            html = f.read()
+
+        aggregator = AlertAggregator([gc_source(region)])
+
+        def collect_fresh(region=region):
+            # A new aggregator has no previous response, so every call downloads and parses
+            slackbot.ALERT_AGGREGATOR = AlertAggregator([gc_source(region)])
+            return slackbot.get_weather_alerts()
+
+        def collect_conditional(aggregator=aggregator):
+            # The server answers 304 Not Modified so only the request is paid for
+            slackbot.ALERT_AGGREGATOR = aggregator
+            return slackbot.get_weather_alerts()
+
+        page_bytes = lambda alerts, html=html: len(html.encode())
+        benchmarks += [
+            Benchmark(f"parse_gc_report_{region}", lambda html=html, region=region: parse_gc_report(html, region),
+                      page_bytes, "bytes", repeat=50),
+            Benchmark(f"get_weather_alerts_{region}", collect_fresh, page_bytes, "bytes", repeat=20),
+            Benchmark(f"get_weather_alerts_{region}_not_modified", collect_conditional, repeat=20),
+        ]
+    return benchmarks
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Dict[str, float]]] = None):
+    header = f"{'benchmark':<46}{'median ms':>12}{'throughput':>22}{'peak KiB':>12}"
+    if baseline is not None:
+        header += f"{'speedup':>10}"
+    print(header)
+    for name, result in results.items():
+        throughput = f"{result['items_per_s']:.1f} {result['unit']}/s"
+        line = f"{name:<46}{result['median_s'] * 1e3:>12.2f}{throughput:>22}{result['peak_mem_kib']:>12.1f}"
+        if baseline is not None:
+            previous = baseline.get(name)
+            line += f"{previous['median_s'] / result['median_s']:>9.2f}x" if previous else f"{'-':>10}"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed calls per benchmark")
+    parser.add_argument("--only", help="only run benchmarks whose name contains this text")
+    args = parser.parse_args(argv)
+
+    with FixtureServer() as server:
+        offline_env.use_fixture_server(server)
+
+        benchmarks = planner_benchmarks() + alert_benchmarks()
+        if args.only:
+            benchmarks = [benchmark for benchmark in benchmarks if args.only in benchmark.name]
+
+        results = {}
+        for benchmark in benchmarks:
+            results[benchmark.name] = measure(benchmark, args.repeat)
+            print(f"{benchmark.name}: {results[benchmark.name]['median_s'] * 1e3:.2f} ms", file=sys.stderr)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    print_results(results, baseline)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": offline_env.git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
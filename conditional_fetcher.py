@@ -0,0 +1,123 @@
+'''
+HTTP fetcher which only re-parses a page when its content has changed.
+'''
+
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import counter
+
+DEFAULT_POOL_SIZE = 4
+
+FETCH_BYTES = counter("http_fetch_bytes_total", "Response body bytes downloaded by conditional fetchers", ["url"])
+FETCH_RESPONSES = counter("http_fetch_responses_total",
+                          "Conditional fetches by result (not_modified, unchanged, parsed, error)", ["url", "result"])
+
+
+def make_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Create a requests session which keeps connections alive between requests.
+
+    :param pool_size: Max number of pooled connections per host.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ConditionalFetcher:
+    """
+    Fetches a URL over a pooled keep-alive session with conditional GET requests
+    (If-None-Match/If-Modified-Since). When the server answers 304 Not Modified, or the body
+    hashes to the same digest as last time, parsing is skipped and the previous parse result is
+    returned.
+    """
+    def __init__(self, url: str, parse: Callable[[str], Any], timeout: float,
+                 session: Optional[requests.Session] = None):
+        """
+        Create a ConditionalFetcher instance.
+
+        :param url: URL to fetch.
+        :param parse: Function turning the response text into the result returned by fetch().
+        :param timeout: Request timeout in seconds.
+        :param session: Session to send requests with, defaults to a new pooled session.
+        """
+        self._url = url
+        self._parse = parse
+        self._timeout = timeout
+        self._session = session or make_session()
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._digest: Optional[bytes] = None
+        self._result: Any = None
+        self._stats = {"requests": 0, "not_modified": 0, "unchanged": 0, "parsed": 0, "bytes": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """URL being fetched"""
+        return self._url
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Number of requests, 304 responses, unchanged bodies, parses and bytes downloaded"""
+        with self._lock:
+            return dict(self._stats)
+
+    def fetch(self) -> Any:
+        """
+        Fetch the URL and return the parse result of its current content. Raises
+        requests.RequestException when the request fails or returns an error status.
+        """
+        with self._lock:
+            headers = {}
+            if self._digest is not None:
+                if self._etag:
+                    headers["If-None-Match"] = self._etag
+                if self._last_modified:
+                    headers["If-Modified-Since"] = self._last_modified
+
+        try:
+            response = self._session.get(self._url, headers=headers, timeout=self._timeout)
+        except requests.RequestException:
+            FETCH_RESPONSES.inc(url=self._url, result="error")
+            raise
+
+        FETCH_BYTES.inc(len(response.content), url=self._url)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["bytes"] += len(response.content)
+
+            if response.status_code == requests.codes.not_modified and self._digest is not None:
+                self._stats["not_modified"] += 1
+                FETCH_RESPONSES.inc(url=self._url, result="not_modified")
+                return self._result
+
+        if not response.ok:
+            FETCH_RESPONSES.inc(url=self._url, result="error")
+        response.raise_for_status()
+        digest = hashlib.sha256(response.content).digest()
+
+        with self._lock:
+            self._etag = response.headers.get("ETag")
+            self._last_modified = response.headers.get("Last-Modified")
+            if digest == self._digest:
+                self._stats["unchanged"] += 1
+                FETCH_RESPONSES.inc(url=self._url, result="unchanged")
+                return self._result
+
+        result = self._parse(response.text)
+
+        with self._lock:
+            self._digest = digest
+            self._result = result
+            self._stats["parsed"] += 1
+        FETCH_RESPONSES.inc(url=self._url, result="parsed")
+
+        return result
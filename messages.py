@@ -1,15 +1,29 @@
 Messages = {
     "daily_update_enabled" : "Sorry, it looks like daily updates are already enabled",
     "daily_update_disabled" : "Daily updates enabled",
+    "daily_update_stopped" : "Daily updates disabled",
     "pass_info" : "Pass info command received",
+    "pass_info_invalid_days" : "Usage: /pass_info [days], where days is a whole number from 1 to 30",
     "app_mention" : "App mentioned in channel",
     "message" : "Message received from slack channel",
     "http_error" : "HTTP request failed",
-    "weather_alerts" : "New weather alert(s): https://weather.gc.ca/warnings/report_e.html?bc43",
+    "busy" : "Sorry, too many requests are being processed right now, please try again in a minute",
+    "warm_up_done" : "Pass planner loaded",
+    "warm_up_failed" : "Pass planner warm up failed",
+    "weather_alerts" : "New weather alert(s)",
     "new_weather_alerts" : "New weather alerts detected",
     "no_weather_alerts" : "No weather alerts detected",
     "persistent_weather_alerts_enabled" : "Sorry, it looks like persistent weather alerts are already enabled",
     "persistent_weather_alerts_disabled" : "Persistent weather alerts enabled",
+    "persistent_weather_alerts_stopped" : "Persistent weather alerts disabled",
+    "pass_notifications_enabled" : "Pass notifications enabled",
+    "pass_notifications_stopped" : "Pass notifications disabled",
+    "pass_notifications_restore_failed" : "Pass notifications could not be restored",
+    "pass_notifications_invalid" : "Usage: /pass_notifications [lead minutes] [min elevation (deg)] [min rating], where lead minutes is a whole number from 1 to 120 and min rating is a whole number from 0 to 3",
+    "scheduled_jobs" : "Scheduled jobs command received",
+    "no_scheduled_jobs" : "No scheduled jobs",
+    "state_restored" : "Scheduled jobs restored from state store",
+    "tle_catalog_refreshed" : "TLE catalog refreshed from Celestrak groups",
     "weatherbit_url" : "https://api.weatherbit.io/v2.0/alerts?city=Victoria&state=BC&country=CA&key=",
-    "weather_gc_url" : "https://weather.gc.ca/warnings/report_e.html?bc43"
+    "weather_gc_url" : "https://weather.gc.ca/warnings/report_e.html?{region}"
 }
\ No newline at end of file
@@ -0,0 +1,453 @@
+'''
+In-process counters and latency histograms exposed in the Prometheus text format, with an
+optional cProfile capture of the instrumented calls.
+'''
+
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.environ.get("METRICS_PORT", 9464))  # 0 disables the endpoint
+PROFILE_ON_START = os.environ.get("METRICS_PROFILE", "0") == "1"
+PROFILE_REPORT_LINES = 40
+# Sort keys accepted by /profile: the pstats.SortKey values plus the aliases documented for sort_stats
+PROFILE_SORT_KEYS = frozenset(key.value for key in pstats.SortKey) | {"cumtime", "tottime", "ncalls", "file", "module"}
+
+logger = logging.getLogger(__name__)
+
+# Only one profiler can be active per interpreter on Python >= 3.12
+_PROFILE_LOCK = threading.Lock()
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or bytes."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Increase the count of a label combination.
+
+        :param amount: Non negative amount to add.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Returns the count of a label combination."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """Value which goes up and down, e.g. the last lag of a job."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        """Set the value of a label combination."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> Optional[float]:
+        """Returns the value of a label combination, or None if it was never set."""
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g. latencies, in cumulative buckets."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per label combination: (count per bucket, sum, count)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        """Record one observation."""
+        key = self._key(labels)
+        with self._lock:
+            counts, totals = self._values.setdefault(key, ([0] * len(self.buckets), [0.0, 0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            totals[0] += value
+            totals[1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Context manager observing the wall time of its block in seconds."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def count(self, **labels) -> int:
+        """Returns the number of observations of a label combination."""
+        with self._lock:
+            values = self._values.get(self._key(labels))
+            return int(values[1][1]) if values else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._values.items())
+        lines = []
+        for key, (counts, (total, count)) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {int(count)}")
+        return lines
+
+
+class Registry:
+    """Named metrics of a process. Asking for an existing name returns the existing metric."""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Returns the counter with a name, creating it on first use."""
+        return self._get(Counter, name, help, labelnames=labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Returns the gauge with a name, creating it on first use."""
+        return self._get(Gauge, name, help, labelnames=labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Returns the histogram with a name, creating it on first use."""
+        return self._get(Histogram, name, help, labelnames=labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    def _get(self, cls, name: str, help: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+
+class Profiler:
+    """
+    Collects cProfile statistics of the calls made through timed(...) while it is enabled.
+    Outermost instrumented calls are profiled one at a time, whichever thread they run on, and
+    the statistics are merged. Calls made while another call is being profiled run unprofiled,
+    so profiling never fails or delays them. Nested instrumented calls are part of the profile
+    of the outer call.
+    """
+    def __init__(self, enabled: bool = False):
+        self._enabled = enabled
+        self._stats: Optional[pstats.Stats] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether instrumented calls are being profiled"""
+        return self._enabled
+
+    def enable(self):
+        """Start profiling instrumented calls, discarding earlier statistics."""
+        with self._lock:
+            self._stats = None
+            self._enabled = True
+
+    def disable(self):
+        """Stop profiling. The statistics collected so far are kept for report(...)."""
+        self._enabled = False
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Call a function, profiling it if profiling is enabled and no other call is profiled."""
+        if not self._enabled or getattr(self._local, "active", False) or not _PROFILE_LOCK.acquire(blocking=False):
+            return func(*args, **kwargs)
+
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # A profiler started outside of this module is active
+                profile = None
+            if profile is None:
+                return func(*args, **kwargs)
+
+            self._local.active = True
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                self._local.active = False
+                self._merge(profile)
+        finally:
+            _PROFILE_LOCK.release()
+
+    def _merge(self, profile: cProfile.Profile):
+        """Add the statistics of a profiled call, errors are logged rather than raised to the caller."""
+        try:
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+        except Exception:
+            logger.exception("Profile statistics could not be collected")
+
+    def report(self, sort: str = "cumulative", limit: int = PROFILE_REPORT_LINES) -> str:
+        """
+        Returns the collected statistics as text.
+
+        :param sort: pstats sort key, e.g. cumulative or tottime, see PROFILE_SORT_KEYS.
+        :param limit: Number of functions to list.
+
+        Raises: ValueError if sort is not a pstats sort key
+        """
+        if sort not in PROFILE_SORT_KEYS:
+            raise ValueError(f"Unknown sort key {sort}, expected one of {', '.join(sorted(PROFILE_SORT_KEYS))}")
+
+        with self._lock:
+            if self._stats is None:
+                return "No profile collected\n"
+            out = io.StringIO()
+            self._stats.stream = out
+            self._stats.sort_stats(sort).print_stats(limit)
+            return out.getvalue()
+
+
+REGISTRY = Registry()
+PROFILER = Profiler(enabled=PROFILE_ON_START)
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Returns the counter with a name from the process registry."""
+    return REGISTRY.counter(name, help, labelnames)
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Returns the gauge with a name from the process registry."""
+    return REGISTRY.gauge(name, help, labelnames)
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Returns the histogram with a name from the process registry."""
+    return REGISTRY.histogram(name, help, labelnames, buckets)
+
+
+CALL_LATENCY = histogram("call_duration_seconds", "Wall time of instrumented calls", ["function"])
+CALL_ERRORS = counter("call_errors_total", "Instrumented calls which raised an exception", ["function"])
+
+
+def timed(name: Optional[str] = None):
+    """
+    Decorator recording the wall time of every call in CALL_LATENCY, and counting calls which
+    raise in CALL_ERRORS, under function=name. Calls are profiled while PROFILER is enabled.
+    The decorated function keeps the signature of the original, so it can be registered as a
+    Slack listener. Coroutine functions are timed until they return, without profiling.
+
+    :param name: Value of the function label, defaults to the function name.
+    """
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException:
+                    CALL_ERRORS.inc(function=label)
+                    raise
+                finally:
+                    CALL_LATENCY.observe(time.perf_counter() - t0, function=label)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return PROFILER.call(func, *args, **kwargs)
+            except BaseException:
+                CALL_ERRORS.inc(function=label)
+                raise
+            finally:
+                CALL_LATENCY.observe(time.perf_counter() - t0, function=label)
+
+        return wrapper
+    return decorator
+
+
+class MetricsServer:
+    """
+    HTTP server exposing a registry. GET /metrics returns the metrics, GET /profile/start
+    enables PROFILER, GET /profile/stop disables it and GET /profile returns the report
+    (query sort=tottime to change the order).
+    """
+    def __init__(self, port: int = DEFAULT_PORT, host: str = DEFAULT_HOST, registry: Registry = REGISTRY,
+                 profiler: Profiler = PROFILER):
+        """
+        Create a MetricsServer instance. Binds to localhost by default so the endpoint is not
+        reachable from other machines.
+
+        :param port: Port to listen on, 0 picks a free port.
+        :param host: Interface to listen on.
+        """
+        self._registry = registry
+        self._profiler = profiler
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        """Port the server listens on"""
+        return self._server.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        """Serve from a daemon thread."""
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        registry = self._registry
+        profiler = self._profiler
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                params = dict(part.split("=", 1) for part in query.split("&") if "=" in part)
+
+                if path == "/metrics":
+                    self._send(registry.render(), "text/plain; version=0.0.4; charset=utf-8")
+                elif path == "/profile/start":
+                    profiler.enable()
+                    self._send("Profiling enabled\n")
+                elif path == "/profile/stop":
+                    profiler.disable()
+                    self._send_report(params.get("sort", "cumulative"))
+                elif path == "/profile":
+                    self._send_report(params.get("sort", "cumulative"))
+                else:
+                    self.send_error(404)
+
+            def _send_report(self, sort: str):
+                try:
+                    report = profiler.report(sort)
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                self._send(report)
+
+            def _send(self, text: str, content_type: str = "text/plain; charset=utf-8"):
+                body = text.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def start_http_server(port: int = DEFAULT_PORT, host: str = DEFAULT_HOST) -> Optional[MetricsServer]:
+    """
+    Start serving the process registry, unless port is 0.
+
+    :param port: Port to listen on.
+    :param host: Interface to listen on.
+    """
+    if port == 0:
+        return None
+    return MetricsServer(port, host).start()
@@ -0,0 +1,272 @@
+'''
+Pre-pass notifications scheduled from the precomputed pass schedule.
+'''
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from metrics import counter
+from pass_planner_helper import PassInfo
+from pass_schedule import PassSchedule
+from scheduler import Scheduler, every, once
+from state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_JOB = "pass_notification"
+REPLAN_JOB = "pass_notification_replan"
+REPLAN_INTERVAL = timedelta(hours=1)
+DEFAULT_LEAD_MINUTES = 10
+NOTIFICATION_DT_FORMAT = "%H:%M:%S"
+
+NOTIFICATIONS = counter("pass_notifications_total", "Pre-pass notifications posted")
+REPLANS = counter("pass_notification_replans_total", "Notification plan updates by reason (tle, horizon, none)",
+                  ["reason"])
+
+# Posts text to a channel, called with (channel id, text)
+Poster = Callable[[str, str], None]
+
+
+class Subscription(NamedTuple):
+    """Pre-pass notification settings of a channel."""
+    channel_id: str
+    lead_minutes: int = DEFAULT_LEAD_MINUTES
+    min_alt_deg: float = 0.0
+    min_rating: int = 0
+
+    def accepts(self, pi: PassInfo) -> bool:
+        """True if the pass clears the elevation and rating filters of the subscription."""
+        return pi.max_alt_deg >= self.min_alt_deg and pi.rating >= self.min_rating
+
+    def notify_at(self, pi: PassInfo) -> datetime:
+        """Time in UTC the notification of a pass is posted at."""
+        return pi.start_dt_utc - timedelta(minutes=self.lead_minutes)
+
+
+def format_notification(pi: PassInfo, lead_minutes: int, local_tz=None) -> str:
+    """
+    Text of a pre-pass notification. The azimuths at AOS, culmination and LOS are computed
+    in one vectorized propagation when the notification is posted.
+
+    :param pi: The upcoming pass.
+    :param lead_minutes: Minutes between the notification and AOS.
+    :param local_tz: Time zone the times are shown in, defaults to the pass' local time zone.
+    """
+    culmination_s = (pi.culmination_dt_utc - pi.start_dt_utc).total_seconds()
+    _, az_deg, _ = pi.look_angles(np.array([0.0, culmination_s, pi.duration.total_seconds()]))
+
+    aos = pi.local_start_time if local_tz is None else pi.start_dt_utc.astimezone(local_tz)
+    culmination = pi.culmination_dt_utc.astimezone(aos.tzinfo)
+    los = pi.local_end_time if local_tz is None else pi.end_dt_utc.astimezone(local_tz)
+
+    return (f"{pi.sat_name} pass in {lead_minutes} min\n"
+            f"AOS {aos.strftime(NOTIFICATION_DT_FORMAT)} az {az_deg[0]:.0f} deg\n"
+            f"Max elev {pi.max_alt_deg:.0f} deg at {culmination.strftime(NOTIFICATION_DT_FORMAT)} az {az_deg[1]:.0f} deg\n"
+            f"LOS {los.strftime(NOTIFICATION_DT_FORMAT)} az {az_deg[2]:.0f} deg\n"
+            f"Duration {pi.duration.total_seconds():.0f} s, rating {pi.rating}")
+
+
+def _local_naive(value: datetime) -> datetime:
+    """Convert an aware datetime to the naive local time used by Scheduler."""
+    return value.astimezone().replace(tzinfo=None)
+
+
+class PassNotifier:
+    """
+    Posts a notification to each subscribed channel a number of minutes before every pass
+    which clears the channel's filters. Passes are read from a PassSchedule and each
+    notification is a one-off Scheduler job, so nothing runs between notifications except a
+    cheap hourly replan. The replan refreshes the schedule, which only propagates the newly
+    uncovered tail of the horizon, and registers jobs for the passes that appeared. All jobs
+    are replaced only when the schedule switches to a TLE with a different epoch.
+
+    Notification jobs run on a thread of their own rather than the scheduler's worker pool,
+    so they are posted on time however long the other jobs take. Every pass is notified at
+    most once per channel, and when a StateStore is given the sent notifications are
+    persisted so they are not posted again after a restart.
+    """
+    def __init__(self, schedule: PassSchedule, scheduler: Scheduler, post: Poster,
+                 replan_interval: timedelta = REPLAN_INTERVAL, store: Optional[StateStore] = None):
+        """
+        Create a PassNotifier instance. Nothing is scheduled until the first subscription.
+
+        :param schedule: Schedule the passes are read from. Its horizon bounds the lead time.
+        :param scheduler: Scheduler the notification and replan jobs are registered with.
+        :param post: Function posting the notification text to a channel.
+        :param replan_interval: Time between checks for new passes and TLEs.
+        :param store: Store to persist sent notifications in, or None to keep them in memory only.
+        """
+        self._schedule = schedule
+        self._scheduler = scheduler
+        self._post = post
+        self._replan_interval = replan_interval
+        self._store = store
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pass-notifier")
+        self._subscriptions: Dict[str, Subscription] = {}
+        # Registered notification jobs by channel, name -> pass start
+        self._jobs: Dict[str, Dict[str, datetime]] = {}
+        # Unix start times of the passes notified by channel
+        self._sent: Dict[str, Set[int]] = {}
+        self._plan_key: Optional[Tuple[Optional[datetime], timedelta]] = None
+        self._planned_until: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def subscriptions(self) -> List[Subscription]:
+        """Returns the current subscriptions ordered by channel."""
+        with self._lock:
+            return [self._subscriptions[channel_id] for channel_id in sorted(self._subscriptions)]
+
+    def subscribe(self, subscription: Subscription, now: Optional[datetime] = None, announce_late: bool = True) -> int:
+        """
+        Add or replace the subscription of a channel and schedule its notifications. Passes
+        the channel was already notified about are skipped.
+
+        :param subscription: Channel and filters to notify with.
+        :param now: Current time in UTC, defaults to the system clock.
+        :param announce_late: Announce a pass starting sooner than the lead time right away, as
+            a user subscribing expects. Subscriptions restored after a restart skip these passes.
+
+        Returns: Number of notifications scheduled for the channel
+        """
+        if timedelta(minutes=subscription.lead_minutes) >= self._schedule.horizon:
+            raise ValueError(f"Lead time of {subscription.lead_minutes} min is not shorter than the schedule horizon "
+                             f"of {self._schedule.horizon}")
+
+        now = now or datetime.now(timezone.utc)
+        passes = self._schedule.refresh(now)
+
+        with self._lock:
+            self._cancel_channel(subscription.channel_id)
+            self._subscriptions[subscription.channel_id] = subscription
+            if subscription.channel_id not in self._sent:
+                self._sent[subscription.channel_id] = self._load_sent(subscription.channel_id)
+            if self._plan_key is None:
+                self._plan_key = (self._schedule.tle_epoch, self._schedule.horizon)
+                self._planned_until = passes[-1].start_dt_utc if passes else now
+            upcoming = [pi for pi in passes if pi.start_dt_utc > now and
+                        (self._planned_until is None or pi.start_dt_utc <= self._planned_until)]
+            num_jobs = self._schedule_passes(subscription, upcoming, now, announce_late)
+
+        self._scheduler.register(REPLAN_JOB, lambda scheduled: self.replan(), every(self._replan_interval))
+        return num_jobs
+
+    def unsubscribe(self, channel_id: str) -> bool:
+        """
+        Cancel the subscription and the pending notifications of a channel.
+
+        :param channel_id: Channel to stop notifying.
+
+        Returns: False if the channel has no subscription
+        """
+        with self._lock:
+            subscription = self._subscriptions.pop(channel_id, None)
+            self._cancel_channel(channel_id)
+            self._sent.pop(channel_id, None)
+            if self._store is not None:
+                self._store.delete_sent_notifications(channel_id)
+            if not self._subscriptions:
+                self._plan_key = None
+                self._planned_until = None
+                self._scheduler.cancel(REPLAN_JOB)
+        return subscription is not None
+
+    def replan(self, now: Optional[datetime] = None) -> int:
+        """
+        Bring the notification jobs up to date with the pass schedule. Only passes beyond the
+        previously planned ones are scheduled, unless the TLE epoch or the horizon of the
+        schedule changed, in which case every pending notification is replaced.
+
+        :param now: Current time in UTC, defaults to the system clock.
+
+        Returns: Number of notifications scheduled
+        """
+        now = now or datetime.now(timezone.utc)
+        passes = self._schedule.refresh(now)
+        plan_key = (self._schedule.tle_epoch, self._schedule.horizon)
+
+        with self._lock:
+            if not self._subscriptions:
+                return 0
+
+            self._forget_sent(now)
+
+            if plan_key != self._plan_key:
+                reason = "tle" if plan_key[0] != self._plan_key[0] else "horizon"
+                for channel_id in list(self._jobs):
+                    self._cancel_channel(channel_id)
+                new_passes = [pi for pi in passes if pi.start_dt_utc > now]
+            else:
+                reason = "horizon"
+                new_passes = [pi for pi in passes if pi.start_dt_utc > self._planned_until]
+
+            self._plan_key = plan_key
+            if not new_passes:
+                REPLANS.inc(reason="none")
+                return 0
+
+            self._planned_until = new_passes[-1].start_dt_utc
+            num_jobs = sum(self._schedule_passes(subscription, new_passes, now, announce_late=False)
+                           for subscription in self._subscriptions.values())
+
+        REPLANS.inc(reason=reason)
+        return num_jobs
+
+    def _schedule_passes(self, subscription: Subscription, passes: List[PassInfo], now: datetime,
+                         announce_late: bool) -> int:
+        """Register a notification job for each pass the subscription accepts. Called with the lock held."""
+        jobs = self._jobs.setdefault(subscription.channel_id, {})
+        sent = self._sent.setdefault(subscription.channel_id, set())
+        num_jobs = 0
+
+        for pi in passes:
+            notify_at = subscription.notify_at(pi)
+            pass_start_s = int(pi.start_dt_utc.timestamp())
+            # Notifications which are due already were posted before a replan or a restart
+            if (notify_at <= now and not announce_late) or pass_start_s in sent or not subscription.accepts(pi):
+                continue
+
+            job_name = f"{NOTIFICATION_JOB}:{subscription.channel_id}:{pass_start_s}"
+            notify = lambda scheduled, job_name=job_name, pi=pi: self._notify(job_name, subscription, pi)
+            if self._scheduler.register(job_name, notify, once(), first_run=_local_naive(max(notify_at, now)),
+                                        executor=self._executor):
+                jobs[job_name] = pi.start_dt_utc
+                num_jobs += 1
+
+        return num_jobs
+
+    def _cancel_channel(self, channel_id: str):
+        """Cancel the pending notification jobs of a channel. Called with the lock held."""
+        for job_name in self._jobs.pop(channel_id, {}):
+            self._scheduler.cancel(job_name)
+
+    def _load_sent(self, channel_id: str) -> Set[int]:
+        """Start times of the passes a channel was notified about before a restart. Called with the lock held."""
+        if self._store is None:
+            return set()
+        return {int(pass_start_s) for pass_start_s in self._store.load_sent_notifications(channel_id)}
+
+    def _forget_sent(self, now: datetime):
+        """Forget the notifications of passes which have started. Called with the lock held."""
+        now_s = now.timestamp()
+        for sent in self._sent.values():
+            sent.difference_update([pass_start_s for pass_start_s in sent if pass_start_s < now_s])
+        if self._store is not None:
+            self._store.delete_sent_notifications(before_s=now_s)
+
+    def _notify(self, job_name: str, subscription: Subscription, pi: PassInfo):
+        pass_start_s = int(pi.start_dt_utc.timestamp())
+        with self._lock:
+            self._jobs.get(subscription.channel_id, {}).pop(job_name, None)
+            self._sent.setdefault(subscription.channel_id, set()).add(pass_start_s)
+
+        lead_minutes = max(round((pi.start_dt_utc - datetime.now(timezone.utc)).total_seconds() / 60), 0)
+        self._post(subscription.channel_id, format_notification(pi, lead_minutes))
+        NOTIFICATIONS.inc()
+
+        if self._store is not None:
+            self._store.save_sent_notification(subscription.channel_id, pass_start_s)
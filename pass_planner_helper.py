@@ -3,20 +3,76 @@ This code was reproduced from Richard Arthurs via the ORCASat
 gitlab January 17, 2023. 
 '''
 
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, tzinfo
 from dateutil import tz
-from typing import List, SupportsFloat, Tuple, Optional
+import threading
+import time
+from typing import List, NamedTuple, Sequence, Tuple, Optional
+
+import numpy as np
 
 from skyfield.api import EarthSatellite, load
-from skyfield.toposlib import wgs84
+from skyfield.timelib import Time, Timescale
+from skyfield.toposlib import GeographicPosition, wgs84
 import urllib.request
 import urllib.error as url_error
 
+from metrics import counter, timed
+from tle_cache import TLECache
+from tle_catalog import TLECatalog
+import visibility_filter
+
 UVIC_GROUND_STATION = wgs84.latlon(+48.46, -123.31)
 
+PASS_MIN_ALT_DEG = 15.0  # Elevation mask used to find passes (deg)
+TRACK_STEP_S = 10  # Ground track time step (s)
+SECONDS_PER_DAY = 86400.0
+
+SAMPLING_FIXED = "fixed"  # Samples every TRACK_STEP_S seconds
+SAMPLING_ADAPTIVE = "adaptive"  # Samples densely where the look angles curve and sparsely elsewhere
+ADAPTIVE_MAX_STEP_S = 60.0  # Coarsest time step of adaptive sampling (s)
+ADAPTIVE_MIN_STEP_S = 1.0  # Finest time step of adaptive sampling (s)
+ADAPTIVE_TOLERANCE_DEG = 0.1  # Target error of linearly interpolating alt/az between adaptive samples (deg)
+ADAPTIVE_MAX_PASSES = 3  # Max number of refinement propagations of adaptive sampling
+
+CELESTRAK_URL = "https://celestrak.org/NORAD/elements/gp.php?CATNR={norad_catalog_num}&FORMAT=tle"
+CELESTRAK_TIMEOUT_S = 30
+
+PROPAGATION_SAMPLES = counter("propagation_samples_total", "Satellite positions propagated for pass tracks and look angles", ["path"])
+TLE_CATALOG_LOOKUPS = counter("tle_catalog_lookups_total", "TLE catalog lookups by result (hit, stale, miss)", ["result"])
+CELESTRAK_BYTES = counter("celestrak_fetch_bytes_total", "Bytes downloaded from Celestrak by single satellite queries")
+
 USE_MANUAL_TLE = False  # TODO Set to False once we use Celestrak TLE https://gitlab.orcasat.ca/orcasat-group/cdh/gcs/-/issues/209
 ORCASAT_NORAD_ID = 55126 # TODO update from ISS ID to ORCASat ID https://gitlab.orcasat.ca/orcasat-group/cdh/gcs/-/issues/209
 
+class PlanningContext(NamedTuple):
+    """
+    Immutable objects which are expensive to create and are shared by every pass computation.
+    """
+    timescale: Timescale
+    utc: tzinfo
+    local_tz: tzinfo
+    station: GeographicPosition
+
+_CONTEXT: Optional[PlanningContext] = None
+_CONTEXT_LOCK = threading.Lock()
+
+def get_context() -> PlanningContext:
+    """
+    Returns the process wide planning context, loading it on first use.
+    """
+    global _CONTEXT
+    if _CONTEXT is None:
+        with _CONTEXT_LOCK:
+            if _CONTEXT is None:
+                _CONTEXT = PlanningContext(
+                    timescale=load.timescale(),
+                    utc=tz.gettz('UTC'),
+                    local_tz=tz.gettz('Canada/Vancouver'),
+                    station=UVIC_GROUND_STATION,
+                )
+    return _CONTEXT
+
 # tle_name = "ORCAGPS_2023-01-05_0738"
 # line_1 = "1 99999U          23005.31851852 +.00000000  00000 0  00000 0 0 00009"
 # line_2 = "2 99999  51.6443  55.2455 0004903 269.6366 143.8400 15.51087205000004"
@@ -24,49 +80,255 @@ ORCASAT_NORAD_ID = 55126 # TODO update from ISS ID to ORCASat ID https://gitlab.
 class PassInfo:
     """
     Information about a pass including start/end times and satellite ground track.
+
+    The ground track is stored as contiguous float64 arrays, with the time steps kept as
+    offsets in seconds from the pass start rather than as skyfield Time or datetime objects.
     """
-    def __init__(self, sat: EarthSatellite, pass_start: datetime, pass_end:datetime):
+    __slots__ = (
+        "_ctx", "_sat", "_sat_name", "_station", "_vectorized", "_start_dt", "_end_dt",
+        "_sampling", "_tolerance_deg", "_max_alt_deg", "_culmination_dt", "_track_computed", "_t_offset_s",
+        "_latitude_deg", "_longitude_deg", "_d_slant_km", "_alt_deg", "_az_deg",
+    )
+
+    def __init__(self, sat: EarthSatellite, pass_start: datetime, pass_end:datetime, vectorized: bool = True,
+                 station: Optional[GeographicPosition] = None, culminations: Optional[Sequence[datetime]] = None,
+                 context: Optional[PlanningContext] = None, sampling: str = SAMPLING_FIXED,
+                 tolerance_deg: float = ADAPTIVE_TOLERANCE_DEG):
         """
         Create a PassInfo instance.
 
         :param sat: The satellite performing the pass.
         :param pass_start: Pass start time.
         :param pass_end: Pass end time.
+        :param vectorized: Propagate the whole pass in one call over a skyfield time array (default).
+            When False the original step-by-step propagation is used, which is kept as a reference
+            implementation for comparing results.
+        :param station: The ground station the pass is viewed from, defaults to the context station.
+        :param culminations: Culmination times of the pass, e.g. from the events returned by
+            EarthSatellite.find_events. When given, the max elevation is computed from these times
+            alone and the ground track is only computed the first time a track property is read.
+        :param context: Planning context to use, defaults to the process wide context.
+        :param sampling: SAMPLING_FIXED to sample the track every TRACK_STEP_S seconds, or
+            SAMPLING_ADAPTIVE to refine the time step until the estimated error of linearly
+            interpolating the alt/az angles between samples is within tolerance_deg. Adaptive
+            tracks always include the exact AOS and LOS times, and the culmination times when
+            culminations are given.
+        :param tolerance_deg: Interpolation error tolerance of adaptive sampling (deg).
         """
+        if sampling not in (SAMPLING_FIXED, SAMPLING_ADAPTIVE):
+            raise ValueError(f"Unknown sampling mode {sampling}")
+
+        self._ctx = context or get_context()
+        self._sat = sat
         self._sat_name = sat.name
-        self._start_dt = pass_start.replace(tzinfo = tz.gettz('UTC'))
-        self._end_dt = pass_end.replace(tzinfo = tz.gettz('UTC'))
+        self._station = station or self._ctx.station
+        self._vectorized = vectorized
+        self._sampling = sampling
+        self._tolerance_deg = tolerance_deg
+        self._start_dt = pass_start.replace(tzinfo = self._ctx.utc)
+        self._end_dt = pass_end.replace(tzinfo = self._ctx.utc)
+        self._track_computed = False
+        self._culmination_dt = None
+
+        if culminations:
+            t = self._ctx.timescale.from_datetimes([c.replace(tzinfo = self._ctx.utc) for c in culminations])
+            PROPAGATION_SAMPLES.inc(len(culminations), path="culmination")
+            alt, _, _ = (sat - self._station).at(t).altaz()
+            i_max = int(np.argmax(alt.degrees))
+            self._max_alt_deg = float(alt.degrees[i_max])
+            self._culmination_dt = t[i_max].utc_datetime()
+        else:
+            self._ensure_track()
+            i_max = int(np.argmax(self._alt_deg))
+            self._max_alt_deg = float(self._alt_deg[i_max])
+            self._culmination_dt = self._start_dt + timedelta(seconds=float(self._t_offset_s[i_max]))
+
+    def _ensure_track(self):
+        """Compute the ground track the first time it is needed."""
+        if self._track_computed:
+            return
+
+        if self._sampling == SAMPLING_ADAPTIVE:
+            self._compute_track_adaptive(self._sat)
+        elif self._vectorized:
+            self._compute_track(self._sat)
+        else:
+            self._compute_track_stepwise(self._sat)
+
+        self._track_computed = True
+
+    def _compute_track(self, sat: EarthSatellite):
+        """
+        Generate the satellite ground track and azimuth/elevation angles for every 10 second
+        time step of the pass using a single vectorized propagation.
+
+        :param sat: The satellite performing the pass.
+        """
+        duration_s = (self._end_dt - self._start_dt).total_seconds()
+        self._propagate(sat, np.arange(0.0, duration_s, TRACK_STEP_S))
+
+    def _propagate(self, sat: EarthSatellite, offsets_s: np.ndarray):
+        """
+        Compute the ground track and azimuth/elevation angles at the given time steps in a
+        single vectorized propagation and store them as the track of the pass.
+
+        :param sat: The satellite performing the pass.
+        :param offsets_s: Time steps in seconds from the pass start.
+        """
+        self._set_track(offsets_s, *self._sample(sat, offsets_s))
+
+    def _sample(self, sat: EarthSatellite, offsets_s: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Propagate the satellite once per time step and derive both the ground track and the look
+        angles from the same positions.
+
+        :param sat: The satellite performing the pass.
+        :param offsets_s: Time steps in seconds from the pass start.
+
+        Returns: (latitude (deg), longitude (deg), slant range (km), altitude (deg), azimuth (deg))
+        """
+        t = self._ctx.timescale.from_datetime(self._start_dt) + offsets_s / SECONDS_PER_DAY
+        PROPAGATION_SAMPLES.inc(len(offsets_s), path="track")
+
+        geocentric = sat.at(t)
+        lat, lon = wgs84.latlon_of(geocentric)
+        alt, az, d = (geocentric - self._station.at(t)).altaz()
+        return lat.degrees, lon.degrees, d.km, alt.degrees, az.degrees
+
+    def look_angles(self, offsets_s: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Compute the look angles from the ground station at arbitrary times in one vectorized
+        propagation, without touching the stored track.
+
+        :param offsets_s: Times in seconds from the pass start.
+
+        Returns: (altitude (deg), azimuth (deg), slant range (km))
+        """
+        offsets_s = np.asarray(offsets_s, dtype=np.float64)
+        t = self._ctx.timescale.from_datetime(self._start_dt) + offsets_s / SECONDS_PER_DAY
+        PROPAGATION_SAMPLES.inc(offsets_s.size, path="look_angles")
+        alt, az, d = (self._sat - self._station).at(t).altaz()
+        return alt.degrees, az.degrees, d.km
 
+    def _compute_track_adaptive(self, sat: EarthSatellite):
+        """
+        Generate the ground track with a time step which adapts to the look angles. Starting from
+        a grid with ADAPTIVE_MAX_STEP_S spacing that includes AOS, LOS and the culmination when it
+        is known, the error of linearly interpolating the alt/az angles over every interval is
+        estimated from their curvature, and each interval is split into as many equal steps, down
+        to ADAPTIVE_MIN_STEP_S, as bring the estimate within the tolerance. The new samples are
+        propagated in one vectorized call and the estimate is repeated up to ADAPTIVE_MAX_PASSES
+        times. Every propagated sample is kept in the track. Without known culminations, the
+        culmination is the highest sample.
+
+        Adaptive tracks hold about twice the samples of SAMPLING_FIXED tracks and take several
+        propagation calls, so they are slower to compute than SAMPLING_FIXED tracks, whose 10
+        second step leaves interpolation errors of several degrees near the culmination of high
+        passes. They are faster than fixed tracks sampled every ADAPTIVE_MIN_STEP_S, which are
+        needed to bound the error as tightly, see the pass_info_adaptive and pass_info_fixed_1s
+        benchmarks.
+
+        :param sat: The satellite performing the pass.
+        """
+        duration_s = (self._end_dt - self._start_dt).total_seconds()
+        num_steps = max(int(np.ceil(duration_s / ADAPTIVE_MAX_STEP_S)), 1)
+        offsets_s = np.linspace(0.0, duration_s, num_steps + 1)
+        if self._culmination_dt is not None:
+            offsets_s = np.union1d(offsets_s, [(self._culmination_dt - self._start_dt).total_seconds()])
+        # Rows: latitude, longitude, slant range, altitude, azimuth
+        samples = np.array(self._sample(sat, offsets_s))
+
+        for _ in range(ADAPTIVE_MAX_PASSES):
+            # Each interval is split into as many equal steps as its estimated interpolation error needs
+            error_deg = self._interpolation_error_deg(offsets_s, samples[3], samples[4])
+            steps = np.ceil(np.sqrt(error_deg / self._tolerance_deg))
+            steps = np.minimum(steps, np.floor(np.diff(offsets_s) / ADAPTIVE_MIN_STEP_S)).astype(int)
+            split = np.flatnonzero(steps > 1)
+            if not split.size:
+                break
+
+            new_s = np.concatenate([np.linspace(offsets_s[i], offsets_s[i + 1], steps[i] + 1)[1:-1] for i in split])
+            offsets_s = np.concatenate([offsets_s, new_s])
+            samples = np.concatenate([samples, np.array(self._sample(sat, new_s))], axis=1)
+            order = np.argsort(offsets_s, kind="stable")
+            offsets_s, samples = offsets_s[order], samples[:, order]
+
+        self._set_track(offsets_s, *samples)
+
+    @staticmethod
+    def _interpolation_error_deg(offsets_s: np.ndarray, alt_deg: np.ndarray, az_deg: np.ndarray) -> np.ndarray:
+        """
+        Estimate the error of linearly interpolating the look angles over each interval between
+        samples, h^2 |f''| / 8, with f'' taken from the divided differences at both ends.
+        """
+        steps_s = np.diff(offsets_s)
+        errors = np.zeros(steps_s.size)
+        if steps_s.size < 2:
+            return errors
+        for angle_deg in (alt_deg, np.degrees(np.unwrap(np.radians(az_deg)))):
+            slopes = np.diff(angle_deg) / steps_s
+            curvature = np.abs(2.0 * np.diff(slopes) / (steps_s[:-1] + steps_s[1:]))
+            # End samples use the curvature of their only neighbour
+            node_curvature = np.concatenate([curvature[:1], curvature, curvature[-1:]])
+            interval_curvature = np.maximum(node_curvature[:-1], node_curvature[1:])
+            errors = np.maximum(errors, interval_curvature * steps_s ** 2 / 8.0)
+        return errors
+
+    def _track_arrays(self) -> Tuple[np.ndarray, ...]:
+        """The computed ground track in the order expected by _set_track(...)."""
+        self._ensure_track()
+        return (self._t_offset_s, self._latitude_deg, self._longitude_deg, self._d_slant_km,
+                self._alt_deg, self._az_deg)
+
+    def _set_track(self, t_offset_s: np.ndarray, latitude_deg: np.ndarray, longitude_deg: np.ndarray,
+                   d_slant_km: np.ndarray, alt_deg: np.ndarray, az_deg: np.ndarray):
+        """Use a ground track computed elsewhere, e.g. in a worker process."""
+        self._t_offset_s = np.asarray(t_offset_s, dtype=np.float64)
+        self._latitude_deg = np.asarray(latitude_deg, dtype=np.float64)
+        self._longitude_deg = np.asarray(longitude_deg, dtype=np.float64)
+        self._d_slant_km = np.asarray(d_slant_km, dtype=np.float64)
+        self._alt_deg = np.asarray(alt_deg, dtype=np.float64)
+        self._az_deg = np.asarray(az_deg, dtype=np.float64)
+        self._track_computed = True
+
+    def _compute_track_stepwise(self, sat: EarthSatellite):
+        """
+        Reference implementation of _compute_track(...) which propagates one 10 second time
+        step at a time.
+
+        :param sat: The satellite performing the pass.
+        """
         # Generate timestamps every 10 seconds in the pass in skyfield and datetime formats
-        timescale = load.timescale()
-        self._t_skyfield = []
-        self._t_datetime_utc = []
-        t = timescale.from_datetime(self._start_dt)
+        t_skyfield = []
+        t_datetime_utc = []
+        t = self._ctx.timescale.from_datetime(self._start_dt)
         while t.utc_datetime() < self._end_dt:
-            self._t_skyfield.append(t)
-            self._t_datetime_utc.append(t.utc_datetime())
-            t = t + timedelta(seconds=10)
+            t_skyfield.append(t)
+            t_datetime_utc.append(t.utc_datetime())
+            t = t + timedelta(seconds=TRACK_STEP_S)
 
-        self._latitude_deg = []
-        self._longitude_deg = []
-        self._d_slant_km = []
-        self._alt_deg = []
-        self._az_deg = []
+        latitude_deg = []
+        longitude_deg = []
+        d_slant_km = []
+        alt_deg = []
+        az_deg = []
 
         # Generate satellite ground track and azimuth/elevation angles
-        for t in self._t_skyfield:
-            difference = sat - UVIC_GROUND_STATION
+        for t in t_skyfield:
+            difference = sat - self._station
             topocentric_pos = difference.at(t)
             lat, lon = wgs84.latlon_of(sat.at(t))
-            self._latitude_deg.append(lat.degrees)
-            self._longitude_deg.append(lon.degrees)
+            latitude_deg.append(lat.degrees)
+            longitude_deg.append(lon.degrees)
 
             alt, az, d = topocentric_pos.altaz()
-            self._alt_deg.append(alt.degrees)
-            self._az_deg.append(az.degrees)
-            self._d_slant_km.append(d.km)
+            alt_deg.append(alt.degrees)
+            az_deg.append(az.degrees)
+            d_slant_km.append(d.km)
 
-        self._max_alt_deg = max(self._alt_deg)
+        PROPAGATION_SAMPLES.inc(len(t_skyfield), path="stepwise")
+        t_offset_s = [(t_utc - self._start_dt).total_seconds() for t_utc in t_datetime_utc]
+        self._set_track(t_offset_s, latitude_deg, longitude_deg, d_slant_km, alt_deg, az_deg)
 
     @property
     def sat_name(self) -> str:
@@ -81,12 +343,12 @@ class PassInfo:
     @property 
     def local_start_time(self) -> datetime:
         """Start time in the Vancouver/Victoria time zone"""
-        return self._start_dt.astimezone(tz.gettz('Canada/Vancouver'))
+        return self._start_dt.astimezone(self._ctx.local_tz)
 
     @property 
     def local_end_time(self) -> datetime:
         """End time in the Vancouver/Victoria time zone"""
-        return self._end_dt.astimezone(tz.gettz('Canada/Vancouver'))
+        return self._end_dt.astimezone(self._ctx.local_tz)
 
     @property 
     def start_dt_utc(self) -> datetime:
@@ -98,10 +360,22 @@ class PassInfo:
         """End time in UTC"""
         return self._end_dt
 
+    @property
+    def culmination_dt_utc(self) -> datetime:
+        """Time of maximum elevation in UTC"""
+        return self._culmination_dt
+
+    @property
+    def t_offset_s(self) -> np.ndarray:
+        """Time steps of orbit propagation in seconds from the pass start"""
+        self._ensure_track()
+        return self._t_offset_s
+
     @property
     def t_datetime_utc(self) -> List[datetime]:
         """Time steps of orbit propagation in UTC datetimes"""
-        return self._t_datetime_utc
+        self._ensure_track()
+        return [self._start_dt + timedelta(seconds=offset_s) for offset_s in self._t_offset_s.tolist()]
 
     @property
     def rating(self) -> int:
@@ -125,28 +399,33 @@ class PassInfo:
         return rating
 
     @property
-    def latitude_deg(self) -> List[SupportsFloat]:
+    def latitude_deg(self) -> np.ndarray:
         """Latitude of spacecraft ground track (deg)"""
+        self._ensure_track()
         return self._latitude_deg
 
     @property
-    def longitude_deg(self) -> List[SupportsFloat]:
+    def longitude_deg(self) -> np.ndarray:
         """Longitude of spacecraft ground track (deg)"""
+        self._ensure_track()
         return self._longitude_deg
 
     @property
-    def d_slant_km(self) -> List[SupportsFloat]:
+    def d_slant_km(self) -> np.ndarray:
         """Slant range to spacecraft from ground station (km)"""
+        self._ensure_track()
         return self._d_slant_km
 
     @property
-    def alt_deg(self) -> List[SupportsFloat]:
+    def alt_deg(self) -> np.ndarray:
         """Altitude of spacecraft when viewed from ground station (deg)"""
+        self._ensure_track()
         return self._alt_deg
 
     @property
-    def az_deg(self) -> List[SupportsFloat]:
+    def az_deg(self) -> np.ndarray:
         """Azimuth of spacecraft when viewed from ground station (deg)"""
+        self._ensure_track()
         return self._az_deg
 
     @property
@@ -154,57 +433,99 @@ class PassInfo:
         """Maximum azimuth angle of spacecraft when viewed from ground station (deg)"""
         return self._max_alt_deg
 
-def compute_passes(norad_catalog_num: int=ORCASAT_NORAD_ID, num_days=1) -> List[PassInfo]:
+@timed()
+def compute_passes(norad_catalog_num: int=ORCASAT_NORAD_ID, num_days=1, context: Optional[PlanningContext]=None,
+                   start: Optional[Time]=None) -> List[PassInfo]:
     """
         Computes the start/end times for future passes
     Args:
         norad_catalog_num: The norad catalog number of ORCASat (or the satellite to compute passes for)
         num_days: How many days in the future to compute passes for
+        context: Planning context to use, defaults to the process wide context
+        start: Time to compute passes from, defaults to now
 
     Returns: A list of pass times for the specified period
 
     """
+    context = context or get_context()
+    ts = context.timescale
+
     # Get the latest TLE from celestrak
     if not USE_MANUAL_TLE:
-        sat = get_sat(norad_catalog_num)    # Load from CelesTrak
+        sat = get_sat(norad_catalog_num, context=context)    # Load from CelesTrak
     else:
-        ts = load.timescale()
         sat = EarthSatellite(line_1, line_2, name=tle_name, ts=ts)
 
-    ts = load.timescale()
-
-    start = ts.now()
+    start = ts.now() if start is None else start
     end = start + timedelta(days=num_days)
 
+    passes, _ = find_passes(sat, start, end, context=context)
+
+    return passes
+
+def find_passes(sat: EarthSatellite, start: Time, end: Time, station: Optional[GeographicPosition]=None,
+                altitude_degrees: float=PASS_MIN_ALT_DEG, context: Optional[PlanningContext]=None,
+                prefilter: bool=True) -> Tuple[List[PassInfo], Optional[Time]]:
+    """
+    Finds the passes of a satellite over a ground station between two times. Unless disabled,
+    the satellite is only propagated inside the candidate windows found by
+    visibility_filter.candidate_windows(...), so satellites which can never clear the elevation
+    mask are not propagated at all.
+
+    :param sat: The satellite to compute passes for.
+    :param start: Start of the search window.
+    :param end: End of the search window.
+    :param station: The ground station the satellite is viewed from, defaults to the context station.
+    :param altitude_degrees: Elevation mask the satellite has to rise above.
+    :param context: Planning context to use, defaults to the process wide context.
+    :param prefilter: Skip the parts of the window in which the satellite cannot be visible. When
+        False the whole window is searched, which is kept for comparing results.
+
+    Returns: (passes which start and end inside the window, rise time of a pass still in progress at
+             the end of the window or None)
+    """
+    context = context or get_context()
+    station = station or context.station
     passes = []
     pass_start = None
+    culminations = []
 
-    # Compute the times when the satellite rises and sets
-    t, events = sat.find_events(UVIC_GROUND_STATION, start, end, altitude_degrees=15.0)
+    # Compute the times when the satellite rises, culminates and sets
+    if prefilter:
+        t, events = visibility_filter.find_events(sat, station, start, end, altitude_degrees)
+    else:
+        t, events = sat.find_events(station, start, end, altitude_degrees=altitude_degrees)
 
     for ti, event in zip(t, events):
         # Satellite passing above the horizon
         if event == 0:
             pass_start = ti
+            culminations = []
+        # Satellite at its highest point in the pass
+        if event == 1 and pass_start is not None:
+            culminations.append(ti.utc_datetime())
         # Satellite passing below the horizon
         if event == 2 and pass_start is not None:
-            passes.append(PassInfo(sat, pass_start=pass_start.utc_datetime(), pass_end=ti.utc_datetime()))
+            passes.append(PassInfo(sat, pass_start=pass_start.utc_datetime(), pass_end=ti.utc_datetime(), station=station,
+                                   culminations=culminations, context=context))
+            pass_start = None
 
-    return passes
+    return passes, pass_start
 
-def get_tle(norad_catalog_num: int=ORCASAT_NORAD_ID) -> Tuple[Tuple[str, str], str]:
+def fetch_tle(norad_catalog_num: int=ORCASAT_NORAD_ID) -> Tuple[Tuple[str, str], str]:
     """
-    Get the TLE for a NORAD ID from Celestrak.
+    Fetch the TLE for a NORAD ID from Celestrak, bypassing the TLE cache.
 
     Returns: ((TLE line 1, TLE line 2), satellite name)
     """
-    celestrak_url = f"https://celestrak.org/NORAD/elements/gp.php?CATNR={norad_catalog_num}&FORMAT=tle"
+    celestrak_url = CELESTRAK_URL.format(norad_catalog_num=norad_catalog_num)
     try:
-        uf = urllib.request.urlopen(celestrak_url)
+        uf = urllib.request.urlopen(celestrak_url, timeout=CELESTRAK_TIMEOUT_S)
     except Exception as e:
         raise RuntimeError(f"URLLib error received when trying to contact Celestrak. Error: {e}")
 
     html = uf.read().decode()
+    CELESTRAK_BYTES.inc(len(html))
     tle = html.split('\r\n')[0:3]
 
     if tle[2] == "<html>":
@@ -216,13 +537,50 @@ def get_tle(norad_catalog_num: int=ORCASAT_NORAD_ID) -> Tuple[Tuple[str, str], s
 
     return ((str(tle[1]), str(tle[2])), name)
 
-def get_sat(norad_catalog_num: int=ORCASAT_NORAD_ID) -> EarthSatellite:
+TLE_CATALOG = TLECatalog()
+
+def lookup_tle(norad_catalog_num: int=ORCASAT_NORAD_ID) -> Tuple[Tuple[str, str], str, Optional[float]]:
+    """
+    Look up the TLE for a NORAD ID in TLE_CATALOG, only fetching it from Celestrak when the
+    satellite is not in the catalog or its catalog TLE is older than the TLE cache TTL.
+
+    Returns: ((TLE line 1, TLE line 2), satellite name, Unix time the catalog fetched the TLE or None)
+    """
+    entry = TLE_CATALOG.get(norad_catalog_num)
+    if entry is not None and time.time() - entry.fetched_at < TLE_CACHE.ttl_s:
+        TLE_CATALOG_LOOKUPS.inc(result="hit")
+        return (entry.lines, entry.name, entry.fetched_at)
+    TLE_CATALOG_LOOKUPS.inc(result="miss" if entry is None else "stale")
+    return (*fetch_tle(norad_catalog_num), None)
+
+TLE_CACHE = TLECache(lookup_tle)
+
+@timed()
+def get_tle(norad_catalog_num: int=ORCASAT_NORAD_ID, use_cache: bool=True) -> Tuple[Tuple[str, str], str]:
+    """
+    Get the TLE for a NORAD ID. By default the TLE is served from TLE_CACHE, which reads
+    TLEs it does not hold from TLE_CATALOG and only contacts Celestrak when neither has a
+    recent copy. Expired TLEs are refreshed in the background.
+
+    :param norad_catalog_num: The norad catalog number of the satellite.
+    :param use_cache: Set to False to always fetch a fresh TLE from Celestrak.
+
+    Returns: ((TLE line 1, TLE line 2), satellite name)
+    """
+    if not use_cache:
+        return fetch_tle(norad_catalog_num)
+
+    entry = TLE_CACHE.get(norad_catalog_num)
+    return (entry.lines, entry.name)
+
+def get_sat(norad_catalog_num: int=ORCASAT_NORAD_ID, context: Optional[PlanningContext]=None) -> EarthSatellite:
     """
     Returns a satellite for propagating orbits.
 
     :param norad_catalog_num: The norad catalog number of ORCASat (or the satellite to compute passes for)
+    :param context: Planning context to use, defaults to the process wide context.
     """
     tle, name = get_tle(norad_catalog_num)
-    ts = load.timescale()
+    ts = (context or get_context()).timescale
     sat = EarthSatellite(*tle, name, ts)
-    return sat
\ No newline at end of file
+    return sat
@@ -0,0 +1,168 @@
+'''
+Rolling, precomputed schedule of upcoming passes.
+'''
+
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from skyfield.api import EarthSatellite
+from skyfield.toposlib import GeographicPosition
+
+from pass_planner_helper import (ORCASAT_NORAD_ID, PASS_MIN_ALT_DEG, TLE_CACHE, PassInfo, PlanningContext,
+                                 find_passes, get_context)
+from state_store import PassWindowRecord, StateStore
+
+DEFAULT_HORIZON = timedelta(days=1)
+
+
+class PassSchedule:
+    """
+    Keeps a precomputed window of upcoming passes for one satellite and ground station. Each
+    refresh drops passes which have already ended and only searches the newly uncovered tail of
+    the horizon. The whole window is recomputed only when a TLE with a newer epoch arrives.
+    When a StateStore is given, computed passes are persisted and a new schedule starts from
+    the persisted passes of the same TLE instead of searching the whole horizon again.
+    """
+    def __init__(self, norad_catalog_num: int = ORCASAT_NORAD_ID, horizon: timedelta = DEFAULT_HORIZON,
+                 station: Optional[GeographicPosition] = None, altitude_degrees: float = PASS_MIN_ALT_DEG,
+                 context: Optional[PlanningContext] = None, store: Optional[StateStore] = None):
+        """
+        Create a PassSchedule instance. No passes are computed until the first refresh.
+
+        :param norad_catalog_num: The norad catalog number of the satellite to schedule passes for.
+        :param horizon: How far into the future passes are kept computed.
+        :param station: The ground station the satellite is viewed from, defaults to the context station.
+        :param altitude_degrees: Elevation mask the satellite has to rise above.
+        :param context: Planning context to use, defaults to the process wide context which is
+            loaded on the first refresh.
+        :param store: Store to persist passes in, or None to keep them in memory only.
+        """
+        self._norad_catalog_num = norad_catalog_num
+        self._horizon = horizon
+        self._station = station
+        self._altitude_degrees = altitude_degrees
+        self._ctx = context
+        self._store = store
+        self._store_key: Optional[str] = None
+
+        self._sat: Optional[EarthSatellite] = None
+        self._tle_epoch: Optional[datetime] = None
+        self._passes: List[PassInfo] = []
+        self._covered_until: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    @property
+    def horizon(self) -> timedelta:
+        """How far into the future passes are kept computed"""
+        return self._horizon
+
+    @property
+    def tle_epoch(self) -> Optional[datetime]:
+        """Epoch of the TLE the current passes were computed from"""
+        return self._tle_epoch
+
+    def upcoming(self, within: Optional[timedelta] = None, now: Optional[datetime] = None) -> List[PassInfo]:
+        """
+        Returns the passes which have not ended yet and start within a time from now.
+
+        :param within: Only return passes starting before now + within, defaults to the horizon.
+        :param now: Current time in UTC, defaults to the system clock.
+        """
+        now = now or datetime.now(timezone.utc)
+        within = self._horizon if within is None else within
+        if within > self._horizon:
+            raise ValueError(f"Requested window of {within} is longer than the schedule horizon of {self._horizon}")
+
+        passes = self.refresh(now)
+        return [pi for pi in passes if pi.start_dt_utc < now + within]
+
+    def refresh(self, now: Optional[datetime] = None) -> List[PassInfo]:
+        """
+        Bring the schedule up to date and return a copy of the passes which have not ended yet.
+
+        :param now: Current time in UTC, defaults to the system clock.
+        """
+        now = now or datetime.now(timezone.utc)
+
+        with self._lock:
+            if self._ctx is None:
+                self._ctx = get_context()
+            self._update_sat(now)
+
+            num_passes = len(self._passes)
+            self._passes = [pi for pi in self._passes if pi.end_dt_utc > now]
+            if self._store is not None and len(self._passes) < num_passes:
+                self._store.delete_pass_windows(self._get_store_key(), now.timestamp())
+
+            if self._covered_until is None or self._covered_until < now:
+                self._covered_until = now
+
+            target = now + self._horizon
+            if self._covered_until < target:
+                self._extend(target)
+
+            return list(self._passes)
+
+    def _get_store_key(self) -> str:
+        """Identifies the satellite, ground station and elevation mask of the schedule in the store."""
+        if self._store_key is None:
+            station = self._station or self._ctx.station
+            self._store_key = (f"{self._norad_catalog_num}@{station.latitude.degrees:.6f},"
+                               f"{station.longitude.degrees:.6f}/{self._altitude_degrees}")
+        return self._store_key
+
+    def _update_sat(self, now: datetime):
+        """Reset the schedule when the TLE cache holds a TLE with a different epoch."""
+        entry = TLE_CACHE.get(self._norad_catalog_num)
+        if entry.epoch == self._tle_epoch:
+            return
+
+        self._sat = EarthSatellite(*entry.lines, entry.name, self._ctx.timescale)
+        self._tle_epoch = entry.epoch
+        self._passes = []
+        self._covered_until = None
+
+        if self._store is not None:
+            self._restore(now)
+
+    def _restore(self, now: datetime):
+        """Resume from the passes persisted for the current TLE."""
+        windows = self._store.load_pass_windows(self._get_store_key(), self._tle_epoch, now.timestamp())
+        for window in windows:
+            self._passes.append(PassInfo(
+                self._sat,
+                pass_start=datetime.fromtimestamp(window.start_s, timezone.utc),
+                pass_end=datetime.fromtimestamp(window.end_s, timezone.utc),
+                station=self._station,
+                culminations=[datetime.fromtimestamp(window.culmination_s, timezone.utc)],
+                context=self._ctx,
+            ))
+        # Passes between the last persisted pass and the horizon are searched again
+        if self._passes:
+            self._covered_until = self._passes[-1].end_dt_utc
+
+    def _extend(self, target: datetime):
+        """Search the tail of the horizon between the covered time and target for new passes."""
+        ts = self._ctx.timescale
+        start = ts.from_datetime(self._covered_until)
+        end = ts.from_datetime(target)
+        new_passes, pending_rise = find_passes(self._sat, start, end, station=self._station,
+                                               altitude_degrees=self._altitude_degrees, context=self._ctx)
+
+        last_start = self._passes[-1].start_dt_utc if self._passes else None
+        new_passes = [pi for pi in new_passes if last_start is None or pi.start_dt_utc > last_start]
+        self._passes.extend(new_passes)
+
+        if self._store is not None and new_passes:
+            self._store.save_pass_windows(self._get_store_key(), self._tle_epoch, [
+                PassWindowRecord(pi.start_dt_utc.timestamp(), pi.end_dt_utc.timestamp(),
+                                 pi.culmination_dt_utc.timestamp(), pi.max_alt_deg)
+                for pi in new_passes
+            ])
+
+        # A pass still in progress at the end of the window is found again by the next search
+        if pending_rise is not None:
+            self._covered_until = pending_rise.utc_datetime() - timedelta(seconds=1)
+        else:
+            self._covered_until = target
@@ -0,0 +1,164 @@
+'''
+Columnar storage of pass summaries for a whole schedule.
+'''
+
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
+import numpy as np
+
+from pass_planner_helper import PassInfo
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class PassRow(NamedTuple):
+    """A single pass read from a PassTable."""
+    sat_name: str
+    start_dt_utc: datetime
+    end_dt_utc: datetime
+    culmination_dt_utc: datetime
+    max_alt_deg: float
+
+    @property
+    def duration(self) -> timedelta:
+        """Length of the pass"""
+        return self.end_dt_utc - self.start_dt_utc
+
+
+def _to_unix_s(value: datetime) -> float:
+    return (value - _EPOCH).total_seconds()
+
+
+def _from_unix_s(value: float) -> datetime:
+    return _EPOCH + timedelta(seconds=float(value))
+
+
+class PassTable:
+    """
+    Pass summaries for a whole schedule stored as one array per column. Times are stored as
+    float64 Unix seconds. Tables can be sliced with integer arrays, slices or boolean masks and
+    filtered without building per-pass objects.
+    """
+    __slots__ = ("_sat_name", "_start_s", "_end_s", "_culmination_s", "_max_alt_deg")
+
+    def __init__(self, sat_name: np.ndarray, start_s: np.ndarray, end_s: np.ndarray, culmination_s: np.ndarray,
+                 max_alt_deg: np.ndarray):
+        """
+        Create a PassTable instance from its columns, which must all have the same length.
+
+        :param sat_name: Satellite names.
+        :param start_s: Pass start times (Unix seconds).
+        :param end_s: Pass end times (Unix seconds).
+        :param culmination_s: Times of maximum elevation (Unix seconds).
+        :param max_alt_deg: Maximum elevations (deg).
+        """
+        self._sat_name = np.asarray(sat_name, dtype=object)
+        self._start_s = np.asarray(start_s, dtype=np.float64)
+        self._end_s = np.asarray(end_s, dtype=np.float64)
+        self._culmination_s = np.asarray(culmination_s, dtype=np.float64)
+        self._max_alt_deg = np.asarray(max_alt_deg, dtype=np.float64)
+
+        lengths = {len(column) for column in (self._sat_name, self._start_s, self._end_s, self._culmination_s,
+                                              self._max_alt_deg)}
+        if len(lengths) > 1:
+            raise ValueError(f"PassTable columns have different lengths: {sorted(lengths)}")
+
+    @classmethod
+    def from_passes(cls, passes: Iterable[PassInfo]) -> "PassTable":
+        """
+        Build a table from PassInfo objects. Only the pass summaries are read, so the ground
+        tracks of lazily computed passes are not materialized.
+
+        :param passes: The passes to store.
+        """
+        passes = list(passes)
+        return cls(
+            sat_name=[pi.sat_name for pi in passes],
+            start_s=[_to_unix_s(pi.start_dt_utc) for pi in passes],
+            end_s=[_to_unix_s(pi.end_dt_utc) for pi in passes],
+            culmination_s=[_to_unix_s(pi.culmination_dt_utc) for pi in passes],
+            max_alt_deg=[pi.max_alt_deg for pi in passes],
+        )
+
+    def __len__(self) -> int:
+        return len(self._start_s)
+
+    def __getitem__(self, index: Union[int, slice, np.ndarray]) -> Union[PassRow, "PassTable"]:
+        if isinstance(index, (int, np.integer)):
+            return self.row(int(index))
+        return PassTable(self._sat_name[index], self._start_s[index], self._end_s[index],
+                         self._culmination_s[index], self._max_alt_deg[index])
+
+    def __iter__(self) -> Iterator[PassRow]:
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def row(self, i: int) -> PassRow:
+        """
+        Read a single pass from the table.
+
+        :param i: Index of the pass.
+        """
+        return PassRow(
+            sat_name=self._sat_name[i],
+            start_dt_utc=_from_unix_s(self._start_s[i]),
+            end_dt_utc=_from_unix_s(self._end_s[i]),
+            culmination_dt_utc=_from_unix_s(self._culmination_s[i]),
+            max_alt_deg=float(self._max_alt_deg[i]),
+        )
+
+    def filter(self, min_alt_deg: Optional[float] = None, start: Optional[datetime] = None,
+               end: Optional[datetime] = None, sat_name: Optional[str] = None) -> "PassTable":
+        """
+        Select the passes matching all of the given criteria.
+
+        :param min_alt_deg: Minimum max elevation (deg).
+        :param start: Only keep passes which end after this time.
+        :param end: Only keep passes which start before this time.
+        :param sat_name: Only keep passes of this satellite.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if min_alt_deg is not None:
+            mask &= self._max_alt_deg >= min_alt_deg
+        if start is not None:
+            mask &= self._end_s > _to_unix_s(start)
+        if end is not None:
+            mask &= self._start_s < _to_unix_s(end)
+        if sat_name is not None:
+            mask &= self._sat_name == sat_name
+        return self[mask]
+
+    def sort(self) -> "PassTable":
+        """Returns the table ordered by pass start time."""
+        return self[np.argsort(self._start_s, kind="stable")]
+
+    @property
+    def sat_name(self) -> np.ndarray:
+        """Satellite names"""
+        return self._sat_name
+
+    @property
+    def start_s(self) -> np.ndarray:
+        """Pass start times (Unix seconds)"""
+        return self._start_s
+
+    @property
+    def end_s(self) -> np.ndarray:
+        """Pass end times (Unix seconds)"""
+        return self._end_s
+
+    @property
+    def culmination_s(self) -> np.ndarray:
+        """Times of maximum elevation (Unix seconds)"""
+        return self._culmination_s
+
+    @property
+    def duration_s(self) -> np.ndarray:
+        """Pass lengths (s)"""
+        return self._end_s - self._start_s
+
+    @property
+    def max_alt_deg(self) -> np.ndarray:
+        """Maximum elevations (deg)"""
+        return self._max_alt_deg
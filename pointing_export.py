@@ -0,0 +1,100 @@
+'''
+Streaming export of antenna pointing samples for the ground station rotator controller.
+'''
+
+import os
+from typing import Iterator, Optional
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+from pass_planner_helper import PassInfo
+
+# Fixed 32 byte little-endian record shared by the .npy and raw .bin formats
+POINTING_DTYPE = np.dtype([
+    ("t_unix_s", "<f8"),  # Sample time (Unix seconds, UTC)
+    ("az_deg", "<f8"),  # Azimuth (deg)
+    ("el_deg", "<f8"),  # Elevation (deg)
+    ("range_km", "<f8"),  # Slant range (km)
+])
+
+FORMAT_NPY = "npy"
+FORMAT_BIN = "bin"
+
+DEFAULT_RATE_HZ = 1.0
+DEFAULT_CHUNK_SAMPLES = 600  # Samples propagated per vectorized call
+
+
+def num_pointing_samples(pass_info: PassInfo, rate_hz: float = DEFAULT_RATE_HZ) -> int:
+    """
+    Number of samples a pass is exported with, from AOS up to but excluding LOS.
+
+    :param pass_info: The pass to export.
+    :param rate_hz: Sample rate (Hz).
+    """
+    return int(np.ceil(pass_info.duration.total_seconds() * rate_hz))
+
+
+def iter_pointing_samples(pass_info: PassInfo, rate_hz: float = DEFAULT_RATE_HZ,
+                          chunk_samples: int = DEFAULT_CHUNK_SAMPLES) -> Iterator[np.ndarray]:
+    """
+    Yields the pointing samples of a pass as they are computed, in chunks of at most
+    chunk_samples records of POINTING_DTYPE. Only one chunk is held in memory at a time.
+
+    :param pass_info: The pass to export.
+    :param rate_hz: Sample rate (Hz).
+    :param chunk_samples: Number of samples computed per vectorized propagation.
+    """
+    if rate_hz <= 0:
+        raise ValueError(f"Sample rate must be positive, got {rate_hz}")
+
+    start_unix_s = pass_info.start_dt_utc.timestamp()
+    num_samples = num_pointing_samples(pass_info, rate_hz)
+
+    for i_start in range(0, num_samples, chunk_samples):
+        offsets_s = np.arange(i_start, min(i_start + chunk_samples, num_samples)) / rate_hz
+        alt_deg, az_deg, d_slant_km = pass_info.look_angles(offsets_s)
+
+        chunk = np.empty(offsets_s.size, dtype=POINTING_DTYPE)
+        chunk["t_unix_s"] = start_unix_s + offsets_s
+        chunk["az_deg"] = az_deg
+        chunk["el_deg"] = alt_deg
+        chunk["range_km"] = d_slant_km
+        yield chunk
+
+
+def export_pointing(pass_info: PassInfo, path: str, rate_hz: float = DEFAULT_RATE_HZ, fmt: Optional[str] = None,
+                    chunk_samples: int = DEFAULT_CHUNK_SAMPLES) -> int:
+    """
+    Streams the pointing samples of a pass to a file which the rotator controller can memory-map,
+    either with numpy.load(path, mmap_mode="r") for .npy files or numpy.memmap(path,
+    dtype=POINTING_DTYPE) for raw .bin files.
+
+    :param pass_info: The pass to export.
+    :param path: Output file.
+    :param rate_hz: Sample rate (Hz).
+    :param fmt: FORMAT_NPY or FORMAT_BIN, defaults to the file extension of path.
+    :param chunk_samples: Number of samples computed and written at a time.
+
+    Returns: Number of samples written
+    """
+    if fmt is None:
+        fmt = FORMAT_BIN if os.path.splitext(path)[1] == f".{FORMAT_BIN}" else FORMAT_NPY
+    if fmt not in (FORMAT_NPY, FORMAT_BIN):
+        raise ValueError(f"Unknown pointing export format {fmt}")
+
+    num_samples = num_pointing_samples(pass_info, rate_hz)
+    num_written = 0
+
+    with open(path, "wb") as f:
+        if fmt == FORMAT_NPY:
+            # The sample count is known up front, so the header can be written before the data
+            header = {"descr": npy_format.dtype_to_descr(POINTING_DTYPE), "fortran_order": False,
+                      "shape": (num_samples,)}
+            npy_format.write_array_header_1_0(f, header)
+
+        for chunk in iter_pointing_samples(pass_info, rate_hz, chunk_samples):
+            chunk.tofile(f)
+            num_written += chunk.size
+
+    return num_written
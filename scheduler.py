@@ -0,0 +1,240 @@
+'''
+Scheduler for recurring jobs, backed by a heap ordered timer queue and a small worker pool.
+'''
+
+import datetime as dt
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+JOB_LAG = histogram("scheduler_job_lag_seconds", "Delay between the scheduled and actual start of job runs", ["job"])
+JOB_DURATION = histogram("scheduler_job_duration_seconds", "Wall time of job runs", ["job"])
+
+DEFAULT_MAX_WORKERS = 4
+
+# Given the time a job was scheduled to run, returns the next run time or None to stop the job
+NextRun = Callable[[dt.datetime], Optional[dt.datetime]]
+JobFunc = Callable[[dt.datetime], None]
+
+
+class JobInfo(NamedTuple):
+    """Description of a registered job."""
+    name: str
+    next_run: dt.datetime
+    last_lag_s: Optional[float]
+
+
+class _Job:
+    __slots__ = ("name", "func", "next_run_fn", "next_run", "generation", "last_lag_s", "executor")
+
+    def __init__(self, name: str, func: JobFunc, next_run_fn: NextRun, next_run: dt.datetime, generation: int,
+                 executor: Optional[Executor]):
+        self.name = name
+        self.func = func
+        self.next_run_fn = next_run_fn
+        self.next_run = next_run
+        self.generation = generation
+        self.last_lag_s: Optional[float] = None
+        self.executor = executor
+
+
+def daily_at(hour: int, minute: int = 0) -> NextRun:
+    """
+    Returns a NextRun function for a job which runs every day at a local time.
+
+    :param hour: Hour of the day (0-23).
+    :param minute: Minute of the hour.
+    """
+    def next_run(after: dt.datetime) -> dt.datetime:
+        tgt = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if tgt <= after:
+            tgt += dt.timedelta(days=1)
+        return tgt
+    return next_run
+
+
+def hourly() -> NextRun:
+    """Returns a NextRun function for a job which runs at the start of every hour."""
+    def next_run(after: dt.datetime) -> dt.datetime:
+        return after.replace(minute=0, second=0, microsecond=0) + dt.timedelta(hours=1)
+    return next_run
+
+
+def every(interval: dt.timedelta) -> NextRun:
+    """
+    Returns a NextRun function for a job which runs at a fixed interval.
+
+    :param interval: Time between runs.
+    """
+    return lambda after: after + interval
+
+
+def once() -> NextRun:
+    """Returns a NextRun function for a job which runs a single time."""
+    return lambda after: None
+
+
+class Scheduler:
+    """
+    Runs any number of recurring jobs. Jobs are kept in a heap ordered by their next run time
+    and one timer thread sleeps until the earliest one is due, so idle jobs cost neither a
+    thread nor CPU. Due jobs are handed to a small worker pool, or to the executor they were
+    registered with, so a job blocked on the network or a propagation does not delay other
+    jobs. A job never overlaps itself, its next run is scheduled once its current run is done.
+    Times are naive local datetimes.
+    """
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Create a Scheduler instance. Threads are started on the first registration.
+
+        :param max_workers: Number of threads running the jobs registered without an executor.
+        """
+        self._jobs: Dict[str, _Job] = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._max_workers = max_workers
+        self._workers: Optional[ThreadPoolExecutor] = None
+        self._stopped = False
+
+    def start(self):
+        """Start the timer thread and the worker pool if they are not already running."""
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._workers = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="scheduler-job")
+            self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the timer thread and wait for the job runs in progress, if any."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._workers is not None:
+            self._workers.shutdown(wait=True)
+            self._workers = None
+
+    def register(self, name: str, func: JobFunc, next_run_fn: NextRun, first_run: Optional[dt.datetime] = None,
+                 executor: Optional[Executor] = None) -> bool:
+        """
+        Register a recurring job and start the scheduler threads if needed.
+
+        :param name: Unique job name, e.g. "daily_update:<channel id>".
+        :param func: Called with the time the job was scheduled to run.
+        :param next_run_fn: Returns the next run time after a scheduled run time.
+        :param first_run: Time of the first run, defaults to next_run_fn(now).
+        :param executor: Executor the job runs on, defaults to the scheduler's worker pool. Jobs
+            which must run on time regardless of the other jobs can be given their own.
+
+        Returns: False if a job with this name is already registered
+        """
+        first_run = first_run or next_run_fn(dt.datetime.now())
+        if first_run is None:
+            raise ValueError(f"Job {name} has no run time")
+
+        with self._cond:
+            if name in self._jobs:
+                return False
+            job = _Job(name, func, next_run_fn, first_run, next(self._seq), executor)
+            self._jobs[name] = job
+            self._push(job)
+
+        self.start()
+        return True
+
+    def cancel(self, name: str) -> bool:
+        """
+        Cancel a registered job. A run which is already in progress is allowed to finish.
+
+        :param name: Name the job was registered with.
+
+        Returns: False if no job with this name is registered
+        """
+        with self._cond:
+            job = self._jobs.pop(name, None)
+            self._cond.notify_all()
+        return job is not None
+
+    def list_jobs(self) -> List[JobInfo]:
+        """Returns the registered jobs ordered by their next run time."""
+        with self._cond:
+            jobs = [JobInfo(job.name, job.next_run, job.last_lag_s) for job in self._jobs.values()]
+        return sorted(jobs, key=lambda job: job.next_run)
+
+    def _push(self, job: _Job):
+        heapq.heappush(self._heap, (job.next_run.timestamp(), next(self._seq), job.generation, job))
+        self._cond.notify_all()
+
+    def _is_current(self, job: _Job, generation: int) -> bool:
+        return self._jobs.get(job.name) is job and job.generation == generation
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    # Drop heap entries of cancelled jobs
+                    while self._heap and not self._is_current(self._heap[0][3], self._heap[0][2]):
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(timeout=delay)
+
+                run_at_ts, _, _, job = heapq.heappop(self._heap)
+                executor = job.executor or self._workers
+
+            try:
+                executor.submit(self._execute, job, job.next_run, run_at_ts)
+            except RuntimeError:
+                # The executor was shut down, the job is dropped like a cancelled one
+                logger.warning(f"Scheduled job {job.name} dropped, its executor is shut down")
+                with self._cond:
+                    if self._jobs.get(job.name) is job:
+                        del self._jobs[job.name]
+
+    def _execute(self, job: _Job, scheduled: dt.datetime, run_at_ts: float):
+        """Run a due job on a worker, then schedule its next run."""
+        job.last_lag_s = time.time() - run_at_ts
+
+        # Job names are "<kind>:<channel id>", label by kind to keep the number of series small
+        job_kind = job.name.split(":", 1)[0]
+        JOB_LAG.observe(job.last_lag_s, job=job_kind)
+        try:
+            with JOB_DURATION.time(job=job_kind):
+                job.func(scheduled)
+        except Exception:
+            logger.exception(f"Scheduled job {job.name} failed")
+
+        with self._cond:
+            if self._jobs.get(job.name) is not job:
+                return
+            next_run = job.next_run_fn(scheduled)
+            # Skip runs which were missed while the job or the machine was busy
+            now = dt.datetime.now()
+            while next_run is not None and next_run <= now:
+                next_run = job.next_run_fn(next_run)
+            if next_run is None:
+                del self._jobs[job.name]
+                return
+            job.next_run = next_run
+            job.generation = next(self._seq)
+            self._push(job)
@@ -0,0 +1,111 @@
+'''
+Request coalescing: concurrent identical calls share one computation on a bounded thread pool.
+'''
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from metrics import counter
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_RESULT_TTL_S = 30.0
+
+COALESCER_REQUESTS = counter("coalescer_requests_total",
+                             "Coalesced calls by result (cached, joined, started, rejected)", ["result"])
+
+
+class Overloaded(RuntimeError):
+    """Raised when a new computation is requested while the executor queue is full."""
+
+
+class SingleFlight:
+    """
+    Runs calls on a bounded thread pool so that callers asking for the same key while a call
+    is in flight wait on that call instead of starting their own. Results are kept for a short
+    time so callers arriving just after a call finished get the same result. Failed calls are
+    not cached, every waiting caller receives the exception.
+    """
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_queue: int = DEFAULT_MAX_QUEUE,
+                 result_ttl_s: float = DEFAULT_RESULT_TTL_S):
+        """
+        Create a SingleFlight instance.
+
+        :param max_workers: Number of threads computing results.
+        :param max_queue: Max number of distinct computations running or waiting for a thread.
+        :param result_ttl_s: Default time in seconds results are served from the cache.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="singleflight")
+        self._max_queue = max_queue
+        self._result_ttl_s = result_ttl_s
+        self._inflight: Dict[Hashable, Future] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable, *args, ttl_s: Optional[float] = None, timeout: Optional[float] = None,
+           **kwargs) -> Any:
+        """
+        Return the result of fn(*args, **kwargs), sharing it with every other caller using key.
+
+        :param key: Identifies calls which produce the same result.
+        :param fn: Function computing the result.
+        :param ttl_s: Time in seconds the result is served from the cache, defaults to the instance TTL.
+        :param timeout: Max time in seconds to wait for the result.
+        """
+        return self.submit(key, fn, *args, ttl_s=ttl_s, **kwargs).result(timeout=timeout)
+
+    def submit(self, key: Hashable, fn: Callable, *args, ttl_s: Optional[float] = None, **kwargs) -> Future:
+        """
+        Like do(...) but returns a future of the result instead of waiting for it, e.g. to be
+        awaited with asyncio.wrap_future. Cached results are returned as completed futures.
+
+        :param key: Identifies calls which produce the same result.
+        :param fn: Function computing the result.
+        :param ttl_s: Time in seconds the result is served from the cache, defaults to the instance TTL.
+        """
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                if time.monotonic() < expires_at:
+                    COALESCER_REQUESTS.inc(result="cached")
+                    future = Future()
+                    future.set_result(result)
+                    return future
+                del self._results[key]
+
+            future = self._inflight.get(key)
+            if future is None:
+                if len(self._inflight) >= self._max_queue:
+                    COALESCER_REQUESTS.inc(result="rejected")
+                    raise Overloaded(f"{len(self._inflight)} computations are already queued")
+                ttl_s = self._result_ttl_s if ttl_s is None else ttl_s
+                future = self._executor.submit(self._call, key, ttl_s, fn, args, kwargs)
+                self._inflight[key] = future
+                COALESCER_REQUESTS.inc(result="started")
+            else:
+                COALESCER_REQUESTS.inc(result="joined")
+
+        return future
+
+    def invalidate(self, key: Hashable):
+        """
+        Drop a cached result so the next call recomputes it.
+
+        :param key: Key the result was computed for.
+        """
+        with self._lock:
+            self._results.pop(key, None)
+
+    def _call(self, key: Hashable, ttl_s: float, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        try:
+            result = fn(*args, **kwargs)
+            with self._lock:
+                if ttl_s > 0:
+                    self._results[key] = (time.monotonic() + ttl_s, result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
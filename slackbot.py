@@ -1,29 +1,64 @@
-import os, time, json, datetime as dt
+import os, sys, logging, datetime as dt
+from concurrent.futures import Future
 from messages import Messages
-from re import search
-from bs4 import BeautifulSoup
-from requests import get
-from threading import Lock
-from tabulate import tabulate
+from threading import Event, Lock, Thread
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
-from pass_planner_helper import compute_passes
+from scheduler import Scheduler, daily_at, every, hourly
+from singleflight import Overloaded, SingleFlight
+from alerts import SeenAlerts
+from state_store import StateStore
+from metrics import counter, start_http_server, timed
+from tle_cache import DEFAULT_TTL_S as TLE_CACHE_TTL_S
+
+# Note that bs4, requests, tabulate and the skyfield based pass planner modules are
+# imported inside the functions which use them so that the app can connect to Slack
+# before paying for those imports. warm_up(...) loads them in the background.
 
 
 DT_FORMAT = "%Y-%m-%d %H:%M"
 DAILY_UPDATE_MINUTE = 5
 DAILY_UPDATE_HOUR = 6
 WEATHER_ALERT_BLACKOUT_HOURS = {DAILY_UPDATE_HOUR}
-DAILY_WEATHER_ALERTS = []
+DAILY_WEATHER_ALERTS = {}
+DAILY_WEATHER_ALERT_REGIONS = {}
 DAILY_WEATHER_ALERTS_DATA_LOCK = Lock()
-DAILY_UPDATE_THREAD_LOCK = Lock()
-WEATHER_ALERT_THREAD_LOCK = Lock()
+DAILY_UPDATE_JOB = "daily_update"
+WEATHER_ALERT_JOB = "persistent_weather_alerts"
+PASS_NOTIFICATIONS_JOB = "pass_notifications"
+CATALOG_REFRESH_JOB = "tle_catalog_refresh"
+# Refreshed well within the TLE cache TTL so cache entries expire into a fresh catalog copy
+CATALOG_REFRESH_INTERVAL = dt.timedelta(seconds=TLE_CACHE_TTL_S / 2)
+STOP_ARG = "stop"
+SCHEDULER = Scheduler()
+REQUEST_COALESCER = SingleFlight(max_workers=4, max_queue=16, result_ttl_s=60)
 HTTP_TIMEOUT = 90
 THREAD_TIMEOUT = HTTP_TIMEOUT * 2
-app = App(token=os.environ.get("SLACK_BOT_TOKEN"))
+MAX_PASS_INFO_DAYS = 30
+MAX_NOTIFICATION_LEAD_MINUTES = 120
+MAX_PASS_RATING = 3
+PASS_SCHEDULE = None
+PASS_SCHEDULE_LOCK = Lock()
+PASS_NOTIFIER = None
+PASS_NOTIFIER_LOCK = Lock()
+ALERT_AGGREGATOR = None
+ALERT_AGGREGATOR_LOCK = Lock()
+# Successful sources waited for per region, every region is always waited for
+ALERT_QUORUM = 1
+STATE_STORE = None
+STATE_STORE_LOCK = Lock()
+# Set SLACK_TOKEN_VERIFICATION=0 to skip the auth.test call made when the app is created,
+# e.g. to run the benchmarks offline
+TOKEN_VERIFICATION = os.environ.get("SLACK_TOKEN_VERIFICATION", "1") != "0"
+# Set SLACK_ASYNC=1 or pass --async to run the asyncio runtime in async_slackbot.py
+ASYNC_RUNTIME = os.environ.get("SLACK_ASYNC", "0") == "1"
+WEATHER_ALERT_ERRORS = counter("weather_alert_errors_total", "Weather alert polls where no source answered")
+# The bolt app of the synchronous runtime and the web client jobs post with, see get_app(...)
+APP = None
+WEB_CLIENT = None
+APP_LOCK = Lock()
 
 
-@app.event("app_mention")
 def handle_app_mention_events(logger):
     """
     Receives any mentions to app '@<app_name>' in channels where app is authorized.
@@ -37,7 +72,6 @@ def handle_app_mention_events(logger):
 
     logger.warning(fmt_log_msg('app_mention'))
 
-@app.event("message")
 def handle_message_events(logger):
     """
     Receives any messages posted to Slack channel where bot is added.
@@ -52,23 +86,22 @@ def handle_message_events(logger):
 
     logger.warning(fmt_log_msg('message'))
 
-@app.command("/daily_update")
-def handle_daily_update_command(ack, say, logger):
+@timed("/daily_update")
+def handle_daily_update_command(ack, command, say, logger):
     """
     Receives '/daily_update' slash command from Slack channel specified in Slack apps. 
-    Sends mandatory ack back to callee and blocks any future attempts to send command 
-    to app by using WEATHER_ALERT_THREAD_LOCK. Note it is important to block future 
-    calls to handle_daily_update_command(...) because having multiple threads running 
-    this handler will result in an excess of Weatherbit API calls (we are only alotted 
-    50 per day due to using the free subscription plan) and many messages being sent 
-    back to the callee.Gets any existing weather alerts from Weatherbit and computes 
-    passes for the next 24 hours, puts this info in a formatted string and sends this 
-    info back to the channel the callee sent from.
+    Sends mandatory ack back to callee and registers a daily job with SCHEDULER which 
+    runs run_daily_update(...) at DAILY_UPDATE_HOUR:DAILY_UPDATE_MINUTE and posts to the
+    channel the command was sent from. Only one daily update job is registered per 
+    channel, so repeated commands do not result in many messages being sent back to the
+    callee. '/daily_update stop' cancels the channel's job. The handler returns right
+    away so no Slack worker thread is tied up between updates.
 
 
         Parameters:
 
             ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
             say: Slack API object which allows app to send text back to Slack
             logger: Slack API object which prints text to console
 
@@ -77,68 +110,87 @@ def handle_daily_update_command(ack, say, logger):
     """
 
     ack()
+    channel_id = command['channel_id']
+    job_name = f"{DAILY_UPDATE_JOB}:{channel_id}"
+
+    if command.get("text", "").strip() == STOP_ARG:
+        if SCHEDULER.cancel(job_name):
+            get_state_store().delete_job(job_name)
+            logger.warning(fmt_log_msg('daily_update_stopped'))
+            say(Messages['daily_update_stopped'])
+        return
 
-    if DAILY_UPDATE_THREAD_LOCK.acquire(blocking=False) == False:
+    if not register_daily_update(channel_id, say):
         logger.error(fmt_log_msg('daily_update_enabled'))
         return
 
     logger.warning(fmt_log_msg('daily_update_disabled'))
 
-    weather_alerts = []
+def register_daily_update(channel_id, say):
+    """
+    Registers the daily update job of a channel with SCHEDULER and persists it in the 
+    state store so it is registered again when the bot restarts.
 
-    while True:
-        now = dt.datetime.now()
-        tgt = now.replace(hour=DAILY_UPDATE_HOUR, minute=DAILY_UPDATE_MINUTE, second=0, microsecond=0)
-        td = tgt - now
+        Parameters:
 
-        if td.days < 0:
-            tgt += dt.timedelta(days=1)
-            td = tgt - now
+            channel_id (string): channel the updates are posted to
+            say: Slack API object which allows app to send text back to Slack
 
-        time.sleep(td.total_seconds())
-        pass_table = get_pass_table() 
-        
-        DAILY_WEATHER_ALERTS_DATA_LOCK.acquire(blocking=True, timeout=THREAD_TIMEOUT)
-        weather_alerts = DAILY_WEATHER_ALERTS.copy()
-        DAILY_WEATHER_ALERTS_DATA_LOCK.release()
+        Returns:
 
-        num_alerts = len(weather_alerts)
+            registered (bool): False if the channel already has a daily update job.
+    """
 
-        if num_alerts > 0:
-            say(f"{Messages['weather_alerts']}\n\n{pass_table}")   
-        
-        else:
-            say(pass_table)
+    job_name = f"{DAILY_UPDATE_JOB}:{channel_id}"
+
+    if not SCHEDULER.register(job_name, lambda scheduled: run_daily_update(say),
+                              daily_at(DAILY_UPDATE_HOUR, DAILY_UPDATE_MINUTE)):
+        return False
+
+    get_state_store().save_job(job_name, DAILY_UPDATE_JOB, channel_id)
+    return True
+
+def run_daily_update(say):
+    """
+    Scheduled job which computes passes for the next 24 hours and sends them to a channel,
+    preceded by a notice if any weather alerts were seen since DAILY_UPDATE_HOUR.
+
+        Parameters:
+
+            say: Slack API object which allows app to send text back to Slack
+
+        Returns:
+    """
+
+    pass_table = get_pass_table() 
+    
+    DAILY_WEATHER_ALERTS_DATA_LOCK.acquire(blocking=True, timeout=THREAD_TIMEOUT)
+    num_alerts = sum(len(seen_alerts) for seen_alerts in DAILY_WEATHER_ALERTS.values())
+    regions = set().union(*DAILY_WEATHER_ALERT_REGIONS.values())
+    DAILY_WEATHER_ALERTS_DATA_LOCK.release()
+
+    if num_alerts > 0:
+        say(f"{weather_alert_message(regions)}\n\n{pass_table}")   
+    
+    else:
+        say(pass_table)
         
-@app.command("/persistent_weather_alerts")
-def handle_persistent_weather_alerts_command(ack, logger, say):
+@timed("/persistent_weather_alerts")
+def handle_persistent_weather_alerts_command(ack, command, logger, say):
     """
     Receives '/persistent_weather_alerts' slash command from slack channel specified in 
-    Slack apps. Sends mandatory ack back to callee and blocks any future attempts to 
-    send command to app by using WEATHER_ALERT_THREAD_LOCK. Note it is important to block
-    future calls to handle_persistent_weather_alerts_command(...) because having multiple 
-    threads running this handler will result in an excess of Weatherbit API calls (we are 
-    only alotted 50 per day due to using the free subscription plan) and many of the same
-    message being posted to Slack. Sends hourly requests to Weatherbit API and receives a 
-    list of any existing alerts. Parses Weatherbit list and adds any new alerts to a shared 
-    program scope list (DAILY_WEATHER_ALERTS). Note that you can not use a set/dictionary 
-    or any data structure which guarantees the uniqueness of items with raw alert objects 
-    since alert json objects are not hashable. Since DAILY_WEATHER_ALERTS may be accessed 
-    by handle_daily_update_command(...) we use DAILY_WEATHER_ALERTS_DATA_LOCK to guarantee 
-    atomicity of actions which read and write from and to DAILY_WEATHER_ALERTS. We also 
-    include a time offset, DAILY_UPDATE_MINUTE, to allow
-    handle_persistent_weather_alerts_command(...) to clear DAILY_WEATHER_ALERTS at the 
-    DAILY_UPDATE_HOUR and repopulate it with any new/existing alerts. Note 
-    DAILY_WEATHER_ALERTS is cleared at DAILY_UPDATE_HOUR not at midnight so any weather 
-    alerts from the previous day are not cleared and posted at 1am to Slack. Also note 
-    that no weather alerts are sent to Slack during WEATHER_ALERT_BLACKOUT_HOURS which
-    defaults to contain just the DAILY_UPDATE_HOUR; adding more hours will silence 
-    messages but not stop the routine from sending and receiving Weatherbit API requests.
+    Slack apps. Sends mandatory ack back to callee and registers an hourly job with 
+    SCHEDULER which runs run_weather_alert_poll(...) for the channel the command was sent
+    from. Only one poll job is registered per channel, so repeated commands do not result
+    in an excess of requests or many of the same message being posted to Slack. 
+    '/persistent_weather_alerts stop' cancels the channel's job. The handler returns right
+    away so no Slack worker thread is tied up between polls.
 
 
         Parameters:
 
             ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
             say: Slack API object which allows app to send text back to Slack
             logger: Slack API object which prints text to console
 
@@ -147,48 +199,246 @@ def handle_persistent_weather_alerts_command(ack, logger, say):
     """
     
     ack()
+    channel_id = command['channel_id']
+    job_name = f"{WEATHER_ALERT_JOB}:{channel_id}"
+
+    if command.get("text", "").strip() == STOP_ARG:
+        if SCHEDULER.cancel(job_name):
+            DAILY_WEATHER_ALERTS_DATA_LOCK.acquire(blocking=True, timeout=THREAD_TIMEOUT)
+            DAILY_WEATHER_ALERTS.pop(channel_id, None)
+            DAILY_WEATHER_ALERT_REGIONS.pop(channel_id, None)
+            DAILY_WEATHER_ALERTS_DATA_LOCK.release()
+            get_state_store().delete_job(job_name)
+            get_state_store().delete_fingerprints(channel_id)
+            logger.warning(fmt_log_msg('persistent_weather_alerts_stopped'))
+            say(Messages['persistent_weather_alerts_stopped'])
+        return
 
-    if WEATHER_ALERT_THREAD_LOCK.acquire(blocking=False) == False:
+    if not register_weather_alert_poll(channel_id, say, logger):
         logger.error(fmt_log_msg('persistent_weather_alerts_enabled'))
         return
     
     logger.warning(fmt_log_msg('persistent_weather_alerts_disabled'))
 
-    while True:
-        now = dt.datetime.now()
-        tgt = now.replace(minute=0, second=0, microsecond=0)
-        tgt += dt.timedelta(hours=1)
-        td = tgt - now
-        time.sleep(td.total_seconds())
-        weather_alerts = get_weather_alerts()
-        new_alerts = 0
+def register_weather_alert_poll(channel_id, say, logger):
+    """
+    Registers the hourly weather alert poll job of a channel with SCHEDULER and persists 
+    it in the state store so it is registered again when the bot restarts.
+
+        Parameters:
+
+            channel_id (string): channel the alerts are posted to
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console
+
+        Returns:
+
+            registered (bool): False if the channel already has a poll job.
+    """
+
+    job_name = f"{WEATHER_ALERT_JOB}:{channel_id}"
+
+    if not SCHEDULER.register(job_name, lambda scheduled: run_weather_alert_poll(scheduled, channel_id, say, logger),
+                              hourly()):
+        return False
+
+    get_state_store().save_job(job_name, WEATHER_ALERT_JOB, channel_id)
+    return True
+
+def run_weather_alert_poll(scheduled, channel_id, say, logger):
+    """
+    Scheduled job which requests the current weather alerts and adds any new alerts to the
+    channel's set of seen alerts in DAILY_WEATHER_ALERTS. Alerts are identified by their
+    fingerprint (region and type), so neither changes to unrelated page text nor another 
+    source answering the next poll make an alert look new, and fingerprints expire once 
+    an alert has not been seen for a day. Fingerprints are persisted in the state store so a restart does not announce
+    the same alerts again. Since DAILY_WEATHER_ALERTS may be accessed by run_daily_update(...) we use 
+    DAILY_WEATHER_ALERTS_DATA_LOCK to guarantee atomicity of actions which read and write
+    from and to DAILY_WEATHER_ALERTS. The set is cleared at DAILY_UPDATE_HOUR, before the daily update runs at DAILY_UPDATE_MINUTE, and 
+    repopulated with any new/existing alerts, so weather alerts from the previous day are
+    not cleared and posted at 1am to Slack. Also note that no weather alerts are sent to 
+    Slack during WEATHER_ALERT_BLACKOUT_HOURS which defaults to contain just the 
+    DAILY_UPDATE_HOUR; adding more hours will silence messages but not stop the job from
+    sending and receiving requests.
+
+        Parameters:
+
+            scheduled (datetime): time the poll was scheduled to run
+            channel_id (string): channel the alerts are posted to
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console
+
+        Returns:
+    """
+
+    weather_alerts = get_weather_alerts()
+
+    DAILY_WEATHER_ALERTS_DATA_LOCK.acquire(blocking=True, timeout=THREAD_TIMEOUT)
+    seen_alerts = DAILY_WEATHER_ALERTS.get(channel_id)
+    if seen_alerts is None:
+        seen_alerts = SeenAlerts(store=get_state_store(), scope=channel_id)
+        DAILY_WEATHER_ALERTS[channel_id] = seen_alerts
+    if scheduled.hour == DAILY_UPDATE_HOUR:
+        seen_alerts.clear()
+        DAILY_WEATHER_ALERT_REGIONS.pop(channel_id, None)
+
+    new_alerts = seen_alerts.add_new(weather_alerts)
+    DAILY_WEATHER_ALERT_REGIONS.setdefault(channel_id, set()).update(alert.region for alert in weather_alerts)
+
+    DAILY_WEATHER_ALERTS_DATA_LOCK.release()
+
+    if len(new_alerts) > 0 and scheduled.hour not in WEATHER_ALERT_BLACKOUT_HOURS:
+        say(weather_alert_message(alert.region for alert in new_alerts))
+
+    {logger.warning(fmt_log_msg(alert.text)) for alert in weather_alerts}
+
+@timed("/pass_notifications")
+def handle_pass_notifications_command(ack, command, logger, say):
+    """
+    Receives '/pass_notifications' slash command and sends an ack back to Slack callee.
+    Subscribes the channel the command was sent from to a notification posted a number of
+    minutes before every upcoming pass, with the AOS/LOS times, max elevation and azimuths
+    of the pass. The optional arguments are the lead time in minutes (default 10), the 
+    minimum max elevation in degrees and the minimum rating of the passes to notify about,
+    e.g. '/pass_notifications 15 30 2'. Sending the command again replaces the channel's
+    settings and '/pass_notifications stop' cancels the subscription.
+
+        Parameters:
+
+            ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console    
+
+        Returns:
+    """
+
+    ack()
+    channel_id = command['channel_id']
+    text = command.get("text", "").strip()
+
+    if text == STOP_ARG:
+        if get_pass_notifier().unsubscribe(channel_id):
+            get_state_store().delete_job(f"{PASS_NOTIFICATIONS_JOB}:{channel_id}")
+            logger.warning(fmt_log_msg('pass_notifications_stopped'))
+            say(Messages['pass_notifications_stopped'])
+        return
+
+    args = parse_notification_args(text)
+
+    if args is None:
+        logger.error(fmt_log_msg('pass_notifications_invalid'))
+        say(Messages['pass_notifications_invalid'])
+        return
+
+    num_passes = register_pass_notifications(channel_id, **args)
+    logger.warning(fmt_log_msg('pass_notifications_enabled'))
+    say(f"{Messages['pass_notifications_enabled']}: {num_passes} upcoming pass(es) in the next 24 hours")
+
+def register_pass_notifications(channel_id, lead_minutes, min_alt_deg, min_rating, announce_late=True):
+    """
+    Subscribes a channel to pre-pass notifications and persists the subscription in the
+    state store so it is registered again when the bot restarts.
+
+        Parameters:
+
+            channel_id (string): channel the notifications are posted to
+            lead_minutes (int): minutes before AOS the notifications are posted
+            min_alt_deg (float): minimum max elevation of the passes to notify about
+            min_rating (int): minimum rating of the passes to notify about
+            announce_late (bool): optionally announce a pass starting sooner than the lead 
+                                  time right away. Only a subscription typed by a user does,
+                                  a restored one would post the notification again.
+
+        Returns:
+
+            num_passes (int): number of notifications scheduled for the channel.
+    """
+
+    from pass_notifier import Subscription
+
+    subscription = Subscription(channel_id, lead_minutes, min_alt_deg, min_rating)
+    num_passes = get_pass_notifier().subscribe(subscription, announce_late=announce_late)
+    get_state_store().save_job(f"{PASS_NOTIFICATIONS_JOB}:{channel_id}", PASS_NOTIFICATIONS_JOB, channel_id,
+                               {"lead_minutes": lead_minutes, "min_alt_deg": min_alt_deg, "min_rating": min_rating})
+    return num_passes
+
+def parse_notification_args(text):
+    """
+    Parses the optional arguments of the '/pass_notifications' slash command.
+
+        Parameters:
+
+            text (string): text typed after the slash command.
+
+        Returns:
+
+            args (dict): lead_minutes, min_alt_deg and min_rating, with defaults for 
+                         arguments which were not given, or None if the arguments are
+                         invalid.
+    """
+
+    from pass_notifier import DEFAULT_LEAD_MINUTES
+
+    values = text.split()
+
+    if len(values) > 3:
+        return None
+
+    try:
+        lead_minutes = int(values[0]) if len(values) > 0 else DEFAULT_LEAD_MINUTES
+        min_alt_deg = float(values[1]) if len(values) > 1 else 0.0
+        min_rating = int(values[2]) if len(values) > 2 else 0
+    
+    except ValueError:
+        return None
+
+    if not 1 <= lead_minutes <= MAX_NOTIFICATION_LEAD_MINUTES or not 0 <= min_alt_deg <= 90:
+        return None
+
+    if not 0 <= min_rating <= MAX_PASS_RATING:
+        return None
+
+    return {"lead_minutes": lead_minutes, "min_alt_deg": min_alt_deg, "min_rating": min_rating}
+
+@timed("/scheduled_jobs")
+def handle_scheduled_jobs_command(ack, logger, say):
+    """
+    Receives '/scheduled_jobs' slash command and sends an ack back to Slack callee. Sends
+    a list of the jobs registered with SCHEDULER and their next run times to Slack callee.
 
-        DAILY_WEATHER_ALERTS_DATA_LOCK.acquire(blocking=True, timeout=THREAD_TIMEOUT)
-        if tgt.hour == DAILY_UPDATE_HOUR:
-            DAILY_WEATHER_ALERTS.clear()
+        Parameters:
 
-        for alert in weather_alerts:
-            if alert not in DAILY_WEATHER_ALERTS:
-                DAILY_WEATHER_ALERTS.append(alert)
-                new_alerts += 1
+            ack: Slack API object to send ack back to callee process
+            say: Slack API object which allows app to send text back to Slack
+            logger: Slack API object which prints text to console    
 
-        DAILY_WEATHER_ALERTS_DATA_LOCK.release()
+        Returns:
+    """
 
-        if new_alerts > 0 and tgt.hour not in WEATHER_ALERT_BLACKOUT_HOURS:
-            say(f"{Messages['weather_alerts']}")
+    ack()
+    jobs = SCHEDULER.list_jobs()
+    logger.warning(fmt_log_msg('scheduled_jobs'))
 
-        {logger.warning(fmt_log_msg(alert)) for alert in weather_alerts}
+    if len(jobs) == 0:
+        say(Messages['no_scheduled_jobs'])
+        return
 
-@app.command("/pass_info")
-def handle_pass_info_command(ack, logger, say):
+    say("\n".join(f"{job.name}: next run {job.next_run.strftime(DT_FORMAT)}" for job in jobs))
+
+@timed("/pass_info")
+def handle_pass_info_command(ack, command, logger, say):
     """
     Receives '/pass_info' slash command and sends an ack back to Slack callee. Calls 
     get_pass_table(...) to get a formatted string with pass information for the next 
-    24 hours. Logs and sends formatted pass info string to Slack callee.
+    24 hours, or for the number of days given as the command argument (e.g. 
+    '/pass_info 7'). Concurrent requests for the same number of days share one call
+    through REQUEST_COALESCER. Logs and sends formatted pass info string to Slack callee.
 
         Parameters:
 
             ack: Slack API object to send ack back to callee process
+            command: Slack API object with the slash command payload
             say: Slack API object which allows app to send text back to Slack
             logger: Slack API object which prints text to console    
 
@@ -197,15 +447,14 @@ def handle_pass_info_command(ack, logger, say):
     """
 
     ack()
-    pass_table = get_pass_table()
-    logger.warning(fmt_log_msg('pass_info'))
-    say(pass_table)
+    say(request_pass_info(command, logger).result())
 
-@app.command("/weather_alerts")
+@timed("/weather_alerts")
 def handle_weather_alerts_command(ack, logger, say):
     """
     Receives '/weather_alerts' slash command and sends an ack back to Slack callee. Calls 
-    get_weather_alerts(...) to get a list of json weather alert objects from Weatherbit. 
+    get_weather_alerts(...) to get a list of weather alert records from all alert sources,
+    sharing one request between concurrent callers through REQUEST_COALESCER.
     If there are any alert objects then create a formatted string to send to Slack callee 
     and log an update message.
 
@@ -219,39 +468,161 @@ def handle_weather_alerts_command(ack, logger, say):
     """
 
     ack()
-    alerts = get_weather_alerts()
+    reply = request_weather_alerts(logger).result()
+
+    if reply is not None:
+        say(reply)
+
+def request_pass_info(command, logger):
+    """
+    Shared body of the '/pass_info' handlers of both runtimes. Parses the number of days
+    argument and queues the pass table with REQUEST_COALESCER, so concurrent requests 
+    for the same number of days share one call. The synchronous runtime waits for the
+    returned future, the asyncio runtime awaits it.
+
+        Parameters:
+
+            command: Slack API object with the slash command payload
+            logger: Slack API object which prints text to console
+
+        Returns:
+
+            reply (Future): resolves to the text to send back to Slack callee.
+    """
+
+    num_days = parse_num_days(command.get("text", ""))
+
+    if num_days is None:
+        logger.error(fmt_log_msg('pass_info_invalid_days'))
+        return completed(Messages['pass_info_invalid_days'])
+
+    try:
+        pass_table = REQUEST_COALESCER.submit(("pass_table", num_days), get_pass_table, num_days=num_days)
+
+    except Overloaded:
+        logger.error(fmt_log_msg('busy'))
+        return completed(Messages['busy'])
+
+    def reply(pass_table):
+        logger.warning(fmt_log_msg('pass_info'))
+        return pass_table
+
+    return then(pass_table, reply)
+
+def request_weather_alerts(logger):
+    """
+    Shared body of the '/weather_alerts' handlers of both runtimes. Queues the alert
+    request with REQUEST_COALESCER, see request_pass_info(...).
+
+        Parameters:
+
+            logger: Slack API object which prints text to console
+
+        Returns:
+
+            reply (Future): resolves to the text to send back to Slack callee, or None
+                            if there are no alerts.
+    """
+
+    try:
+        alerts = REQUEST_COALESCER.submit("weather_alerts", get_weather_alerts)
+
+    except Overloaded:
+        logger.error(fmt_log_msg('busy'))
+        return completed(Messages['busy'])
+
+    def reply(alerts):
+        if len(alerts) > 0:
+            logger.warning(fmt_log_msg('new_weather_alerts'))
+            return weather_alert_message(alert.region for alert in alerts)
 
-    num_alerts = len(alerts)
-    
-    if num_alerts > 0:
-        alert_msg = f"{Messages['weather_alerts']}"
-        say(alert_msg)
-        logger.warning(fmt_log_msg('new_weather_alerts'))
-    
-    else:
         logger.warning(fmt_log_msg('no_weather_alerts'))
+        return None
+
+    return then(alerts, reply)
 
-def get_pass_table(dt_format=DT_FORMAT):
+def completed(result):
     """
-    Computes pass times, max elevation angle, and pass duration. 
+    Creates a future which already holds a result.
+
+        Parameters:
+
+            result: value of the future
+
+        Returns:
+
+            future (Future): completed future.
+    """
+
+    future = Future()
+    future.set_result(result)
+    return future
+
+def then(future, func):
+    """
+    Creates a future of func applied to the result of another future. Exceptions of
+    either are passed on to the new future.
+
+        Parameters:
+
+            future (Future): future whose result is passed to func
+            func (function): function of one argument
+
+        Returns:
+
+            future (Future): future of func's result.
+    """
+
+    chained = Future()
+
+    def done(future):
+        try:
+            chained.set_result(func(future.result()))
+        except Exception as err:
+            chained.set_exception(err)
+
+    future.add_done_callback(done)
+    return chained
+
+@timed()
+def get_pass_table(dt_format=DT_FORMAT, num_days=1, start=None):
+    """
+    Computes pass times, max elevation angle, and pass duration. Passes for the next 
+    24 hours are read from PASS_SCHEDULE which only propagates the part of the horizon 
+    not already computed. Longer horizons are searched in parallel day sized chunks by 
+    iter_passes_long_horizon(...).
 
         Parameters:
 
             dt_format (string): optional format specifier string which controls the 
                                 time resolution of pass start times.
+            num_days (int): optional number of days from now to list passes for.
+            start (datetime): optional UTC time to list passes from instead of now.
 
         Returns: 
 
             pass_table (string): text formatted as a table with start time, max elevation 
                                  angle, and pass duration for all passes above 15 degrees
-                                 for the next 24 hours from the time the command was
-                                 received.
+                                 for the next num_days days from the time the command 
+                                 was received.
     """
 
-    passes = compute_passes()
-    passes = [pi_obj for pi_obj in passes if pi_obj.max_alt_deg >= 15.0]
+    from tabulate import tabulate
+    from pass_planner_helper import ORCASAT_NORAD_ID, get_context
+    from pass_table import PassTable
+    from batch_planner import iter_passes_long_horizon
+
+    pass_schedule = get_pass_schedule()
+
+    if num_days <= pass_schedule.horizon.days:
+        passes = pass_schedule.upcoming(dt.timedelta(days=num_days), now=start)
+    else:
+        passes = iter_passes_long_horizon(ORCASAT_NORAD_ID, num_days, start=start)
+
+    local_tz = get_context().local_tz
+    passes = PassTable.from_passes(passes).filter(min_alt_deg=15.0)
     passes = [ 
-                [pi.local_start_time.strftime(dt_format), 
+                [pi.start_dt_utc.astimezone(local_tz).strftime(dt_format), 
                 round(pi.max_alt_deg, 0), 
                 round(pi.duration.total_seconds(), 0)] 
                 for pi in passes 
@@ -260,66 +631,357 @@ def get_pass_table(dt_format=DT_FORMAT):
     pass_table = tabulate(passes, headers=pass_table_headers, tablefmt="plain", numalign="right", stralign="left")
     return pass_table
 
-def get_weather_alerts():
+def get_pass_schedule():
     """
-    Sends formatted requests to Weatherbit API to receive list of json objects which
-    contain weather alert information. Requests are sent with a timeout specified by
-    HTTP_TIMEOUT. Note that retries are not allowed due to the limited number of API
-    calls and my uncertainty around whether or not failed API requests count towards 
-    the total number of allowed requests. Note how the API token is stored and kept 
-    as an environment variable, this was a security best practice recommended by 
-    Slack API documentation and this convention was followed for the Weatherbit API
-    token as well.
+    Returns the shared pass schedule, creating it on first use. The schedule and the TLE
+    cache persist their passes and TLEs in the state store, so a restart resumes from the
+    stored passes instead of searching the whole horizon and fetching TLEs again.
 
         Parameters:
 
-        Returns: 
+        Returns:
+
+            pass_schedule (PassSchedule): rolling schedule of passes for the next 24 hours.
+    """
+
+    global PASS_SCHEDULE
+
+    with PASS_SCHEDULE_LOCK:
+        if PASS_SCHEDULE is None:
+            from pass_planner_helper import TLE_CACHE
+            from pass_schedule import PassSchedule
+            TLE_CACHE.use_store(get_state_store())
+            PASS_SCHEDULE = PassSchedule(horizon=dt.timedelta(days=1), store=get_state_store())
+
+    return PASS_SCHEDULE
+
+def get_pass_notifier():
+    """
+    Returns the shared pass notifier, creating it on first use. The notifier schedules a
+    one-off SCHEDULER job per upcoming pass from the passes in PASS_SCHEDULE and posts 
+    the notifications through the Slack web API. Sent notifications are recorded in the
+    state store so a restart does not post them again.
+
+        Parameters:
+
+        Returns:
 
+            pass_notifier (PassNotifier): notifier of the subscribed channels.
     """
+
+    global PASS_NOTIFIER
+
+    with PASS_NOTIFIER_LOCK:
+        if PASS_NOTIFIER is None:
+            from pass_notifier import PassNotifier
+            PASS_NOTIFIER = PassNotifier(get_pass_schedule(), SCHEDULER,
+                                         lambda channel_id, text: channel_poster(channel_id)(text),
+                                         store=get_state_store())
+
+    return PASS_NOTIFIER
+
+def parse_num_days(text):
     """
-    ################################### Warning ###################################
-        The following line is a deprecated string which specifies the web 
-        address for the Weatherbit API which is not currently being used.
-    ###############################################################################
-    weatherbit_url = f"{Messages['weatherbit_url']}{os.environ.get('WEATHERBIT_TOKEN')}"
-    ###############################################################################
+    Parses the optional number of days argument of the '/pass_info' slash command.
+
+        Parameters:
+
+            text (string): text typed after the slash command.
+
+        Returns:
+
+            num_days (int): number of days to list passes for, 1 if no argument was 
+                            given or None if the argument is not a whole number between
+                            1 and MAX_PASS_INFO_DAYS.
     """
-    gc_url = Messages['weather_gc_url']
-    
+
+    text = text.strip()
+
+    if not text:
+        return 1
+
     try:
-        req = get(gc_url, timeout=HTTP_TIMEOUT)
-        """
-        ################################### Warning ###################################
-            The following line sends a request to the weatherbit API. Weatherbit has
-            taken well over 24 hours to update their alert data after an alert has 
-            been posted to the government of Canada website. For this reason it has
-            been decided to scrape the government website directly to get punctual
-            alerts. Unfortunately, scraping the html directly opens the door to 
-            other reliability problems - mainly if the government of Canada ever 
-            changes the structure of their website, the scraper may not . 
-            Furthermore, constructing regular expressions to pattern match html may 
-            also fail if the content being looked for changes in structure. 
-            
-            Ideally, both a third party alert API and direct scraping could be used 
-            in an ensemble way to get new alerts and then . But this would take too 
-            much time to do right now given there are other problems which take 
-            priority. 
-        ###############################################################################
-        alerts = json.loads(req.text)["alerts"]
-        ###############################################################################
-        """
-         
-        vic_soup = BeautifulSoup(req.text)
-        search("[Nn][Oo] [Aa][Ll][Ee][Rr][Tt][Ss]", str(vic_soup.find_all("p"))).group()
-        return []
+        num_days = int(text)
     
-    except AttributeError as err:
-        return [str(vic_soup.find_all("p"))]
+    except ValueError:
+        return None
+
+    if num_days < 1 or num_days > MAX_PASS_INFO_DAYS:
+        return None
+
+    return num_days
+
+@timed()
+def get_weather_alerts():
+    """
+    Collects the current weather alerts from every source of the shared alert aggregator
+    (see get_alert_aggregator(...)). Sources are queried concurrently, each with its own
+    timeout. The sources covering one region race each other, so every region's alerts
+    are returned as soon as ALERT_QUORUM of its sources answered.
+    Note that retries are not allowed due to the limited number of Weatherbit API calls 
+    and my uncertainty around whether or not failed API requests count towards the total
+    number of allowed requests. Note how the API token is stored and kept as an 
+    environment variable, this was a security best practice recommended by Slack API 
+    documentation and this convention was followed for the Weatherbit API token as well.
+
+        Parameters:
+
+        Returns: 
+
+            alerts (list): Alert records with any duplicates between sources removed,
+                           empty if there are no alerts or no source answered.
+    """
+
+    try:
+        return get_alert_aggregator().collect()
     
     except:
+        WEATHER_ALERT_ERRORS.inc()
         print(fmt_log_msg('http_error'))
         return []
 
+def weather_alert_message(regions=None):
+    """
+    Text announcing new weather alerts with a link to the weather.gc.ca report page of
+    every region the alerts were reported in.
+
+        Parameters:
+
+            regions (iterable): optional region codes of the alerts, e.g. bc43. Defaults to
+                                every region in WEATHER_GC_REGIONS, e.g. when the regions
+                                of the alerts were lost in a restart.
+
+        Returns:
+
+            message (string): text to post to Slack.
+    """
+
+    regions = set(regions or ())
+
+    if not regions:
+        from alert_aggregator import DEFAULT_GC_REGIONS
+        regions = set(DEFAULT_GC_REGIONS)
+
+    links = " ".join(Messages['weather_gc_url'].format(region=region) for region in sorted(regions))
+    return f"{Messages['weather_alerts']}: {links}"
+
+def get_alert_aggregator():
+    """
+    Returns the shared alert aggregator, creating it on first use. The aggregator scrapes
+    the weather.gc.ca report page of every region in WEATHER_GC_REGIONS (default bc43) 
+    and, when WEATHERBIT_TOKEN is set, also queries the Weatherbit API. Scraping the 
+    government website gets punctual alerts while Weatherbit keeps working if the 
+    structure of the website changes.
+
+        Parameters:
+
+        Returns:
+
+            aggregator (AlertAggregator): aggregator returning the list of current alerts.
+    """
+
+    global ALERT_AGGREGATOR
+
+    with ALERT_AGGREGATOR_LOCK:
+        if ALERT_AGGREGATOR is None:
+            from alert_aggregator import AlertAggregator, default_sources
+            ALERT_AGGREGATOR = AlertAggregator(default_sources(), quorum=ALERT_QUORUM)
+
+    return ALERT_AGGREGATOR
+
+def get_state_store():
+    """
+    Returns the shared state store, opening it on first use. The database file is 
+    STATE_DB_PATH, which defaults to .cache/state.db next to this file.
+
+        Parameters:
+
+        Returns:
+
+            store (StateStore): SQLite store of jobs, alert fingerprints, TLEs and passes.
+    """
+
+    global STATE_STORE
+
+    with STATE_STORE_LOCK:
+        if STATE_STORE is None:
+            STATE_STORE = StateStore()
+
+    return STATE_STORE
+
+def channel_poster(channel_id):
+    """
+    Creates a function posting text to a channel through the Slack web API, used in place
+    of the say object of a slash command by jobs restored from the state store.
+
+        Parameters:
+
+            channel_id (string): channel to post to
+
+        Returns:
+
+            say (function): function which takes the text to post.
+    """
+
+    return lambda text: get_web_client().chat_postMessage(channel=channel_id, text=text)
+
+def get_web_client():
+    """
+    Returns the Slack web client shared by the bolt app of the synchronous runtime and
+    the jobs posting through channel_poster(...), creating it on first use.
+
+        Parameters:
+
+        Returns:
+
+            client (WebClient): client authorized with SLACK_BOT_TOKEN.
+    """
+
+    global WEB_CLIENT
+
+    with APP_LOCK:
+        if WEB_CLIENT is None:
+            from slack_sdk import WebClient
+            WEB_CLIENT = WebClient(token=os.environ.get("SLACK_BOT_TOKEN"))
+
+    return WEB_CLIENT
+
+def get_app(listener_executor=None):
+    """
+    Returns the bolt app of the synchronous runtime with the slash command handlers
+    registered, creating it on first use. Creating the app verifies the bot token with
+    an auth.test call, so it is only created when the synchronous runtime runs, not when
+    this module is imported by the asyncio runtime or by worker processes.
+
+        Parameters:
+
+            listener_executor (Executor): optional executor the app runs its listeners on
+                                          instead of bolt's default thread pool, e.g. to
+                                          instrument them in the load test. Only used
+                                          when the app is created.
+
+        Returns:
+
+            app (App): bolt app posting through get_web_client(...).
+    """
+
+    global APP
+
+    client = get_web_client()
+
+    with APP_LOCK:
+        if APP is None:
+            app = App(client=client, token_verification_enabled=TOKEN_VERIFICATION,
+                      listener_executor=listener_executor)
+            app.event("app_mention")(handle_app_mention_events)
+            app.event("message")(handle_message_events)
+            app.command("/daily_update")(handle_daily_update_command)
+            app.command("/persistent_weather_alerts")(handle_persistent_weather_alerts_command)
+            app.command("/pass_notifications")(handle_pass_notifications_command)
+            app.command("/scheduled_jobs")(handle_scheduled_jobs_command)
+            app.command("/pass_info")(handle_pass_info_command)
+            app.command("/weather_alerts")(handle_weather_alerts_command)
+            APP = app
+
+    return APP
+
+def restore_state():
+    """
+    Registers the jobs persisted in the state store with SCHEDULER again, posting to the 
+    channels they were registered from. Jobs of an unknown type are dropped from the store.
+
+        Parameters:
+
+        Returns:
+    """
+
+    store = get_state_store()
+    num_jobs = 0
+
+    for job in store.load_jobs():
+        say = channel_poster(job.channel_id)
+
+        if job.kind == DAILY_UPDATE_JOB:
+            register_daily_update(job.channel_id, say)
+
+        elif job.kind == WEATHER_ALERT_JOB:
+            register_weather_alert_poll(job.channel_id, say, logging.getLogger(__name__))
+
+        elif job.kind == PASS_NOTIFICATIONS_JOB:
+            # Needs the pass schedule, keep the subscription stored if no TLE is available yet
+            try:
+                register_pass_notifications(job.channel_id, **job.args, announce_late=False)
+
+            except Exception as err:
+                print(fmt_log_msg(f"{Messages['pass_notifications_restore_failed']}: {err}"))
+                continue
+
+        else:
+            store.delete_job(job.name)
+            continue
+
+        num_jobs += 1
+
+    print(fmt_log_msg(f"{Messages['state_restored']}: {num_jobs}"))
+
+def register_catalog_refresh():
+    """
+    Registers a job which refreshes the TLE catalog from the Celestrak groups listed in 
+    the CELESTRAK_GROUPS environment variable every CATALOG_REFRESH_INTERVAL, starting 
+    now. Each group is downloaded in one request, so any number of satellites is kept up
+    to date with a handful of requests. Nothing is registered when no groups are listed.
+
+        Parameters:
+
+        Returns:
+    """
+
+    from tle_catalog import DEFAULT_GROUPS
+
+    if not DEFAULT_GROUPS:
+        return
+
+    SCHEDULER.register(CATALOG_REFRESH_JOB, lambda scheduled: run_catalog_refresh(), every(CATALOG_REFRESH_INTERVAL),
+                       first_run=dt.datetime.now())
+
+def run_catalog_refresh():
+    """
+    Downloads the CELESTRAK_GROUPS group files into the TLE catalog. Runs on one of 
+    SCHEDULER's workers, so the downloads do not hold up the other jobs.
+
+        Parameters:
+
+        Returns:
+    """
+
+    from pass_planner_helper import TLE_CATALOG
+    num_tles = TLE_CATALOG.ingest_groups()
+    print(fmt_log_msg(f"{Messages['tle_catalog_refreshed']}: {num_tles}"))
+
+def warm_up():
+    """
+    Loads the heavy modules, the shared planning context, the pass schedule and the 
+    worker processes of long horizon pass searches so the first slash command does not 
+    pay for them. Meant to be run in a background thread once the Socket Mode connection 
+    is up.
+
+        Parameters:
+
+        Returns:
+    """
+
+    try:
+        import bs4, requests, tabulate
+        from pass_planner_helper import get_context
+        from batch_planner import warm_up_process_pool
+        get_context()
+        warm_up_process_pool()
+        get_pass_schedule().refresh()
+        print(fmt_log_msg('warm_up_done'))
+
+    except Exception as err:
+        print(fmt_log_msg(f"{Messages['warm_up_failed']}: {err}"))
+
 def fmt_log_msg(msg, dt_format=DT_FORMAT):
     """
     Creates a formatted string to be logged to the console the application is run from.
@@ -351,5 +1013,18 @@ def fmt_log_msg(msg, dt_format=DT_FORMAT):
         return f"[{dt.datetime.now().strftime(dt_format)}]: {msg}"
     
 
-if __name__ == "__main__":
-    SocketModeHandler(app, os.environ["SLACK_APP_TOKEN"]).start()
\ No newline at end of file
+if __name__ == "__main__" and (ASYNC_RUNTIME or "--async" in sys.argv[1:]):
+    import asyncio
+    # async_slackbot imports this module by name, share it instead of loading a second copy
+    sys.modules.setdefault("slackbot", sys.modules[__name__])
+    import async_slackbot
+    asyncio.run(async_slackbot.main())
+
+elif __name__ == "__main__":
+    handler = SocketModeHandler(get_app(), os.environ["SLACK_APP_TOKEN"])
+    start_http_server()
+    handler.connect()
+    restore_state()
+    register_catalog_refresh()
+    Thread(target=warm_up, name="warm-up", daemon=True).start()
+    Event().wait()
\ No newline at end of file
@@ -0,0 +1,322 @@
+'''
+Embedded SQLite store for runtime state which has to survive restarts: scheduled jobs, seen
+alert fingerprints, cached TLEs, precomputed pass windows and sent pass notifications.
+'''
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from tle_cache import TLEEntry
+
+DEFAULT_DB_PATH = os.environ.get("STATE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "state.db"))
+DEFAULT_FLUSH_INTERVAL_S = 1.0
+DEFAULT_BATCH_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    args TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alert_fingerprints (
+    scope TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (scope, fingerprint)
+);
+CREATE TABLE IF NOT EXISTS tles (
+    norad_catalog_num INTEGER PRIMARY KEY,
+    line_1 TEXT NOT NULL,
+    line_2 TEXT NOT NULL,
+    name TEXT NOT NULL,
+    epoch TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pass_windows (
+    schedule TEXT NOT NULL,
+    tle_epoch TEXT NOT NULL,
+    start_s REAL NOT NULL,
+    end_s REAL NOT NULL,
+    culmination_s REAL NOT NULL,
+    max_alt_deg REAL NOT NULL,
+    PRIMARY KEY (schedule, start_s)
+);
+CREATE TABLE IF NOT EXISTS sent_notifications (
+    channel_id TEXT NOT NULL,
+    pass_start_s REAL NOT NULL,
+    PRIMARY KEY (channel_id, pass_start_s)
+);
+"""
+
+
+class JobRecord(NamedTuple):
+    """A persisted scheduled job."""
+    name: str
+    kind: str
+    channel_id: str
+    args: Dict[str, Any]
+
+
+class PassWindowRecord(NamedTuple):
+    """A persisted pass summary, times in Unix seconds."""
+    start_s: float
+    end_s: float
+    culmination_s: float
+    max_alt_deg: float
+
+
+class StateStore:
+    """
+    SQLite database in WAL mode. Writes are queued and committed together in one transaction,
+    either once batch_size writes are queued or after flush_interval_s, so frequent small
+    updates do not each pay for a commit. Reads flush the queue first so they always see
+    earlier writes.
+    """
+    def __init__(self, path: str = DEFAULT_DB_PATH, flush_interval_s: float = DEFAULT_FLUSH_INTERVAL_S,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Open (and create if needed) a StateStore.
+
+        :param path: Database file, or ":memory:".
+        :param flush_interval_s: Max time in seconds a write waits in the queue.
+        :param batch_size: Number of queued writes which triggers an immediate flush.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        self._flush_interval_s = flush_interval_s
+        self._batch_size = batch_size
+        self._pending: List[Tuple[str, Sequence[Any]]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_periodically, name="state-store-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def flush(self):
+        """Commit all queued writes in one transaction."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """Flush queued writes and close the database."""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            self._conn.close()
+        self._closing.set()
+        self._wake.set()
+
+    # Scheduled jobs
+
+    def save_job(self, name: str, kind: str, channel_id: str, args: Optional[Dict[str, Any]] = None):
+        """
+        Persist a registered job.
+
+        :param name: Unique job name.
+        :param kind: Type of job, used to recreate it on startup.
+        :param channel_id: Channel the job posts to.
+        :param args: JSON serializable job arguments.
+        """
+        self._write("INSERT OR REPLACE INTO jobs (name, kind, channel_id, args) VALUES (?, ?, ?, ?)",
+                    (name, kind, channel_id, json.dumps(args or {})))
+
+    def delete_job(self, name: str):
+        """
+        Forget a cancelled job.
+
+        :param name: Unique job name.
+        """
+        self._write("DELETE FROM jobs WHERE name = ?", (name,))
+
+    def load_jobs(self) -> List[JobRecord]:
+        """Returns every persisted job."""
+        rows = self._read("SELECT name, kind, channel_id, args FROM jobs ORDER BY name")
+        return [JobRecord(name, kind, channel_id, json.loads(args)) for name, kind, channel_id, args in rows]
+
+    # Alert fingerprints
+
+    def save_fingerprints(self, scope: str, expiry: Dict[str, float]):
+        """
+        Persist alert fingerprints and their expiry times.
+
+        :param scope: Owner of the fingerprints, e.g. a channel.
+        :param expiry: Unix expiry time by fingerprint.
+        """
+        for fingerprint, expires_at in expiry.items():
+            self._write("INSERT OR REPLACE INTO alert_fingerprints (scope, fingerprint, expires_at) VALUES (?, ?, ?)",
+                        (scope, fingerprint, expires_at))
+
+    def delete_fingerprints(self, scope: str, before: Optional[float] = None):
+        """
+        Forget the fingerprints of a scope, or only the ones which expired before a time.
+
+        :param scope: Owner of the fingerprints.
+        :param before: Unix time, defaults to deleting every fingerprint of the scope.
+        """
+        if before is None:
+            self._write("DELETE FROM alert_fingerprints WHERE scope = ?", (scope,))
+        else:
+            self._write("DELETE FROM alert_fingerprints WHERE scope = ? AND expires_at <= ?", (scope, before))
+
+    def load_fingerprints(self, scope: str, now: float) -> Dict[str, float]:
+        """
+        Returns the unexpired fingerprints of a scope.
+
+        :param scope: Owner of the fingerprints.
+        :param now: Current Unix time.
+        """
+        rows = self._read("SELECT fingerprint, expires_at FROM alert_fingerprints WHERE scope = ? AND expires_at > ?",
+                          (scope, now))
+        return dict(rows)
+
+    # TLEs
+
+    def save_tle(self, norad_catalog_num: int, entry: TLEEntry):
+        """
+        Persist a TLE.
+
+        :param norad_catalog_num: The norad catalog number of the satellite.
+        :param entry: The TLE.
+        """
+        self._write("INSERT OR REPLACE INTO tles (norad_catalog_num, line_1, line_2, name, epoch, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (norad_catalog_num, entry.lines[0], entry.lines[1], entry.name, entry.epoch.isoformat(),
+                     entry.fetched_at))
+
+    def delete_tle(self, norad_catalog_num: int):
+        """
+        Forget the TLE of a satellite.
+
+        :param norad_catalog_num: The norad catalog number of the satellite.
+        """
+        self._write("DELETE FROM tles WHERE norad_catalog_num = ?", (norad_catalog_num,))
+
+    def load_tle(self, norad_catalog_num: int) -> Optional[TLEEntry]:
+        """
+        Returns the persisted TLE of a satellite, if any.
+
+        :param norad_catalog_num: The norad catalog number of the satellite.
+        """
+        rows = self._read("SELECT line_1, line_2, name, epoch, fetched_at FROM tles WHERE norad_catalog_num = ?",
+                          (norad_catalog_num,))
+        if not rows:
+            return None
+        line_1, line_2, name, epoch, fetched_at = rows[0]
+        return TLEEntry((line_1, line_2), name, datetime.fromisoformat(epoch), fetched_at)
+
+    # Pass windows
+
+    def save_pass_windows(self, schedule: str, tle_epoch: datetime, windows: Sequence[PassWindowRecord]):
+        """
+        Persist the passes of a schedule, replacing passes computed from other TLEs.
+
+        :param schedule: Identifies the satellite and ground station of the schedule.
+        :param tle_epoch: Epoch of the TLE the passes were computed from.
+        :param windows: The passes.
+        """
+        self._write("DELETE FROM pass_windows WHERE schedule = ? AND tle_epoch != ?", (schedule, tle_epoch.isoformat()))
+        for window in windows:
+            self._write("INSERT OR REPLACE INTO pass_windows (schedule, tle_epoch, start_s, end_s, culmination_s, "
+                        "max_alt_deg) VALUES (?, ?, ?, ?, ?, ?)", (schedule, tle_epoch.isoformat(), *window))
+
+    def delete_pass_windows(self, schedule: str, ended_before_s: float):
+        """
+        Forget passes of a schedule which have ended.
+
+        :param schedule: Identifies the satellite and ground station of the schedule.
+        :param ended_before_s: Unix time.
+        """
+        self._write("DELETE FROM pass_windows WHERE schedule = ? AND end_s <= ?", (schedule, ended_before_s))
+
+    def load_pass_windows(self, schedule: str, tle_epoch: datetime, after_s: float) -> List[PassWindowRecord]:
+        """
+        Returns the persisted passes of a schedule computed from a TLE which end after a time.
+
+        :param schedule: Identifies the satellite and ground station of the schedule.
+        :param tle_epoch: Epoch of the TLE the passes were computed from.
+        :param after_s: Unix time.
+        """
+        rows = self._read("SELECT start_s, end_s, culmination_s, max_alt_deg FROM pass_windows "
+                          "WHERE schedule = ? AND tle_epoch = ? AND end_s > ? ORDER BY start_s",
+                          (schedule, tle_epoch.isoformat(), after_s))
+        return [PassWindowRecord(*row) for row in rows]
+
+    # Sent pass notifications
+
+    def save_sent_notification(self, channel_id: str, pass_start_s: float):
+        """
+        Record that the notification of a pass was posted to a channel.
+
+        :param channel_id: Channel the notification was posted to.
+        :param pass_start_s: Unix start time of the pass.
+        """
+        self._write("INSERT OR REPLACE INTO sent_notifications (channel_id, pass_start_s) VALUES (?, ?)",
+                    (channel_id, pass_start_s))
+
+    def delete_sent_notifications(self, channel_id: Optional[str] = None, before_s: Optional[float] = None):
+        """
+        Forget the sent notifications of a channel, of passes which started before a time, or both.
+
+        :param channel_id: Channel to forget the notifications of, defaults to every channel.
+        :param before_s: Unix time, defaults to forgetting every pass.
+        """
+        self._write("DELETE FROM sent_notifications WHERE (? IS NULL OR channel_id = ?) "
+                    "AND (? IS NULL OR pass_start_s < ?)", (channel_id, channel_id, before_s, before_s))
+
+    def load_sent_notifications(self, channel_id: str) -> Set[float]:
+        """
+        Returns the Unix start times of the passes whose notification was posted to a channel.
+
+        :param channel_id: Channel the notifications were posted to.
+        """
+        rows = self._read("SELECT pass_start_s FROM sent_notifications WHERE channel_id = ?", (channel_id,))
+        return {pass_start_s for pass_start_s, in rows}
+
+    def _write(self, sql: str, params: Sequence[Any]):
+        with self._lock:
+            self._pending.append((sql, params))
+            if len(self._pending) >= self._batch_size:
+                self._flush_locked()
+            else:
+                self._wake.set()
+
+    def _read(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute(sql, params).fetchall()
+
+    def _flush_locked(self):
+        if not self._pending or self._closed:
+            return
+        pending, self._pending = self._pending, []
+        with self._conn:
+            for sql, params in pending:
+                self._conn.execute(sql, params)
+
+    def _flush_periodically(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            # Let more writes join the batch before committing, close() flushes the rest itself
+            if self._closing.wait(self._flush_interval_s):
+                return
+            self.flush()
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from alert_aggregator import AlertAggregator, AlertSource
+from alerts import SOURCE_GC, SOURCE_WEATHERBIT, Alert
+
+
+def alert(region, kind, source=SOURCE_GC):
+    return Alert(source=source, region=region, kind=kind, area=f"area {region}", issued=None, text=kind)
+
+
+def delayed(delay_s, alerts):
+    def fetch():
+        time.sleep(delay_s)
+        return alerts
+    return fetch
+
+
+def failing():
+    raise RuntimeError("source down")
+
+
+def test_collect_waits_for_every_region():
+    fast = AlertSource("gc:bc43", delayed(0.0, [alert("bc43", "Wind warning")]), area="bc43")
+    slow = AlertSource("gc:bc40", delayed(0.3, [alert("bc40", "Snowfall warning")]), area="bc40")
+
+    for _ in range(3):
+        alerts = AlertAggregator([fast, slow]).collect()
+        assert sorted(a.region for a in alerts) == ["bc40", "bc43"]
+
+
+def test_collect_races_redundant_sources_of_a_region():
+    gc = AlertSource("gc:bc43", delayed(0.0, [alert("bc43", "Wind warning")]), area="bc43")
+    weatherbit = AlertSource("weatherbit:Victoria", delayed(5.0, [alert("bc43", "Late", SOURCE_WEATHERBIT)]),
+                             area="bc43")
+
+    start = time.monotonic()
+    alerts = AlertAggregator([gc, weatherbit]).collect()
+
+    assert time.monotonic() - start < 2.0
+    assert [a.kind for a in alerts] == ["Wind warning"]
+
+
+def test_collect_falls_back_to_redundant_source_when_preferred_fails():
+    gc = AlertSource("gc:bc43", failing, area="bc43")
+    weatherbit = AlertSource("weatherbit:Victoria", delayed(0.1, [alert("bc43", "Wind warning", SOURCE_WEATHERBIT)]),
+                             area="bc43")
+    other = AlertSource("gc:bc40", delayed(0.0, []), area="bc40")
+
+    alerts = AlertAggregator([gc, weatherbit, other]).collect()
+
+    assert [a.source for a in alerts] == [SOURCE_WEATHERBIT]
+
+
+def test_collect_keeps_answering_regions_when_one_region_fails():
+    ok = AlertSource("gc:bc43", delayed(0.0, [alert("bc43", "Wind warning")]), area="bc43")
+    down = AlertSource("gc:bc40", failing, area="bc40")
+
+    assert [a.region for a in AlertAggregator([ok, down]).collect()] == ["bc43"]
+
+
+def test_collect_raises_when_no_source_answers():
+    with pytest.raises(RuntimeError):
+        AlertAggregator([AlertSource("gc:bc43", failing, area="bc43")]).collect()
+
+
+def test_collect_merges_duplicates_in_source_order():
+    gc = AlertSource("gc:bc43", delayed(0.1, [alert("bc43", "Wind warning")]), area="bc43")
+    weatherbit = AlertSource("weatherbit:Victoria", delayed(0.0, [alert("bc43", "Wind warning", SOURCE_WEATHERBIT)]),
+                             area="bc43")
+
+    alerts = AlertAggregator([gc, weatherbit], quorum=2).collect()
+
+    assert [a.source for a in alerts] == [SOURCE_GC]
+
+
+def test_next_poll_joins_a_straggling_fetch_instead_of_queueing_behind_it():
+    calls = []
+
+    def slow():
+        calls.append("slow")
+        time.sleep(1.0)
+        return [alert("bc43", "Late", SOURCE_WEATHERBIT)]
+
+    gc = AlertSource("gc:bc43", delayed(0.0, [alert("bc43", "Wind warning")]), area="bc43")
+    weatherbit = AlertSource("weatherbit:Victoria", slow, area="bc43")
+    other = AlertSource("gc:bc40", delayed(0.0, [alert("bc40", "Snowfall warning")]), area="bc40")
+    aggregator = AlertAggregator([weatherbit, gc, other])
+
+    for _ in range(3):
+        start = time.monotonic()
+        alerts = aggregator.collect()
+        assert time.monotonic() - start < 0.5
+        assert sorted(a.kind for a in alerts) == ["Snowfall warning", "Wind warning"]
+
+    # The straggler was joined by the later polls rather than started again
+    assert calls == ["slow"]
+    time.sleep(1.1)
+    aggregator.collect()
+    assert calls == ["slow", "slow"]
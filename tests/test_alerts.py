@@ -0,0 +1,126 @@
+from datetime import datetime, timezone
+
+from alert_aggregator import AlertAggregator, AlertSource
+from alert_parser import parse_gc_report
+from alerts import SOURCE_GC, SOURCE_WEATHERBIT, Alert, SeenAlerts
+
+REPORT = """
+<html>
+<body>
+<header><nav>Menu updated {nav}</nav></header>
+<main>
+<h1>Victoria</h1>
+<h2>Wind warning in effect</h2>
+<p>Issued at 4:10 AM PST Tuesday 2 January 2024</p>
+<p>Strong winds are expected. {detail}</p>
+<h2>Special weather statement</h2>
+<p>Issued at 5:00 AM PST Tuesday 2 January 2024</p>
+<p>Heavy rain tonight.</p>
+</main>
+<footer>Date modified: {nav}</footer>
+</body>
+</html>
+"""
+
+NO_ALERTS = "<html><body><main><h1>Victoria</h1><p>No alerts in effect.</p></main></body></html>"
+
+UNSTRUCTURED = "<html><body><main><h1>Victoria</h1><p>Something unexpected happened.</p></main></body></html>"
+
+
+def alert(text="Heavy rain.", kind="Rainfall warning", issued=datetime(2024, 1, 2, 12, tzinfo=timezone.utc),
+          source=SOURCE_GC):
+    return Alert(source=source, region="bc43", kind=kind, area="Victoria", issued=issued, text=text)
+
+
+def test_parse_gc_report_returns_one_alert_per_heading():
+    alerts = parse_gc_report(REPORT.format(nav="today", detail=""), "bc43")
+
+    assert [a.kind for a in alerts] == ["Wind warning in effect", "Special weather statement"]
+    assert {a.area for a in alerts} == {"Victoria"}
+    assert {a.region for a in alerts} == {"bc43"}
+    assert alerts[0].issued == datetime(2024, 1, 2, 12, 10, tzinfo=timezone.utc)
+    assert "Strong winds" in alerts[0].text
+
+
+def test_parse_gc_report_without_alerts():
+    assert parse_gc_report(NO_ALERTS, "bc43") == []
+
+
+def test_parse_gc_report_keeps_unstructured_pages_as_one_alert():
+    alerts = parse_gc_report(UNSTRUCTURED, "bc43")
+    assert len(alerts) == 1
+    assert alerts[0].kind == "" and "Something unexpected" in alerts[0].text
+
+
+def test_fingerprints_ignore_changes_outside_structured_alerts():
+    before = parse_gc_report(REPORT.format(nav="today", detail=""), "bc43")
+    after = parse_gc_report(REPORT.format(nav="tomorrow", detail="Updated wording."), "bc43")
+    assert [a.fingerprint for a in before] == [a.fingerprint for a in after]
+
+
+def test_fingerprints_change_with_the_type_region_or_unstructured_text():
+    assert alert().fingerprint == alert(text="Reworded").fingerprint
+    assert alert().fingerprint != alert(kind="Wind warning").fingerprint
+    assert alert().fingerprint != alert()._replace(region="bc40").fingerprint
+    assert alert(kind="", issued=None).fingerprint != alert(kind="", issued=None, text="Reworded").fingerprint
+    # Whitespace and case do not matter
+    assert alert(kind="", issued=None).fingerprint == alert(kind="", issued=None, text="HEAVY  rain.").fingerprint
+
+
+def test_fingerprints_match_across_sources():
+    weatherbit = alert(kind="Rainfall Warning", source=SOURCE_WEATHERBIT, issued=None)._replace(area="Greater Victoria")
+    assert alert(kind="Rainfall warning in effect").fingerprint == weatherbit.fingerprint
+    assert alert().dedup_key == weatherbit.dedup_key
+
+
+def test_alert_reported_by_another_source_on_the_next_poll_is_posted_once():
+    gc_alert = alert(kind="Wind warning in effect")
+    weatherbit_alert = Alert(source=SOURCE_WEATHERBIT, region="bc43", kind="Wind Warning", area="Greater Victoria",
+                             issued=datetime(2024, 1, 2, 12, 30, tzinfo=timezone.utc), text="Strong winds expected.")
+    winners = iter(["gc", "weatherbit"])
+    winner = None
+
+    def source(name, alerts):
+        def fetch():
+            if name != winner:
+                raise RuntimeError("source down")
+            return alerts
+        return AlertSource(name, fetch, area="bc43")
+
+    aggregator = AlertAggregator([source("gc", [gc_alert]), source("weatherbit", [weatherbit_alert])])
+    seen = SeenAlerts(ttl_s=60)
+    posted = []
+    for now in (1000, 1030):
+        winner = next(winners)
+        posted.extend(seen.add_new(aggregator.collect(), now=now))
+
+    assert posted == [gc_alert]
+
+
+def test_seen_alerts_only_returns_new_alerts():
+    seen = SeenAlerts(ttl_s=60)
+    first, second = alert(), alert(kind="Wind warning")
+
+    assert seen.add_new([first], now=1000) == [first]
+    assert seen.add_new([first, second], now=1010) == [second]
+    assert seen.add_new([first, second], now=1020) == []
+
+
+def test_seen_alerts_expire_after_the_ttl_since_their_last_sighting():
+    seen = SeenAlerts(ttl_s=60)
+    first, second = alert(), alert(kind="Wind warning")
+
+    seen.add_new([first, second], now=1000)
+    # Seeing an alert again extends its expiry
+    seen.add_new([first], now=1050)
+    assert seen.add_new([first, second], now=1100) == [second]
+    assert seen.add_new([], now=1200) == []
+    assert seen.add_new([first], now=1200) == [first]
+
+
+def test_seen_alerts_clear():
+    seen = SeenAlerts(ttl_s=60)
+    seen.add_new([alert()])
+    assert alert() in seen and len(seen) == 1
+    seen.clear()
+    assert alert() not in seen and len(seen) == 0
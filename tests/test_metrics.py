@@ -0,0 +1,71 @@
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import metrics
+from metrics import MetricsServer, Profiler, Registry
+
+
+def busy(n=20000):
+    return sum(i * i for i in range(n))
+
+
+def test_concurrent_calls_are_profiled_one_at_a_time():
+    profiler = Profiler(enabled=True)
+    started, release = threading.Event(), threading.Event()
+    profiled = []
+
+    def outer():
+        started.set()
+        release.wait(timeout=5)
+        return "outer"
+
+    thread_result = []
+    thread = threading.Thread(target=lambda: thread_result.append(profiler.call(outer)))
+    thread.start()
+    started.wait(timeout=5)
+
+    # Runs unprofiled while the other thread's call holds the profiler
+    assert profiler.call(lambda: profiled.append(metrics._PROFILE_LOCK.locked()) or busy()) == busy()
+    release.set()
+    thread.join(timeout=5)
+
+    assert thread_result == ["outer"] and profiled == [True]
+    assert "outer" in profiler.report()
+    assert "busy" not in profiler.report()
+    assert not metrics._PROFILE_LOCK.locked()
+
+
+def test_errors_merging_statistics_do_not_reach_the_caller(monkeypatch):
+    def broken_stats(*args):
+        raise TypeError("Another profiling tool is already active")
+
+    profiler = Profiler(enabled=True)
+    monkeypatch.setattr(metrics.pstats, "Stats", broken_stats)
+
+    assert profiler.call(busy) == busy()
+    assert not metrics._PROFILE_LOCK.locked()
+
+
+def test_report_rejects_unknown_sort_keys():
+    profiler = Profiler(enabled=True)
+    profiler.call(busy)
+
+    assert "busy" in profiler.report("tottime")
+    with pytest.raises(ValueError):
+        profiler.report("bogus")
+
+
+def test_profile_endpoint_returns_400_for_unknown_sort_keys():
+    server = MetricsServer(port=0, registry=Registry(), profiler=Profiler()).start()
+    try:
+        url = f"http://127.0.0.1:{server.port}/profile"
+        with urllib.request.urlopen(f"{url}?sort=cumulative") as response:
+            assert response.status == 200
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{url}?sort=bogus")
+        assert error.value.code == 400
+    finally:
+        server.stop()
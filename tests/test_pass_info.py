@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from dateutil import tz
+from skyfield.api import EarthSatellite, load, wgs84
+
+from pass_planner_helper import (ADAPTIVE_MIN_STEP_S, ADAPTIVE_TOLERANCE_DEG, SAMPLING_ADAPTIVE, PassInfo,
+                                 PlanningContext, find_passes)
+
+ISS_TLE = (
+    "1 25544U 98067A   26289.50000000  .00016717  00000-0  10270-3 0  9005",
+    "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537",
+)
+
+
+@pytest.fixture(scope="module")
+def context():
+    return PlanningContext(timescale=load.timescale(builtin=True), utc=tz.gettz("UTC"),
+                           local_tz=tz.gettz("Canada/Vancouver"), station=wgs84.latlon(+48.46, -123.31))
+
+
+@pytest.fixture(scope="module")
+def sat(context):
+    return EarthSatellite(*ISS_TLE, "ISS (ZARYA)", context.timescale)
+
+
+@pytest.fixture(scope="module")
+def passes(context, sat):
+    start = sat.epoch
+    passes, _ = find_passes(sat, start, start + 2, altitude_degrees=10.0, context=context)
+    assert passes
+    return passes
+
+
+def interpolation_error_deg(pi):
+    """Max error of linearly interpolating the track's look angles, against 0.25 s sampling."""
+    offsets_s, _, _, _, alt_deg, az_deg = pi._track_arrays()
+    dense_s = np.arange(offsets_s[0], offsets_s[-1], 0.25)
+    alt, az, _ = pi.look_angles(dense_s)
+    alt_error = np.abs(np.interp(dense_s, offsets_s, alt_deg) - alt)
+    az_error = np.abs((np.interp(dense_s, offsets_s, np.degrees(np.unwrap(np.radians(az_deg)))) - az + 180) % 360 - 180)
+    return max(alt_error.max(), az_error.max())
+
+
+def test_fixed_track_matches_skyfield_look_angles(context, sat, passes):
+    pi = PassInfo(sat, passes[0].start_dt_utc, passes[0].end_dt_utc, context=context)
+    offsets_s, latitude_deg, _, d_slant_km, alt_deg, az_deg = pi._track_arrays()
+
+    alt, az, d = pi.look_angles(offsets_s)
+    np.testing.assert_allclose(alt_deg, alt, atol=1e-6)
+    np.testing.assert_allclose(az_deg, az, atol=1e-6)
+    np.testing.assert_allclose(d_slant_km, d, rtol=1e-9)
+    assert np.all(np.abs(latitude_deg) <= 52.0)
+
+
+def test_adaptive_track_meets_the_tolerance_with_few_samples(context, sat, passes):
+    for found in passes:
+        culminations = [found.culmination_dt_utc]
+        pi = PassInfo(sat, found.start_dt_utc, found.end_dt_utc, culminations=culminations, context=context,
+                      sampling=SAMPLING_ADAPTIVE)
+        offsets_s = pi._track_arrays()[0]
+        duration_s = found.duration.total_seconds()
+
+        assert offsets_s[0] == 0.0 and offsets_s[-1] == pytest.approx(duration_s)
+        assert np.any(np.isclose(offsets_s, (found.culmination_dt_utc - found.start_dt_utc).total_seconds()))
+        # The tolerance is met through an estimate, allow for its error
+        assert interpolation_error_deg(pi) < 3 * ADAPTIVE_TOLERANCE_DEG
+        assert len(offsets_s) < duration_s / ADAPTIVE_MIN_STEP_S / 3
+
+
+def test_adaptive_culmination_without_known_culminations(context, sat, passes):
+    for found in passes:
+        pi = PassInfo(sat, found.start_dt_utc, found.end_dt_utc, context=context, sampling=SAMPLING_ADAPTIVE)
+        assert pi.max_alt_deg == pytest.approx(found.max_alt_deg, abs=ADAPTIVE_TOLERANCE_DEG)
+        assert abs((pi.culmination_dt_utc - found.culmination_dt_utc).total_seconds()) < 30
@@ -0,0 +1,120 @@
+import datetime as dt
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import pytest
+
+import pass_notifier
+from pass_notifier import PassNotifier, Subscription
+from scheduler import Scheduler, once
+from state_store import StateStore
+
+
+class FakePass(NamedTuple):
+    start_dt_utc: datetime
+    end_dt_utc: datetime
+    max_alt_deg: float = 45.0
+    rating: int = 2
+
+
+class FakeSchedule:
+    horizon = timedelta(days=1)
+    tle_epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def __init__(self, passes):
+        self.passes = passes
+
+    def refresh(self, now=None):
+        return list(self.passes)
+
+
+class Posts:
+    def __init__(self):
+        self.posts = []
+        self.posted = threading.Event()
+
+    def __call__(self, channel_id, text):
+        self.posts.append((channel_id, time.monotonic()))
+        self.posted.set()
+
+
+@pytest.fixture(autouse=True)
+def plain_text(monkeypatch):
+    monkeypatch.setattr(pass_notifier, "format_notification", lambda pi, lead_minutes: "pass")
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler(max_workers=1)
+    yield scheduler
+    scheduler.stop()
+
+
+def upcoming_pass(starts_in):
+    start = datetime.now(timezone.utc) + starts_in
+    return FakePass(start, start + timedelta(minutes=8))
+
+
+def test_late_pass_is_announced_once_across_restarts(scheduler):
+    store = StateStore(":memory:")
+    schedule = FakeSchedule([upcoming_pass(timedelta(minutes=5))])
+    subscription = Subscription("C1", lead_minutes=10)
+
+    posts = Posts()
+    assert PassNotifier(schedule, scheduler, posts, store=store).subscribe(subscription) == 1
+    assert posts.posted.wait(2)
+
+    # A restarted bot restores the subscription, the pass must not be announced again
+    restarted = PassNotifier(schedule, scheduler, posts, store=store)
+    assert restarted.subscribe(subscription, announce_late=False) == 0
+    # Neither when the user sends the command again
+    assert restarted.subscribe(subscription) == 0
+    time.sleep(0.2)
+    assert len(posts.posts) == 1
+
+
+def test_unsubscribe_forgets_sent_notifications(scheduler):
+    store = StateStore(":memory:")
+    schedule = FakeSchedule([upcoming_pass(timedelta(minutes=5))])
+    notifier = PassNotifier(schedule, scheduler, Posts(), store=store)
+
+    notifier._notify("job", Subscription("C1"), schedule.passes[0])
+    assert store.load_sent_notifications("C1")
+
+    notifier.unsubscribe("C1")
+    assert not store.load_sent_notifications("C1")
+
+
+def test_filters_and_lead_time(scheduler):
+    passes = [upcoming_pass(timedelta(hours=2)), FakePass(*upcoming_pass(timedelta(hours=3))[:2], max_alt_deg=10.0)]
+    notifier = PassNotifier(FakeSchedule(passes), scheduler, Posts())
+
+    assert notifier.subscribe(Subscription("C1", lead_minutes=15, min_alt_deg=30.0)) == 1
+    job = next(job for job in scheduler.list_jobs() if job.name.startswith(f"{pass_notifier.NOTIFICATION_JOB}:"))
+    expected = (passes[0].start_dt_utc - timedelta(minutes=15)).astimezone().replace(tzinfo=None)
+    assert abs((job.next_run - expected).total_seconds()) < 1
+
+    with pytest.raises(ValueError):
+        notifier.subscribe(Subscription("C1", lead_minutes=24 * 60))
+
+
+def test_notification_is_on_time_while_scheduler_workers_are_busy(scheduler):
+    release = threading.Event()
+    # Occupies the only worker of the scheduler's pool like a slow weather poll
+    scheduler.register("weather_poll:C1", lambda scheduled: release.wait(5), once(),
+                       first_run=dt.datetime.now())
+
+    lead_minutes = 10
+    schedule = FakeSchedule([upcoming_pass(timedelta(minutes=lead_minutes, seconds=0.5))])
+    posts = Posts()
+    notifier = PassNotifier(schedule, scheduler, posts)
+
+    try:
+        due = time.monotonic() + 0.5
+        assert notifier.subscribe(Subscription("C1", lead_minutes=lead_minutes), announce_late=False) == 1
+        assert posts.posted.wait(3)
+        assert posts.posts[0][1] - due < 0.5
+    finally:
+        release.set()
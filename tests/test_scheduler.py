@@ -0,0 +1,146 @@
+import datetime as dt
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scheduler import Scheduler, daily_at, every, hourly, once
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler(max_workers=2)
+    yield scheduler
+    scheduler.stop()
+
+
+def soon(seconds=0.05):
+    return dt.datetime.now() + dt.timedelta(seconds=seconds)
+
+
+def test_daily_at_runs_later_today_or_tomorrow():
+    next_run = daily_at(6, 5)
+    assert next_run(dt.datetime(2024, 1, 1, 5, 0)) == dt.datetime(2024, 1, 1, 6, 5)
+    assert next_run(dt.datetime(2024, 1, 1, 6, 5)) == dt.datetime(2024, 1, 2, 6, 5)
+    assert next_run(dt.datetime(2024, 12, 31, 23, 0)) == dt.datetime(2025, 1, 1, 6, 5)
+
+
+def test_hourly_runs_at_the_start_of_the_next_hour():
+    assert hourly()(dt.datetime(2024, 1, 1, 5, 0)) == dt.datetime(2024, 1, 1, 6, 0)
+    assert hourly()(dt.datetime(2024, 1, 1, 23, 59, 59)) == dt.datetime(2024, 1, 2, 0, 0)
+
+
+def test_every_and_once():
+    after = dt.datetime(2024, 1, 1, 5, 0)
+    assert every(dt.timedelta(minutes=10))(after) == dt.datetime(2024, 1, 1, 5, 10)
+    assert once()(after) is None
+
+
+def test_register_rejects_duplicate_names(scheduler):
+    assert scheduler.register("job:a", lambda scheduled: None, hourly())
+    assert not scheduler.register("job:a", lambda scheduled: None, hourly())
+
+
+def test_once_job_runs_with_its_scheduled_time_and_is_removed(scheduler):
+    ran = []
+    done = threading.Event()
+    first_run = soon()
+
+    scheduler.register("job:once", lambda scheduled: (ran.append(scheduled), done.set()), once(), first_run=first_run)
+
+    assert done.wait(2)
+    assert ran == [first_run]
+    time.sleep(0.05)
+    assert scheduler.list_jobs() == []
+
+
+def test_recurring_job_runs_again(scheduler):
+    runs = []
+    done = threading.Event()
+
+    def job(scheduled):
+        runs.append(scheduled)
+        if len(runs) == 3:
+            done.set()
+
+    scheduler.register("job:every", job, every(dt.timedelta(milliseconds=50)), first_run=soon())
+
+    assert done.wait(2)
+    assert runs[1] - runs[0] == dt.timedelta(milliseconds=50)
+
+
+def test_cancelled_job_does_not_run(scheduler):
+    ran = threading.Event()
+    scheduler.register("job:cancelled", lambda scheduled: ran.set(), once(), first_run=soon(0.2))
+
+    assert scheduler.cancel("job:cancelled")
+    assert not scheduler.cancel("job:cancelled")
+    assert not ran.wait(0.4)
+
+
+def test_list_jobs_is_ordered_by_next_run(scheduler):
+    scheduler.register("job:late", lambda scheduled: None, once(), first_run=soon(60))
+    scheduler.register("job:early", lambda scheduled: None, once(), first_run=soon(30))
+
+    assert [job.name for job in scheduler.list_jobs()] == ["job:early", "job:late"]
+
+
+def test_blocked_job_does_not_delay_other_jobs(scheduler):
+    release = threading.Event()
+    ran = threading.Event()
+
+    scheduler.register("job:blocked", lambda scheduled: release.wait(5), once(), first_run=soon())
+    scheduler.register("job:on_time", lambda scheduled: ran.set(), once(), first_run=soon(0.1))
+
+    try:
+        assert ran.wait(1)
+    finally:
+        release.set()
+
+
+def test_job_does_not_overlap_itself(scheduler):
+    running = []
+    overlaps = []
+    done = threading.Event()
+
+    def job(scheduled):
+        overlaps.append(len(running))
+        running.append(scheduled)
+        time.sleep(0.1)
+        running.pop()
+        if len(overlaps) == 2:
+            done.set()
+
+    scheduler.register("job:slow", job, every(dt.timedelta(milliseconds=10)), first_run=soon())
+
+    assert done.wait(2)
+    assert overlaps[:2] == [0, 0]
+
+
+def test_job_runs_on_its_own_executor(scheduler):
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedicated")
+    names = []
+    done = threading.Event()
+
+    scheduler.register("job:dedicated", lambda scheduled: (names.append(threading.current_thread().name), done.set()),
+                       once(), first_run=soon(), executor=executor)
+
+    assert done.wait(2)
+    assert names[0].startswith("dedicated")
+    executor.shutdown()
+
+
+def test_failing_job_keeps_its_schedule(scheduler):
+    runs = []
+    done = threading.Event()
+
+    def job(scheduled):
+        runs.append(scheduled)
+        if len(runs) == 2:
+            done.set()
+        raise RuntimeError("job failed")
+
+    scheduler.register("job:failing", job, every(dt.timedelta(milliseconds=50)), first_run=soon())
+
+    assert done.wait(2)
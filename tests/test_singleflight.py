@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import Overloaded, SingleFlight
+
+
+def blocking_call(release, calls):
+    def fn(value):
+        calls.append(value)
+        release.wait(timeout=5)
+        return value * 2
+    return fn
+
+
+def test_concurrent_calls_with_the_same_key_share_one_computation():
+    flight = SingleFlight(max_workers=2)
+    release = threading.Event()
+    calls = []
+    fn = blocking_call(release, calls)
+
+    futures = [flight.submit("key", fn, 21) for _ in range(5)]
+    assert len({id(future) for future in futures}) == 1
+
+    release.set()
+    assert [future.result(timeout=5) for future in futures] == [42] * 5
+    assert calls == [21]
+
+
+def test_different_keys_are_computed_separately():
+    flight = SingleFlight(max_workers=2)
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+
+
+def test_results_are_cached_until_their_ttl_expires():
+    flight = SingleFlight(result_ttl_s=0.1)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do("key", fn) == 1
+    cached = flight.submit("key", fn)
+    assert cached.done() and cached.result() == 1
+
+    time.sleep(0.15)
+    assert flight.do("key", fn) == 2
+
+
+def test_invalidate_and_zero_ttl_skip_the_cache():
+    flight = SingleFlight(result_ttl_s=60)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do("key", fn) == 1
+    flight.invalidate("key")
+    assert flight.do("key", fn) == 2
+    assert flight.do("other", fn, ttl_s=0) == 3
+    assert flight.do("other", fn, ttl_s=0) == 4
+
+
+def test_failures_reach_every_waiting_caller_and_are_not_cached():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(timeout=5)
+        raise ValueError("boom")
+
+    futures = [flight.submit("key", fail) for _ in range(3)]
+    release.set()
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_new_computations_are_rejected_when_the_queue_is_full():
+    flight = SingleFlight(max_workers=1, max_queue=2)
+    release = threading.Event()
+    calls = []
+    fn = blocking_call(release, calls)
+
+    running = flight.submit("a", fn, 1)
+    queued = flight.submit("b", fn, 2)
+    with pytest.raises(Overloaded):
+        flight.submit("c", fn, 3)
+    # Joining a computation which is already queued does not count against the limit
+    assert flight.submit("b", fn, 2) is queued
+
+    release.set()
+    assert running.result(timeout=5) == 2
+    assert queued.result(timeout=5) == 4
+    assert flight.do("c", fn, 3, timeout=5) == 6
@@ -0,0 +1,143 @@
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from alerts import SOURCE_GC, Alert, SeenAlerts
+from state_store import PassWindowRecord, StateStore
+from tle_cache import TLEEntry
+
+TLE_EPOCH = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "state.db")
+
+
+def committed_jobs(db_path):
+    """Jobs visible to another connection, i.e. committed ones."""
+    with sqlite3.connect(db_path) as conn:
+        return [name for name, in conn.execute("SELECT name FROM jobs ORDER BY name")]
+
+
+def test_writes_are_queued_until_the_batch_is_full(db_path):
+    store = StateStore(db_path, flush_interval_s=60, batch_size=3)
+    try:
+        store.save_job("a", "kind", "C1")
+        store.save_job("b", "kind", "C1")
+        assert committed_jobs(db_path) == []
+
+        store.save_job("c", "kind", "C1")
+        assert committed_jobs(db_path) == ["a", "b", "c"]
+    finally:
+        store.close()
+
+
+def test_writes_are_committed_after_the_flush_interval(db_path):
+    store = StateStore(db_path, flush_interval_s=0.05)
+    try:
+        store.save_job("a", "kind", "C1")
+        deadline = time.monotonic() + 5
+        while not committed_jobs(db_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert committed_jobs(db_path) == ["a"]
+    finally:
+        store.close()
+
+
+def test_reads_see_queued_writes(db_path):
+    store = StateStore(db_path, flush_interval_s=60)
+    try:
+        store.save_job("a", "kind", "C1", {"lead_minutes": 10})
+        store.save_job("b", "kind", "C2")
+        store.delete_job("b")
+        assert [(job.name, job.args) for job in store.load_jobs()] == [("a", {"lead_minutes": 10})]
+    finally:
+        store.close()
+
+
+def test_close_stops_the_flusher_and_commits_queued_writes(db_path):
+    store = StateStore(db_path, flush_interval_s=60)
+    store.save_job("a", "kind", "C1")
+
+    started = time.monotonic()
+    store.close()
+    store._flusher.join(timeout=5)
+
+    assert not store._flusher.is_alive()
+    assert time.monotonic() - started < 5
+    assert committed_jobs(db_path) == ["a"]
+
+
+def test_state_is_restored_after_reopening(db_path):
+    entry = TLEEntry(("1 25544U", "2 25544"), "ISS (ZARYA)", TLE_EPOCH, 1700000000.0)
+    windows = [PassWindowRecord(100.0, 700.0, 400.0, 45.0), PassWindowRecord(6000.0, 6500.0, 6250.0, 20.0)]
+
+    store = StateStore(db_path, flush_interval_s=60)
+    store.save_job("pass_notifications:C1", "pass_notifications", "C1", {"lead_minutes": 10})
+    store.save_fingerprints("C1", {"old": 50.0, "new": 5000.0})
+    store.save_tle(25544, entry)
+    store.save_pass_windows("schedule", TLE_EPOCH, windows)
+    store.save_sent_notification("C1", 100.0)
+    store.close()
+
+    store = StateStore(db_path, flush_interval_s=60)
+    try:
+        assert [job.name for job in store.load_jobs()] == ["pass_notifications:C1"]
+        assert store.load_fingerprints("C1", now=1000.0) == {"new": 5000.0}
+        assert store.load_tle(25544) == entry
+        assert store.load_pass_windows("schedule", TLE_EPOCH, after_s=800.0) == windows[1:]
+        assert store.load_pass_windows("schedule", datetime(2024, 1, 3, tzinfo=timezone.utc), after_s=0) == []
+        assert store.load_sent_notifications("C1") == {100.0}
+        assert store.load_sent_notifications("C2") == set()
+    finally:
+        store.close()
+
+
+def test_pass_windows_of_older_tles_are_replaced(db_path):
+    newer_epoch = datetime(2024, 1, 3, tzinfo=timezone.utc)
+    store = StateStore(db_path, flush_interval_s=60)
+    try:
+        store.save_pass_windows("schedule", TLE_EPOCH, [PassWindowRecord(100.0, 700.0, 400.0, 45.0)])
+        store.save_pass_windows("schedule", newer_epoch, [PassWindowRecord(200.0, 800.0, 500.0, 30.0)])
+        assert store.load_pass_windows("schedule", TLE_EPOCH, after_s=0) == []
+
+        store.delete_pass_windows("schedule", ended_before_s=800.0)
+        assert store.load_pass_windows("schedule", newer_epoch, after_s=0) == []
+    finally:
+        store.close()
+
+
+def test_delete_sent_notifications_by_channel_and_time(db_path):
+    store = StateStore(db_path, flush_interval_s=60)
+    try:
+        for channel_id in ("C1", "C2"):
+            store.save_sent_notification(channel_id, 100.0)
+            store.save_sent_notification(channel_id, 200.0)
+
+        store.delete_sent_notifications(before_s=150.0)
+        assert store.load_sent_notifications("C1") == {200.0}
+
+        store.delete_sent_notifications("C1")
+        assert store.load_sent_notifications("C1") == set()
+        assert store.load_sent_notifications("C2") == {200.0}
+    finally:
+        store.close()
+
+
+def test_seen_alerts_are_restored_from_the_store(db_path):
+    alert = Alert(source=SOURCE_GC, region="bc43", kind="Wind warning", area="Victoria",
+                  issued=TLE_EPOCH, text="Strong winds.")
+
+    store = StateStore(db_path, flush_interval_s=60)
+    assert SeenAlerts(store=store, scope="C1").add_new([alert]) == [alert]
+    store.close()
+
+    store = StateStore(db_path, flush_interval_s=60)
+    try:
+        assert SeenAlerts(store=store, scope="C1").add_new([alert]) == []
+        assert SeenAlerts(store=store, scope="C2").add_new([alert]) == [alert]
+    finally:
+        store.close()
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from tle_catalog import TLECatalog, iter_tles
+
+ISS = ("ISS (ZARYA)",
+       ("1 25544U 98067A   26289.50000000  .00016717  00000-0  10270-3 0  9005",
+        "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537"))
+NOAA_19 = ("NOAA 19",
+           ("1 33591U 09005A   26289.50000000  .00000060  00000-0  57000-4 0  9991",
+            "2 33591  99.1000 300.0000 0013000 100.0000 260.0000 14.12500000900000"))
+
+
+def test_ingest_and_lookup(tmp_path):
+    catalog = TLECatalog(str(tmp_path / "catalog.db"))
+    lines = [ISS[0], *ISS[1], "", NOAA_19[0], *NOAA_19[1], "garbage"]
+
+    assert catalog.ingest(iter_tles(lines), "stations", fetched_at=1000.0) == 2
+    assert len(catalog) == 2 and 25544 in catalog
+    assert catalog.get(25544).lines == ISS[1] and catalog.get(25544).fetched_at == 1000.0
+    assert [entry.name for entry in catalog.find("iss  (zarya)")] == ["ISS (ZARYA)"]
+    assert catalog.get(1) is None
+
+
+def test_lookups_are_not_blocked_by_a_slow_ingest(tmp_path):
+    catalog = TLECatalog(str(tmp_path / "catalog.db"))
+    catalog.ingest([ISS])
+    started, release = threading.Event(), threading.Event()
+
+    def slow_download():
+        started.set()
+        release.wait(timeout=5)
+        yield NOAA_19
+
+    thread = threading.Thread(target=catalog.ingest, args=(slow_download(),))
+    thread.start()
+    try:
+        started.wait(timeout=5)
+        t0 = time.monotonic()
+        assert catalog.get(25544) is not None
+        assert time.monotonic() - t0 < 1.0
+    finally:
+        release.set()
+        thread.join(timeout=5)
+
+    assert 33591 in catalog
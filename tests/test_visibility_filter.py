@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from skyfield.api import EarthSatellite, load, wgs84
+
+import visibility_filter
+from visibility_filter import can_be_visible, candidate_windows, orbit_bounds
+
+ISS_TLE = (
+    "1 25544U 98067A   26289.50000000  .00016717  00000-0  10270-3 0  9005",
+    "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537",
+)
+MOLNIYA_TLE = (
+    "1 40296U 14069A   26289.50000000  .00000123  00000-0  00000-0 0  9990",
+    "2 40296  62.8000 100.0000 7200000 270.0000  20.0000  2.00600000 10000",
+)
+
+UVIC = wgs84.latlon(+48.46, -123.31)
+ALERT = wgs84.latlon(+82.50, -62.35)
+ALTITUDE_DEGREES = 10.0
+EVENT_TOLERANCE_S = 1.0
+
+
+@pytest.fixture(scope="module")
+def ts():
+    return load.timescale(builtin=True)
+
+
+def satellite(ts, tle, name):
+    return EarthSatellite(*tle, name, ts)
+
+
+def search_range(ts, sat, days):
+    start = sat.epoch
+    return start, ts.tt_jd(start.tt + days)
+
+
+def test_orbit_bounds_of_a_low_earth_orbit(ts):
+    bounds = orbit_bounds(satellite(ts, ISS_TLE, "ISS"))
+    assert bounds.inclination_deg == pytest.approx(51.6416)
+    assert 300 < bounds.perigee_km < bounds.apogee_km < 450
+    assert bounds.orbits_per_day == pytest.approx(15.72, abs=0.01)
+
+
+def test_satellites_which_never_get_high_enough_are_rejected(ts):
+    sat = satellite(ts, ISS_TLE, "ISS")
+    start, end = search_range(ts, sat, 2)
+
+    assert can_be_visible(sat, UVIC, ALTITUDE_DEGREES)
+    assert not can_be_visible(sat, ALERT, ALTITUDE_DEGREES)
+    assert len(candidate_windows(sat, ALERT, start, end, ALTITUDE_DEGREES)) == 0
+
+    _, events = sat.find_events(ALERT, start, end, altitude_degrees=ALTITUDE_DEGREES)
+    assert len(events) == 0
+
+
+def test_candidate_windows_hold_every_pass(ts):
+    sat = satellite(ts, ISS_TLE, "ISS")
+    start, end = search_range(ts, sat, 2)
+
+    windows = candidate_windows(sat, UVIC, start, end, ALTITUDE_DEGREES)
+    t, events = sat.find_events(UVIC, start, end, altitude_degrees=ALTITUDE_DEGREES)
+
+    assert len(events) > 0
+    # The windows only cover a fraction of the range
+    assert np.sum(windows[:, 1] - windows[:, 0]) < 0.5 * (end.tt - start.tt)
+    for jd in t.tt:
+        assert np.any((windows[:, 0] <= jd) & (jd <= windows[:, 1]))
+
+
+def test_find_events_agrees_with_skyfield(ts):
+    sat = satellite(ts, ISS_TLE, "ISS")
+    start, end = search_range(ts, sat, 2)
+
+    t, events = visibility_filter.find_events(sat, UVIC, start, end, ALTITUDE_DEGREES)
+    expected_t, expected_events = sat.find_events(UVIC, start, end, altitude_degrees=ALTITUDE_DEGREES)
+
+    assert list(events) == list(expected_events)
+    assert np.max(np.abs(t.tt - expected_t.tt)) * 86400 < EVENT_TOLERANCE_S
+
+
+def test_find_events_finds_the_rises_of_a_high_eccentricity_orbit(ts):
+    sat = satellite(ts, MOLNIYA_TLE, "MOLNIYA")
+    start, end = search_range(ts, sat, 3)
+
+    t, events = visibility_filter.find_events(sat, UVIC, start, end, ALTITUDE_DEGREES)
+
+    # Count the rises of a dense altitude sampling, passes last hours so none fall between samples
+    sampled = ts.tt_jd(np.arange(start.tt, end.tt, 30 / 86400))
+    altitude_deg = (sat - UVIC).at(sampled).altaz()[0].degrees
+    above = altitude_deg >= ALTITUDE_DEGREES
+    expected_rises = np.flatnonzero(~above[:-1] & above[1:])
+
+    rises = t.tt[events == 0]
+    assert len(rises) == len(expected_rises) > 0
+    assert np.max(np.abs(rises - sampled.tt[expected_rises + 1])) * 86400 <= 30 + EVENT_TOLERANCE_S
+    # Only a pass in progress at either end of the range misses its rise or its set
+    assert abs(int(np.sum(events == 2)) - len(rises)) <= 1
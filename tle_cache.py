@@ -0,0 +1,223 @@
+'''
+Two level (memory and disk) cache of Celestrak TLEs keyed by NORAD ID.
+'''
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, NamedTuple, Optional, Set, Tuple
+
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get("TLE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "tle"))
+DEFAULT_TTL_S = float(os.environ.get("TLE_CACHE_TTL_S", 4 * 60 * 60))
+
+CACHE_REQUESTS = counter("tle_cache_requests_total", "TLE cache lookups by result (hit, loaded, stale, miss)", ["result"])
+
+# Returns ((TLE line 1, TLE line 2), satellite name, Unix time the TLE was fetched or None for now)
+TLEFetcher = Callable[[int], Tuple[Tuple[str, str], str, Optional[float]]]
+
+
+class TLEEntry(NamedTuple):
+    """A cached TLE along with its epoch and the time it was fetched from Celestrak."""
+    lines: Tuple[str, str]
+    name: str
+    epoch: datetime
+    fetched_at: float  # Unix time
+
+
+def tle_epoch(line_1: str) -> datetime:
+    """
+    Parse the epoch field (columns 19-32, YYDDD.DDDDDDDD) of TLE line 1.
+
+    :param line_1: First line of the TLE.
+    """
+    year = int(line_1[18:20])
+    year += 2000 if year < 57 else 1900
+    day_of_year = float(line_1[20:32])
+    return datetime(year, 1, 1, tzinfo=timezone.utc) + timedelta(days=day_of_year - 1)
+
+
+class TLECache:
+    """
+    TLE cache with a time-to-live and stale-while-revalidate semantics. Entries younger than
+    the TTL are answered from memory (or disk after a restart) with no network I/O. Expired
+    entries are returned immediately while a background thread refreshes them, so a slow or
+    rate-limiting Celestrak never blocks the caller once a TLE has been fetched once.
+
+    Entries are persisted as JSON files in cache_dir, or in a StateStore once one is attached
+    with use_store().
+    """
+    def __init__(self, fetch: TLEFetcher, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, ttl_s: float = DEFAULT_TTL_S):
+        """
+        Create a TLECache instance.
+
+        :param fetch: Function returning ((TLE line 1, TLE line 2), satellite name, fetch time) for a
+            NORAD ID. The fetch time is None for a TLE fetched by the call, or the Unix time an
+            intermediate copy (e.g. a catalog) fetched it, so the entry expires on time.
+        :param cache_dir: Directory used to persist entries, or None to keep them in memory only.
+        :param ttl_s: Age in seconds after which an entry is refreshed in the background.
+        """
+        self._fetch = fetch
+        self._cache_dir = cache_dir
+        self._ttl_s = ttl_s
+        self._store = None
+        self._entries: Dict[int, TLEEntry] = {}
+        self._refreshing: Set[int] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def ttl_s(self) -> float:
+        """Age in seconds after which an entry is considered stale"""
+        return self._ttl_s
+
+    def use_store(self, store):
+        """
+        Persist entries in a StateStore instead of cache_dir from now on. Entries already in
+        memory are copied to the store.
+
+        :param store: state_store.StateStore instance.
+        """
+        with self._lock:
+            self._store = store
+            for norad_catalog_num, entry in self._entries.items():
+                store.save_tle(norad_catalog_num, entry)
+
+    def get(self, norad_catalog_num: int) -> TLEEntry:
+        """
+        Return the TLE for a NORAD ID. Only blocks on the network when no copy of the TLE
+        exists in memory or on disk.
+
+        :param norad_catalog_num: The norad catalog number of the satellite.
+        """
+        result = "hit"
+        with self._lock:
+            entry = self._entries.get(norad_catalog_num)
+            if entry is None:
+                entry = self._load(norad_catalog_num)
+                if entry is not None:
+                    self._entries[norad_catalog_num] = entry
+                    result = "loaded"
+
+        if entry is None:
+            CACHE_REQUESTS.inc(result="miss")
+            return self.refresh(norad_catalog_num)
+
+        if time.time() - entry.fetched_at >= self._ttl_s:
+            result = "stale"
+            self._refresh_in_background(norad_catalog_num)
+
+        CACHE_REQUESTS.inc(result=result)
+        return entry
+
+    def put(self, norad_catalog_num: int, lines: Tuple[str, str], name: str, fetched_at: Optional[float] = None) -> TLEEntry:
+        """
+        Store a TLE in the cache.
+
+        :param norad_catalog_num: The norad catalog number of the satellite.
+        :param lines: (TLE line 1, TLE line 2)
+        :param name: Satellite name.
+        :param fetched_at: Unix time the TLE was fetched, defaults to now.
+        """
+        entry = TLEEntry(
+            lines=(str(lines[0]), str(lines[1])),
+            name=name,
+            epoch=tle_epoch(lines[0]),
+            fetched_at=time.time() if fetched_at is None else fetched_at,
+        )
+        with self._lock:
+            self._entries[norad_catalog_num] = entry
+        self._save(norad_catalog_num, entry)
+        return entry
+
+    def refresh(self, norad_catalog_num: int) -> TLEEntry:
+        """
+        Fetch a TLE from the source synchronously and store it.
+
+        :param norad_catalog_num: The norad catalog number of the satellite.
+        """
+        lines, name, fetched_at = self._fetch(norad_catalog_num)
+        return self.put(norad_catalog_num, lines, name, fetched_at)
+
+    def invalidate(self, norad_catalog_num: int):
+        """
+        Drop a TLE from memory and disk.
+
+        :param norad_catalog_num: The norad catalog number of the satellite.
+        """
+        with self._lock:
+            self._entries.pop(norad_catalog_num, None)
+        if self._store is not None:
+            self._store.delete_tle(norad_catalog_num)
+            return
+        path = self._path(norad_catalog_num)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def _refresh_in_background(self, norad_catalog_num: int):
+        with self._lock:
+            if norad_catalog_num in self._refreshing:
+                return
+            self._refreshing.add(norad_catalog_num)
+
+        def run():
+            try:
+                self.refresh(norad_catalog_num)
+            except Exception as e:
+                logger.warning(f"Background TLE refresh for NORAD ID {norad_catalog_num} failed, serving stale TLE. Error: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(norad_catalog_num)
+
+        threading.Thread(target=run, name=f"tle-refresh-{norad_catalog_num}", daemon=True).start()
+
+    def _path(self, norad_catalog_num: int) -> Optional[str]:
+        if self._cache_dir is None:
+            return None
+        return os.path.join(self._cache_dir, f"{norad_catalog_num}.json")
+
+    def _load(self, norad_catalog_num: int) -> Optional[TLEEntry]:
+        if self._store is not None:
+            return self._store.load_tle(norad_catalog_num)
+        path = self._path(norad_catalog_num)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                record = json.load(f)
+            return TLEEntry(
+                lines=tuple(record["lines"]),
+                name=record["name"],
+                epoch=datetime.fromisoformat(record["epoch"]),
+                fetched_at=float(record["fetched_at"]),
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable TLE cache file {path}. Error: {e}")
+            return None
+
+    def _save(self, norad_catalog_num: int, entry: TLEEntry):
+        if self._store is not None:
+            self._store.save_tle(norad_catalog_num, entry)
+            return
+        path = self._path(norad_catalog_num)
+        if path is None:
+            return
+        record = {
+            "lines": list(entry.lines),
+            "name": entry.name,
+            "epoch": entry.epoch.isoformat(),
+            "fetched_at": entry.fetched_at,
+        }
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write TLE cache file {path}. Error: {e}")
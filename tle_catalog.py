@@ -0,0 +1,224 @@
+'''
+On-disk catalog of Celestrak TLEs indexed by NORAD ID and name, filled from bulk group files.
+'''
+
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from tle_cache import TLEEntry, tle_epoch
+
+logger = logging.getLogger(__name__)
+
+CELESTRAK_GROUP_URL = "https://celestrak.org/NORAD/elements/gp.php?GROUP={group}&FORMAT=tle"
+DEFAULT_CATALOG_PATH = os.environ.get("TLE_CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "tle_catalog.db"))
+DEFAULT_GROUPS = [group for group in os.environ.get("CELESTRAK_GROUPS", "").split(",") if group]
+DEFAULT_TIMEOUT_S = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (
+    norad_catalog_num INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    line_1 TEXT NOT NULL,
+    line_2 TEXT NOT NULL,
+    epoch TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS catalog_name_key ON catalog (name_key);
+"""
+
+TLE_LINE_LENGTH = 69
+
+
+def norad_catalog_num(line_1: str) -> int:
+    """
+    Parse the satellite number field (columns 3-7) of TLE line 1.
+
+    :param line_1: First line of the TLE.
+    """
+    return int(line_1[2:7])
+
+
+def _name_key(name: str) -> str:
+    return " ".join(name.upper().split())
+
+
+def iter_tles(lines: Iterable[str]) -> Iterator[Tuple[str, Tuple[str, str]]]:
+    """
+    Parse TLEs one at a time from the lines of a two or three line element file, so files of
+    any size are parsed without holding them in memory.
+
+    :param lines: Lines of the file, with or without line endings.
+
+    Returns: iterator of (satellite name or "", (TLE line 1, TLE line 2))
+    """
+    name = ""
+    line_1 = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        if line.startswith("1 ") and len(line) >= TLE_LINE_LENGTH:
+            line_1 = line
+        elif line.startswith("2 ") and len(line) >= TLE_LINE_LENGTH and line_1 is not None:
+            yield name, (line_1, line)
+            name = ""
+            line_1 = None
+        else:
+            name = line.strip()
+            line_1 = None
+
+
+class TLECatalog:
+    """
+    SQLite catalog of TLEs keyed by NORAD ID with an index on satellite name. Group files are
+    parsed while they are streamed from Celestrak and written in one transaction once
+    downloaded, so one request refreshes every satellite of a group, lookups are not blocked
+    by the download and read a single row instead of going to the network. The database is
+    only opened when the catalog is first used.
+    """
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        """
+        Create a TLECatalog instance.
+
+        :param path: Database file, or ":memory:".
+        """
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM catalog")[0][0] if self._exists() else 0
+
+    def __contains__(self, norad_catalog_num: int) -> bool:
+        return self.get(norad_catalog_num) is not None
+
+    def get(self, norad_catalog_num: int) -> Optional[TLEEntry]:
+        """
+        Returns the TLE of a satellite, or None if it is not in the catalog.
+
+        :param norad_catalog_num: The norad catalog number of the satellite.
+        """
+        if not self._exists():
+            return None
+        rows = self._query("SELECT line_1, line_2, name, epoch, fetched_at FROM catalog WHERE norad_catalog_num = ?",
+                           (norad_catalog_num,))
+        return self._entry(rows[0]) if rows else None
+
+    def find(self, name: str) -> List[TLEEntry]:
+        """
+        Returns the TLEs of the satellites with a name, ignoring case and repeated spaces.
+
+        :param name: Satellite name, e.g. ISS (ZARYA).
+        """
+        if not self._exists():
+            return []
+        rows = self._query("SELECT line_1, line_2, name, epoch, fetched_at FROM catalog WHERE name_key = ? "
+                           "ORDER BY norad_catalog_num", (_name_key(name),))
+        return [self._entry(row) for row in rows]
+
+    def ingest(self, tles: Iterable[Tuple[str, Tuple[str, str]]], group: str = "",
+               fetched_at: Optional[float] = None) -> int:
+        """
+        Store TLEs in the catalog in one transaction, replacing older TLEs of the same satellites.
+        The TLEs are read and parsed before the catalog is locked, so lookups are not blocked by
+        a slow source such as a download.
+
+        :param tles: (satellite name, (TLE line 1, TLE line 2)) pairs, e.g. from iter_tles(...).
+        :param group: Name of the group the TLEs came from.
+        :param fetched_at: Unix time the TLEs were fetched, defaults to now.
+
+        Returns: number of TLEs stored
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+
+        rows = []
+        for name, (line_1, line_2) in tles:
+            try:
+                num = norad_catalog_num(line_1)
+                epoch = tle_epoch(line_1).isoformat()
+            except ValueError:
+                logger.warning(f"Skipping malformed TLE: {line_1}")
+                continue
+            name = name or str(num)
+            rows.append((num, name, _name_key(name), line_1, line_2, epoch, group, fetched_at))
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO catalog (norad_catalog_num, name, name_key, line_1, line_2, "
+                                 "epoch, grp, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def ingest_file(self, path: str, group: str = "") -> int:
+        """
+        Store every TLE of a local two or three line element file.
+
+        :param path: TLE file.
+        :param group: Name to record as the group of the TLEs.
+
+        Returns: number of TLEs stored
+        """
+        with open(path) as f:
+            return self.ingest(iter_tles(f), group or os.path.basename(path))
+
+    def ingest_url(self, url: str, group: str = "", timeout_s: float = DEFAULT_TIMEOUT_S) -> int:
+        """
+        Download a two or three line element file, parsing it while it is streamed, and store its TLEs.
+
+        :param url: URL of the file.
+        :param group: Name to record as the group of the TLEs.
+        :param timeout_s: Request timeout in seconds.
+
+        Returns: number of TLEs stored
+        """
+        with urllib.request.urlopen(url, timeout=timeout_s) as response:
+            return self.ingest(iter_tles(io.TextIOWrapper(response, encoding="ascii", errors="replace")), group or url)
+
+    def ingest_groups(self, groups: Sequence[str] = DEFAULT_GROUPS, timeout_s: float = DEFAULT_TIMEOUT_S) -> int:
+        """
+        Refresh the catalog from Celestrak group files, one request per group. A group which
+        fails to download is logged and skipped.
+
+        :param groups: Celestrak group names, e.g. active or stations.
+        :param timeout_s: Request timeout in seconds.
+
+        Returns: number of TLEs stored
+        """
+        count = 0
+        for group in groups:
+            try:
+                count += self.ingest_url(CELESTRAK_GROUP_URL.format(group=group), group, timeout_s)
+            except Exception as e:
+                logger.warning(f"Could not ingest Celestrak group {group}. Error: {e}")
+        return count
+
+    def _exists(self) -> bool:
+        return self._conn is not None or self._path == ":memory:" or os.path.exists(self._path)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self._path != ":memory:":
+                os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    def _query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _entry(row: tuple) -> TLEEntry:
+        line_1, line_2, name, epoch, fetched_at = row
+        return TLEEntry((line_1, line_2), name, datetime.fromisoformat(epoch), fetched_at)
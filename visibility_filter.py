@@ -0,0 +1,310 @@
+'''
+Cheap bounds on when a satellite can be seen from a ground station, used to skip the exact
+pass search where no pass is possible.
+'''
+
+from typing import NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from skyfield.api import EarthSatellite
+from skyfield.searchlib import find_maxima
+from skyfield.sgp4lib import theta_GMST1982
+from skyfield.timelib import Time
+from skyfield.toposlib import GeographicPosition
+
+from metrics import counter
+
+EARTH_RADIUS_KM = 6378.137
+EARTH_MU_KM3_S2 = 398600.4418
+EARTH_ROTATION_DEG_S = 360.0 / 86164.0905
+SECONDS_PER_DAY = 86400.0
+
+# The sub-satellite point check samples often enough for the ground track to move at most this
+# far between samples, bounded by MIN_COARSE_STEP_S and MAX_COARSE_STEP_S
+COARSE_STEP_MOTION_DEG = 4.0
+MIN_COARSE_STEP_S = 10.0
+MAX_COARSE_STEP_S = 900.0
+# Covers the spherical Earth, geocentric vs geodetic latitude (< 0.2 deg) and UT1 vs UTC (< 0.01 deg)
+MARGIN_DEG = 0.5
+EVENT_EPSILON_DAYS = 0.5 / SECONDS_PER_DAY  # Precision of rise, set and culmination times, as in find_events
+OUTSIDE_WINDOW_ALT_DEG = -90.0  # Altitude reported for times outside every candidate window
+
+PREFILTER_RESULTS = counter("visibility_prefilter_total",
+                            "Pass searches by pre-filter result (rejected, no_window, windows)", ["result"])
+PREFILTER_COVERAGE = counter("visibility_prefilter_seconds_total",
+                             "Time searched for passes, before (total) and after (searched) the pre-filter", ["span"])
+
+
+class OrbitBounds(NamedTuple):
+    """Bounds of a satellite orbit derived from its mean elements."""
+    inclination_deg: float
+    perigee_km: float  # Altitude above the equatorial radius
+    apogee_km: float  # Altitude above the equatorial radius
+    orbits_per_day: float
+    max_rate_deg_s: float  # Upper bound of the speed of the sub-satellite point, as a central angle rate
+
+    @property
+    def coarse_step_s(self) -> float:
+        """Time step of the sub-satellite point check (s)"""
+        return float(np.clip(COARSE_STEP_MOTION_DEG / self.max_rate_deg_s, MIN_COARSE_STEP_S, MAX_COARSE_STEP_S))
+
+
+def orbit_bounds(sat: EarthSatellite) -> OrbitBounds:
+    """
+    Compute the altitude range and the fastest ground track motion of a satellite from the
+    inclination, eccentricity and mean motion of its TLE.
+
+    :param sat: The satellite.
+    """
+    model = sat.model
+    eccentricity = float(model.ecco)
+    mean_motion_rad_s = float(model.no_kozai) / 60.0
+    semi_major_axis_km = (EARTH_MU_KM3_S2 / mean_motion_rad_s ** 2) ** (1.0 / 3.0)
+
+    # Angular velocity is highest at perigee, the Earth turning under the orbit adds to it
+    perigee_radius_km = semi_major_axis_km * (1.0 - eccentricity)
+    angular_momentum = np.sqrt(EARTH_MU_KM3_S2 * semi_major_axis_km * (1.0 - eccentricity ** 2))
+    max_rate_deg_s = np.degrees(angular_momentum / perigee_radius_km ** 2) + EARTH_ROTATION_DEG_S
+
+    return OrbitBounds(
+        inclination_deg=float(np.degrees(model.inclo)),
+        perigee_km=perigee_radius_km - EARTH_RADIUS_KM,
+        apogee_km=semi_major_axis_km * (1.0 + eccentricity) - EARTH_RADIUS_KM,
+        orbits_per_day=mean_motion_rad_s * SECONDS_PER_DAY / (2.0 * np.pi),
+        max_rate_deg_s=float(max_rate_deg_s),
+    )
+
+
+def visibility_radius_deg(altitude_km: Union[float, np.ndarray], altitude_degrees: float) -> Union[float, np.ndarray]:
+    """
+    Largest central angle between a ground station and the sub-satellite point at which a
+    satellite at a given altitude is above the elevation mask, for a spherical Earth.
+
+    :param altitude_km: Altitude of the satellite.
+    :param altitude_degrees: Elevation mask.
+    """
+    mask_rad = np.radians(altitude_degrees)
+    ratio = EARTH_RADIUS_KM * np.cos(mask_rad) / (EARTH_RADIUS_KM + np.maximum(altitude_km, 0.0))
+    return np.degrees(np.arccos(np.clip(ratio, -1.0, 1.0)) - mask_rad)
+
+
+def can_be_visible(sat: EarthSatellite, station: GeographicPosition, altitude_degrees: float,
+                   bounds: Optional[OrbitBounds] = None) -> bool:
+    """
+    False if the satellite can never rise above the elevation mask at the ground station,
+    because its ground track never comes close enough to the station's latitude even at
+    apogee. Perturbations are small enough over a planning horizon to be covered by MARGIN_DEG.
+
+    :param sat: The satellite.
+    :param station: The ground station.
+    :param altitude_degrees: Elevation mask.
+    :param bounds: Orbit bounds of the satellite, computed if not given.
+    """
+    bounds = bounds or orbit_bounds(sat)
+    if bounds.apogee_km <= 0.0:
+        return False
+
+    # Retrograde orbits reach the same latitudes as their prograde mirror image
+    max_latitude_deg = min(bounds.inclination_deg, 180.0 - bounds.inclination_deg)
+    latitude_gap_deg = abs(station.latitude.degrees) - max_latitude_deg
+    return latitude_gap_deg <= visibility_radius_deg(bounds.apogee_km, altitude_degrees) + MARGIN_DEG
+
+
+def _unit_vector(latitude_rad: float, longitude_rad: float) -> np.ndarray:
+    return np.array([np.cos(latitude_rad) * np.cos(longitude_rad), np.cos(latitude_rad) * np.sin(longitude_rad),
+                     np.sin(latitude_rad)])
+
+
+def earth_fixed_position_km(sat: EarthSatellite, t: Time) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Propagate a satellite with one vectorized SGP4 call and rotate its TEME positions into the
+    Earth fixed frame by Greenwich mean sidereal time, the same rotation skyfield applies
+    to TEME positions, without polar motion. Unlike EarthSatellite.at(...) no precession or
+    nutation matrices are computed.
+
+    :param sat: The satellite.
+    :param t: Times to propagate to.
+
+    Returns: (positions (km) with shape (3, n), False where SGP4 failed)
+    """
+    jd_ut1 = np.atleast_1d(t.ut1)
+    # The TLE epoch is in UTC
+    jd_utc = jd_ut1 - np.atleast_1d(t.dut1) / SECONDS_PER_DAY
+    jd_utc_whole = np.floor(jd_utc)
+    errors, position_km, _ = sat.model.sgp4_array(jd_utc_whole, jd_utc - jd_utc_whole)
+
+    jd_ut1_whole = np.floor(jd_ut1)
+    theta_rad, _ = theta_GMST1982(jd_ut1_whole, jd_ut1 - jd_ut1_whole)
+    cos_theta, sin_theta = np.cos(theta_rad), np.sin(theta_rad)
+    x_km, y_km, z_km = position_km.T
+    return (np.array([cos_theta * x_km + sin_theta * y_km, cos_theta * y_km - sin_theta * x_km, z_km]),
+            errors == 0)
+
+
+def candidate_windows(sat: EarthSatellite, station: GeographicPosition, start: Time, end: Time,
+                      altitude_degrees: float, bounds: Optional[OrbitBounds] = None) -> np.ndarray:
+    """
+    Find the parts of a time range in which the satellite can be above the elevation mask.
+    The sub-satellite point is propagated every bounds.coarse_step_s seconds in one
+    vectorized SGP4 call and its distance to the station is compared to the visibility
+    radius at the satellite's altitude, widened by how far the ground track can move in half
+    a step. Every pass lies within one of the returned windows, which are padded by a step
+    at each end and so are at least two steps long.
+
+    :param sat: The satellite.
+    :param station: The ground station.
+    :param start: Start of the search range.
+    :param end: End of the search range.
+    :param altitude_degrees: Elevation mask.
+    :param bounds: Orbit bounds of the satellite, computed if not given.
+
+    Returns: (start, end) TT Julian dates of non-overlapping windows in chronological order, shape (n, 2)
+    """
+    bounds = bounds or orbit_bounds(sat)
+    span_s = (end.tt - start.tt) * SECONDS_PER_DAY
+    PREFILTER_COVERAGE.inc(max(span_s, 0.0), span="total")
+
+    if not can_be_visible(sat, station, altitude_degrees, bounds):
+        PREFILTER_RESULTS.inc(result="rejected")
+        return np.zeros((0, 2))
+
+    step_s = bounds.coarse_step_s
+    num_steps = max(int(np.ceil(span_s / step_s)), 2)
+    jd = np.linspace(start.tt, end.tt, num_steps + 1)
+    position_km, valid = earth_fixed_position_km(sat, start.ts.tt_jd(jd))
+
+    # Central angle between the sub-satellite point and the station
+    radius_km = np.linalg.norm(position_km, axis=0)
+    cos_angle = np.dot(_unit_vector(station.latitude.radians, station.longitude.radians), position_km) / radius_km
+    central_angle_deg = np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+
+    step_motion_deg = bounds.max_rate_deg_s * (jd[1] - jd[0]) * SECONDS_PER_DAY / 2.0
+    limit_deg = visibility_radius_deg(radius_km - EARTH_RADIUS_KM, altitude_degrees) + step_motion_deg + MARGIN_DEG
+    near = (central_angle_deg <= limit_deg) & valid
+
+    if not near.any():
+        PREFILTER_RESULTS.inc(result="no_window")
+        return np.zeros((0, 2))
+
+    # Runs of near samples widened by one sample on each side, runs which then touch are merged
+    widened = near.copy()
+    widened[1:] |= near[:-1]
+    widened[:-1] |= near[1:]
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], widened.astype(np.int8), [0]))))
+    windows = np.column_stack((jd[edges[0::2]], jd[edges[1::2] - 1]))
+
+    PREFILTER_RESULTS.inc(result="windows")
+    PREFILTER_COVERAGE.inc(float(np.sum(windows[:, 1] - windows[:, 0])) * SECONDS_PER_DAY, span="searched")
+    return windows
+
+
+def find_events(sat: EarthSatellite, station: GeographicPosition, start: Time, end: Time,
+                altitude_degrees: float) -> Tuple[Time, np.ndarray]:
+    """
+    Drop-in replacement of EarthSatellite.find_events(...) which only propagates the satellite
+    inside the candidate windows. Like find_events, culminations are found with find_maxima,
+    but the satellite is reported far below the horizon outside the windows, altitudes are
+    computed from earth_fixed_position_km(...) and rises and sets are bisected for all passes
+    at once, each between a culmination and the nearest altitude minimum or window bound. So
+    unlike find_events, the rise and set of a long pass are found even when the altitude
+    midway between two of its culminations is above the mask.
+
+    :param sat: The satellite.
+    :param station: The ground station.
+    :param start: Start of the search range.
+    :param end: End of the search range.
+    :param altitude_degrees: Elevation mask.
+
+    Returns: (event times, events) where 0 is a rise above, 1 a culmination and 2 a set below the mask
+    """
+    ts = start.ts
+    bounds = orbit_bounds(sat)
+    windows = candidate_windows(sat, station, start, end, altitude_degrees, bounds)
+    if len(windows) == 0:
+        return ts.tt_jd(np.zeros(0)), np.zeros(0, dtype=np.uint8)
+
+    station_km = station.itrs_xyz.km
+    up = _unit_vector(station.latitude.radians, station.longitude.radians)
+
+    def window_index(jd: np.ndarray) -> np.ndarray:
+        """Index of the window containing each date, or -1."""
+        i = np.searchsorted(windows[:, 0], jd, side="right") - 1
+        return np.where((i >= 0) & (jd <= windows[np.maximum(i, 0), 1]), i, -1)
+
+    def altitude_deg(jd: np.ndarray) -> np.ndarray:
+        position_km, valid = earth_fixed_position_km(sat, ts.tt_jd(jd))
+        line_of_sight_km = position_km - station_km[:, np.newaxis]
+        sin_alt = np.dot(up, line_of_sight_km) / np.linalg.norm(line_of_sight_km, axis=0)
+        return np.where(valid, np.degrees(np.arcsin(np.clip(sin_alt, -1.0, 1.0))), OUTSIDE_WINDOW_ALT_DEG)
+
+    def windowed_altitude_deg(t: Time) -> np.ndarray:
+        alt = np.full(np.shape(t.tt), OUTSIDE_WINDOW_ALT_DEG)
+        inside = window_index(t.tt) >= 0
+        if inside.any():
+            alt[inside] = altitude_deg(t.tt[inside])
+        return alt
+
+    # Windows are at least two coarse steps long so each gets a sample, find_events samples no coarser
+    windowed_altitude_deg.step_days = min(2.0 * bounds.coarse_step_s / SECONDS_PER_DAY,
+                                          0.05 / max(bounds.orbits_per_day, 1.0), 0.25)
+    t_max, alt_max = find_maxima(start, end, windowed_altitude_deg, epsilon=EVENT_EPSILON_DAYS, num=12)
+    jd_max = t_max.tt[alt_max >= altitude_degrees]
+
+    # A pass in progress at either end of the range has a rise or set but no culmination inside it
+    jd_ends = np.array([start.tt, end.tt])
+    jd_ends = jd_ends[window_index(jd_ends) >= 0]
+    jd_ends = jd_ends[altitude_deg(jd_ends) >= altitude_degrees] if len(jd_ends) else jd_ends
+
+    jd_peak = np.concatenate((jd_max, jd_ends))
+    order = np.argsort(jd_peak, kind="stable")
+    jd_peak = jd_peak[order]
+    is_max = (np.arange(len(order)) < len(jd_max))[order]
+    if len(jd_peak) == 0:
+        return ts.tt_jd(np.zeros(0)), np.zeros(0, dtype=np.uint8)
+
+    # Each rise is searched between a peak and the previous valley, each set between a peak and the
+    # next one. Valleys are the window bounds and, in windows holding several peaks, the minima
+    # between them, so a pass whose altitude stays above the mask between two culminations is not
+    # cut in two, and one which dips below the mask between them is
+    i_window = window_index(jd_peak)
+    jd_valley = windows.ravel()
+    multi_peak = np.flatnonzero(np.bincount(i_window, minlength=len(windows)) > 1)
+    if len(multi_peak):
+        def windowed_depth_deg(t: Time) -> np.ndarray:
+            depth = np.full(np.shape(t.tt), OUTSIDE_WINDOW_ALT_DEG)
+            inside = np.isin(window_index(t.tt), multi_peak)
+            if inside.any():
+                depth[inside] = -altitude_deg(t.tt[inside])
+            return depth
+
+        windowed_depth_deg.step_days = windowed_altitude_deg.step_days
+        t_min, _ = find_maxima(ts.tt_jd(windows[multi_peak[0], 0]), ts.tt_jd(windows[multi_peak[-1], 1]),
+                               windowed_depth_deg, epsilon=EVENT_EPSILON_DAYS, num=12)
+        jd_valley = np.sort(np.concatenate((jd_valley, t_min.tt)))
+
+    i_valley = np.clip(np.searchsorted(jd_valley, jd_peak), 1, len(jd_valley) - 1)
+    left = np.minimum(jd_valley[i_valley - 1], jd_peak)
+    right = np.maximum(jd_valley[i_valley], jd_peak)
+    # Peaks whose valley was missed fall back to find_events' midpoint brackets
+    shared = left[1:] == left[:-1]
+    midpoints = (jd_peak[:-1] + jd_peak[1:]) / 2
+    left[1:] = np.where(shared, midpoints, left[1:])
+    right[:-1] = np.where(shared, midpoints, right[:-1])
+
+    # A bracket only holds a crossing if its outer end is below the mask
+    jd_below = np.concatenate((left, right))
+    jd_above = np.concatenate((jd_peak, jd_peak))
+    crossing = altitude_deg(jd_below) < altitude_degrees
+    jd_below, jd_above = jd_below[crossing], jd_above[crossing]
+    event = np.concatenate((np.zeros(len(jd_peak), dtype=np.uint8), np.full(len(jd_peak), 2, dtype=np.uint8)))[crossing]
+
+    while len(jd_below) and np.max(np.abs(jd_above - jd_below)) > EVENT_EPSILON_DAYS:
+        jd_mid = (jd_below + jd_above) / 2
+        below = altitude_deg(jd_mid) < altitude_degrees
+        jd_below = np.where(below, jd_mid, jd_below)
+        jd_above = np.where(below, jd_above, jd_mid)
+
+    jd = np.concatenate((jd_peak[is_max], (jd_below + jd_above) / 2))
+    events = np.concatenate((np.ones(int(np.sum(is_max)), dtype=np.uint8), event))
+    order = np.argsort(jd, kind="stable")
+    return ts.tt_jd(jd[order]), events[order]